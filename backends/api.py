@@ -1,14 +1,106 @@
-import json
 import time
+
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from contextlib import asynccontextmanager
 from typing import Optional, Any
 
 from pydantic import BaseModel, Field
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+import prompt_generate
 from prompt_generate import generate_prompt_from_json
-from file_parser import parse_file
+import file_parser
+from file_parser import parse_document
+import audit_rules
+import document_generation
+import document_store
+import domain_index
+import knowledge_store
+import llm_scheduler
+import metrics
+import qa_validation
+import script_runner
+import select_scoring
+import session_store
+import shared_cache
+import singleflight
+import warmup
+import workflow_runtime
+from responses import FastJSONResponse, dumps, step_response
+from structured_log import get_logger
+
+try:
+    import llm_client
+    from audit_prompt import build_file_audit_prompt, build_rule_audit_prompts
+except ImportError:  # 未安装 LLM 相关依赖时跳过大模型审核
+    llm_client = None
+
+# file-parse 默认响应模式：full 返回全文；summary 返回摘要预览；reference 只返回文本引用
+FILE_PARSE_RESPONSE_MODE = os.getenv("FILE_PARSE_RESPONSE_MODE", "full")
+# summary 模式下预览的字符数
+SUMMARY_PREVIEW_CHARS = int(os.getenv("SUMMARY_PREVIEW_CHARS", "500"))
+# 解析规则按编号拆分为逐条并发审核的默认开关（请求中 checkConfig.splitRules 可覆盖）
+FILE_AUDIT_SPLIT_RULES = os.getenv("FILE_AUDIT_SPLIT_RULES", "0").lower() in ("1", "true", "yes")
+# 超过该字节数的响应才压缩
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# 知识树与模板文件位置
+KNOWLEDGE_PATH = os.getenv("KNOWLEDGE_PATH", 'C:\\Users\\29884\\Desktop\\北航课题\\demo\\knowledge.json')
+TEMPLATE_PATH = os.getenv("TEMPLATE_PATH", 'C:\\Users\\29884\\Desktop\\北航课题\\demo\\template.json')
+
+log = get_logger(__name__)
+
+
+def _warm_knowledge() -> dict:
+    """加载知识树快照，预读其引用的标准文件并预计算各过程组的参考文件清单"""
+    snapshot = knowledge_store.load(KNOWLEDGE_PATH)
+    return {
+        "version": snapshot.version[:12],
+        "standardFiles": prompt_generate.warm_up(snapshot.data),
+        "processGroups": prompt_generate.precompute(snapshot.data, snapshot.version),
+    }
 
-app = FastAPI()
+
+def _warmup_steps() -> list:
+    steps = [
+        ("parsers", file_parser.warm_up),
+        ("knowledge", _warm_knowledge),
+        ("script_workers", script_runner.start_pool),
+        ("workflow", lambda: len(workflow_runtime.get_workflow().nodes)),
+    ]
+    if llm_client is not None:
+        steps.append(("llm_pool", llm_client.warm_up))
+    return steps
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时后台预热（不阻塞端口监听），关闭时释放 LLM 连接池"""
+    if warmup.WARMUP_ON_STARTUP:
+        task = asyncio.create_task(asyncio.to_thread(warmup.run, _warmup_steps()))
+    else:
+        task = None
+        warmup.mark_ready()
+    try:
+        yield
+    finally:
+        if task is not None:
+            await task
+        warmup.reset()
+        script_runner.close_pool()
+        session_store.flush()
+        if llm_client is not None:
+            llm_client.close_pool()
+
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # 配置 CORS
 app.add_middleware(
@@ -19,6 +111,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩：安装了 brotli-asgi 时优先 brotli（不支持 br 的客户端自动回退 gzip），否则 gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """按路由模板记录请求耗时，避免路径参数造成指标维度膨胀"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUEST_DURATION.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus 指标导出"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/llm/queue")
+def get_llm_queue():
+    """大模型调用调度状态：名额、运行数、各优先级排队数"""
+    return llm_scheduler.status()
+
+
+@app.get("/health/live")
+def health_live():
+    """存活检查：进程能响应即返回 200"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    """就绪检查：启动预热完成前返回 503"""
+    status = warmup.status()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 # ==================== 审核步骤 - 文件解析 API 模型 ====================
 
 class FileInfo(BaseModel):
@@ -52,11 +191,13 @@ class BackgroundFileItem(BaseModel):
     name: Optional[str] = None  # 兼容前端
     textContent: Optional[str] = Field(None, description="文件文本内容")
     content: Optional[str] = None  # 兼容
+    documentRef: Optional[str] = Field(None, description="会话中已解析文档的摘要，代替重复上传文本")
 
 
 class CheckConfig(BaseModel):
     """审核步骤配置（文件解析）"""
     parseRules: Optional[str] = Field(None, description="解析规则")
+    splitRules: Optional[bool] = Field(None, description="按编号拆分解析规则逐条审核，默认见 FILE_AUDIT_SPLIT_RULES")
     fileTypes: Optional[list[str]] = None
 
 
@@ -76,6 +217,7 @@ class FileParseRequest(BaseModel):
     reviewBackground: Optional[str] = Field(None, description="审核背景")
     backgroundFiles: Optional[list[BackgroundFileItem]] = Field(None, description="背景技术文件列表")
     checkConfig: Optional[CheckConfig] = Field(None, description="审核步骤配置，含解析规则")
+    priority: Optional[str] = Field(None, description="大模型调用优先级：interactive（默认）/ sub_workflow / batch")
 
 
 # ==================== 审核步骤 - 问答交互 API 模型 ====================
@@ -110,6 +252,7 @@ class OptionItem(BaseModel):
 class OptionsConfig(BaseModel):
     options: list[OptionItem] = []
     shuffle: Optional[bool] = None
+    seed: Optional[str] = Field(None, description="打乱种子，默认 sessionId:stepId")
 
 
 class SingleSelectRequest(BaseModel):
@@ -131,6 +274,7 @@ class MultiSelectOptionsConfig(BaseModel):
     minSelect: Optional[int] = None
     maxSelect: Optional[int] = None
     shuffle: Optional[bool] = None
+    seed: Optional[str] = Field(None, description="打乱种子，默认 sessionId:stepId")
 
 
 class MultiSelectRequest(BaseModel):
@@ -145,6 +289,32 @@ class MultiSelectRequest(BaseModel):
     optionsConfig: Optional[MultiSelectOptionsConfig] = None
 
 
+# ==================== 审核步骤 - 选择题批量评分 API 模型 ====================
+
+class SelectSubmission(BaseModel):
+    """单个会话的作答"""
+    sessionId: str
+    userInput: Optional[Any] = None
+    selectedValue: Optional[str] = None
+    selectedValues: Optional[list[str]] = None
+
+
+class SingleSelectBatchRequest(BaseModel):
+    """单选批量评分请求：同一题目的多个会话作答"""
+    stepId: str
+    workflowId: str
+    optionsConfig: Optional[OptionsConfig] = None
+    submissions: list[SelectSubmission] = []
+
+
+class MultiSelectBatchRequest(BaseModel):
+    """多选批量评分请求：同一题目的多个会话作答"""
+    stepId: str
+    workflowId: str
+    optionsConfig: Optional[MultiSelectOptionsConfig] = None
+    submissions: list[SelectSubmission] = []
+
+
 # ==================== 审核步骤 - 脚本检查 API 模型 ====================
 
 class ScriptContent(BaseModel):
@@ -200,27 +370,123 @@ class Query(BaseModel):
 
 @app.post("/prompt/generate")
 def generate_prompt(query:Query):
-    with open('C:\\Users\\29884\\Desktop\\北航课题\\demo\\knowledge.json','r',encoding='utf-8') as file:
-        sample_json = json.load(file)
-    prompt = generate_prompt_from_json(sample_json, query.query, query.background, query.structure, query.replace)
+    snapshot = knowledge_store.load(KNOWLEDGE_PATH)
+    prompt = generate_prompt_from_json(
+        snapshot.data, query.query, query.background, query.structure, query.replace, version=snapshot.version
+    )
     return {"prompt": prompt}
 
+class DocumentGenerateRequest(BaseModel):
+    """按章节并发生成程序文件"""
+    query: str = Field(..., description="过程组名称")
+    background: str = ""
+    structure: str = Field("标准程序文件格式", description="文件结构，每个顶层条目（如 ** 目的）生成为一个章节")
+    replace: str = ""
+    concurrency: Optional[int] = Field(None, ge=1, le=16, description="同时生成的章节数，默认 DOC_GEN_CONCURRENCY")
+
+
+@app.post("/document/generate")
+async def generate_document(request: DocumentGenerateRequest):
+    """
+    生成程序文件：按 structure 拆分章节，共用参考上下文并发调用大模型，
+    以 NDJSON 流返回，每完成一个章节推送一行，最后一行为按顺序拼接的全文。
+    """
+    if llm_client is None:
+        return FastJSONResponse({"success": False, "message": "未安装大模型依赖"}, status_code=503)
+    # 配置错误时整体拒绝一次，而不是每个章节各报一次错
+    config_error = llm_client.generation_config_error()
+    if config_error:
+        return FastJSONResponse({"success": False, "message": config_error}, status_code=503)
+    snapshot = knowledge_store.load(KNOWLEDGE_PATH)
+    reference_prompt = await asyncio.to_thread(
+        generate_prompt_from_json,
+        snapshot.data, request.query, request.background, request.structure, request.replace,
+        version=snapshot.version,
+    )
+    if reference_prompt.startswith("错误："):
+        return FastJSONResponse({"success": False, "message": reference_prompt}, status_code=404)
+
+    sections = document_generation.split_structure(request.structure)
+    events = document_generation.generate_sections(
+        reference_prompt,
+        sections,
+        process_group=request.query,
+        concurrency=request.concurrency or document_generation.DOC_GEN_CONCURRENCY,
+    )
+
+    async def stream():
+        async for event in events:
+            yield dumps(event) + b"\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _knowledge_version() -> str:
+    return knowledge_store.load(KNOWLEDGE_PATH).version
+
+
+# 工作流中请求本服务 /prompt/generate 的 HTTP 节点直接在进程内调用
+workflow_runtime.register_local_route(
+    "/prompt/generate", lambda body: generate_prompt(Query(**body)), version=_knowledge_version
+)
+
+
+class WorkflowRunRequest(BaseModel):
+    """本地执行文档生成工作流"""
+    variables: dict[str, Any] = Field(default_factory=dict, description="全局变量，按 key 或 label 传入")
+    userChatInput: str = ""
+    useCache: bool = True
+
+
+@app.post("/api/workflows/document-generation/run")
+async def run_document_workflow(request: WorkflowRunRequest):
+    """
+    在本进程内执行 质量文档生成 工作流（WORKFLOW_PATH），无需经过 FastGPT 服务。
+    节点输出按输入摘要缓存，只修改部分变量重新执行时仅重算受影响的节点。
+    """
+    try:
+        workflow = workflow_runtime.get_workflow()
+        if llm_client is not None and workflow.has_chat_nodes:
+            config_error = llm_client.generation_config_error()
+            if config_error:
+                return FastJSONResponse({"success": False, "message": config_error}, status_code=503)
+        return await workflow.run(request.variables, request.userChatInput, use_cache=request.useCache)
+    except (OSError, workflow_runtime.WorkflowError) as e:
+        log.warning("workflow.failed", error=f"{type(e).__name__}: {e}")
+        return FastJSONResponse({"success": False, "message": str(e)}, status_code=400)
+
+
 @app.post("/knowledge/generate")
 def generate_knowledge(query:Query):
-    with open('C:\\Users\\29884\\Desktop\\北航课题\\demo\\knowledge.json','w',encoding='utf-8') as file:
-        file.write(query.query)
+    knowledge_store.save(KNOWLEDGE_PATH, query.query)
     return {"result":"OK"}
 
 @app.get("/knowledge/get")
 def get_knowledge():
-    with open('C:\\Users\\29884\\Desktop\\北航课题\\demo\\knowledge.json','r',encoding='utf-8') as file:
-        sample_json = json.load(file)
-        print(sample_json)
+    sample_json = knowledge_store.load(KNOWLEDGE_PATH).data
+    log.debug("knowledge.get", knowledge=sample_json)
     return{"knowledge":sample_json}
 
+@app.get("/knowledge/search")
+def search_knowledge(q: str, limit: int = 10):
+    """按名称查找过程域（精确或近似），返回按相似度排序的候选及其上级路径"""
+    snapshot = knowledge_store.load(KNOWLEDGE_PATH)
+    index = domain_index.get_index(snapshot.data, snapshot.version)
+    results = []
+    for node, score in index.search(q, max(1, min(limit, 50))):
+        item = node.to_dict()
+        item["score"] = score
+        item["path"] = [n.name for n in reversed(list(index.ancestors(node)))]
+        results.append(item)
+    return {"results": results}
+
 @app.get("/template/get")
 def get_template():
-    with open('C:\\Users\\29884\\Desktop\\北航课题\\demo\\template.json','r',encoding='utf-8') as file:
+    with open(TEMPLATE_PATH,'r',encoding='utf-8') as file:
         sample_json = json.load(file)
         return {
             "background":sample_json.get("background"),
@@ -230,7 +496,7 @@ def get_template():
 
 @app.post("/template/generate")
 def generate_template(query:Query):
-    with open('C:\\Users\\29884\\Desktop\\北航课题\\demo\\template.json','w',encoding='utf-8') as file:
+    with open(TEMPLATE_PATH,'w',encoding='utf-8') as file:
         content = json.dumps({"background":query.background, "structure":query.structure,"replace":query.replace})
         file.write(content)
     return {"result":"OK"}
@@ -238,24 +504,95 @@ def generate_template(query:Query):
 
 # ==================== 审核步骤 - 文件解析 API ====================
 
-def _run_file_audit_with_llm(request: FileParseRequest, text_content: str) -> dict | None:
+# 进行中的解析与大模型审核按输入摘要合并
+_parse_flight = singleflight.SingleFlight("parse")
+_audit_flight = singleflight.SingleFlight("audit")
+
+
+def _parse_upload(
+    file_bytes: bytes, digest: str, file_name: str, fmt: Optional[str], enable_ocr, extract_images
+) -> Any:
+    doc = parse_document(
+        file_bytes, file_name, fmt, enable_ocr=enable_ocr, extract_images=extract_images, cache=True, digest=digest
+    )
+    if doc.text:
+        doc.text_digest()  # 在线程池中算好全文摘要，存储与引用时直接复用
+    return doc
+
+
+def _store_document(session_id: str, workflow_id: str, file_name: Optional[str], parsed_doc: Any) -> str:
+    """存入解析出的全文并登记到会话，返回文档引用（可能读写 SQLite，需在线程池中调用）"""
+    digest = document_store.put_text(parsed_doc.text, parsed_doc.text_digest())
+    session_store.add_document(session_id, workflow_id, digest, {
+        "fileName": file_name,
+        "format": parsed_doc.format,
+        "pageCount": parsed_doc.page_count,
+        "length": len(parsed_doc.text),
+    })
+    return digest
+
+
+async def _call_audit_llm(messages: list[dict], priority: Optional[str], session_id: str) -> tuple[str, dict]:
+    """经调度器调用大模型，返回 (回复文本, 排队信息)；后端提供 token 用量时写入排队信息的 usage"""
+    queue_info: dict = {}
+    usage: dict = {}
+    response_text = await llm_scheduler.run(
+        llm_client.call_llm,
+        messages,
+        cache_ttl=llm_client.LLM_CACHE_TTL,
+        json_mode=True,
+        usage=usage,
+        priority=llm_scheduler.normalize_priority(priority),
+        session_id=session_id,
+        queue_info=queue_info,
+    )
+    if usage:
+        queue_info["usage"] = usage
+    return response_text, queue_info
+
+
+async def _run_file_audit_with_llm(
+    request: FileParseRequest, text_content: str, queue_info: Optional[dict] = None
+) -> dict | None:
     """
     使用大模型执行文件审核，返回统一审核结果。
+    parseRules 中以 @ 开头的本地规则先行检查（见 audit_rules）：硬规则不通过直接判定失败，
+    不调用大模型；其余检查结果随提示词交给大模型，并在结果的 ruleFindings 中返回。
+    本地无法确定的检查（待确认）不判定失败，即使没有其他审核依据也调用大模型核对。
+    启用 splitRules 且自然语言规则有两条以上编号时，逐条并发审核（见 _run_split_audit）。
+    调用经 llm_scheduler 按 request.priority 排队，queue_info 中写入排队位置与等待时间。
     若未配置 LLM 或调用失败，返回 None，由调用方降级处理。
     """
-    try:
-        from llm_client import call_llm, extract_json_from_text
-        from audit_prompt import build_file_audit_prompt
-    except ImportError:
-        return None
+    parse_rules = ""
+    if request.checkConfig and request.checkConfig.parseRules:
+        parse_rules = request.checkConfig.parseRules
+
+    rules = audit_rules.compile_rules(parse_rules)
+    findings = []
+    if rules.checks:
+        with metrics.span("rule_check"):
+            findings = rules.evaluate(text_content)
+        failures = audit_rules.hard_failures(findings)
+        if failures:
+            log.info("file_parse.rule_check_failed", stepId=request.stepId, failed=[f["rule"] for f in failures])
+            return {
+                "passed": False,
+                "reason": "；".join(f["message"] for f in failures),
+                "details": "本地规则预检未通过，未调用大模型",
+                "ruleFindings": findings,
+            }
 
     # 仅在具备审核依据时调用 LLM
     has_audit_input = (
         (request.reviewBackground and request.reviewBackground.strip())
         or (request.backgroundFiles and len(request.backgroundFiles) > 0)
-        or (request.checkConfig and request.checkConfig.parseRules)
+        or rules.remaining
+        or any(f["uncertain"] for f in findings)
     )
-    if not has_audit_input:
+    if not has_audit_input and findings:
+        # 规则全部为本地规则且均已确定（硬规则均已通过）
+        return {"passed": True, "reason": "", "details": "本地规则预检通过", "ruleFindings": findings}
+    if llm_client is None or not has_audit_input:
         return None
 
     bg_files = []
@@ -266,45 +603,220 @@ def _run_file_audit_with_llm(request: FileParseRequest, text_content: str) -> di
             if content:
                 bg_files.append({"fileName": name, "textContent": content})
 
-    parse_rules = ""
-    if request.checkConfig and request.checkConfig.parseRules:
-        parse_rules = request.checkConfig.parseRules
-
-    print(f"[file_parse] request.checkConfig: {request.checkConfig}")
-    print(f"[file_parse] request.reviewBackground: {request.reviewBackground}")
-    print(f"[file_parse] request.backgroundFiles: {request.backgroundFiles}")
-    print(f"[file_parse] request.file: {request.file}")
-    print(f"[file_parse] text_content: {text_content}")
-    messages = build_file_audit_prompt(
-        review_background=request.reviewBackground or "",
-        background_files=bg_files,
-        parse_rules=parse_rules,
-        file_name=request.file.name if request.file else "",
-        file_content=text_content,
+    log.debug(
+        "file_parse.audit_input",
+        stepId=request.stepId,
+        parseRules=parse_rules,
+        reviewBackground=request.reviewBackground,
+        backgroundFiles=[f["fileName"] for f in bg_files],
+        backgroundChars=sum(len(f["textContent"]) for f in bg_files),
+        textChars=len(text_content),
+    )
+    split = request.checkConfig.splitRules if request.checkConfig else None
+    preface, rule_items = (
+        audit_rules.split_numbered(rules.remaining)
+        if (FILE_AUDIT_SPLIT_RULES if split is None else split)
+        else ("", [])
     )
+    prompt_args = {
+        "review_background": request.reviewBackground or "",
+        "background_files": bg_files,
+        "file_name": request.file.name if request.file else "",
+        "file_content": text_content,
+        "rule_findings": findings,
+    }
+    if rule_items:
+        result = await _run_split_audit(request, preface, rule_items, prompt_args, queue_info)
+    else:
+        with metrics.span("prompt_build"):
+            messages = build_file_audit_prompt(parse_rules=rules.remaining, **prompt_args)
+        try:
+            audit_result, call_info, shared = await _audit_once(messages, request)
+        except Exception as e:
+            log.exception("file_parse.audit_error", stepId=request.stepId, error=f"{type(e).__name__}: {e}")
+            return None
+        if queue_info is not None:
+            queue_info.update(call_info, coalesced=shared)
+        result = {
+            "passed": audit_result["passed"],
+            "reason": audit_result["reason"],
+            "details": audit_result["details"],
+        }
+    if result is not None and findings:
+        result["ruleFindings"] = findings
+    return result
 
-    try:
-        response_text = call_llm(messages)
-        audit_result = extract_json_from_text(response_text)
-        print(f"[file_parse] audit_result: {audit_result}")
-    except Exception as e:
-        import traceback
-        print(f"[file_parse] error: {type(e).__name__}: {e}")
-        traceback.print_exc()
-        return None
+
+async def _audit_once(messages: list[dict], request: FileParseRequest) -> tuple[dict, dict, bool]:
+    """
+    一次大模型审核，返回 (规范化的审核结果, 排队信息, 是否复用了进行中的调用)。
+    审核输入（完整提示词）相同的并发请求共用一次大模型调用。
+    """
+    (response_text, call_info), shared = await _audit_flight.do(
+        shared_cache.make_key(messages),
+        lambda: _call_audit_llm(messages, request.priority, request.sessionId),
+    )
+    with metrics.span("json_extract"):
+        audit_result = llm_client.extract_json_from_text(response_text)
+    log.info("file_parse.audit_result", stepId=request.stepId, result=audit_result)
 
     # 规范化统一审核结果
     passed = audit_result.get("passed", False)
     if isinstance(passed, str):
         passed = passed.lower() in ("true", "1", "yes", "通过")
-
     return {
         "passed": bool(passed),
         "reason": str(audit_result.get("reason", "")) if not passed else "",
         "details": str(audit_result.get("details", "")),
+    }, call_info, shared
+
+
+async def _run_split_audit(
+    request: FileParseRequest, preface: str, rule_items: list[str], prompt_args: dict, queue_info: Optional[dict]
+) -> dict | None:
+    """
+    每条规则一次独立的大模型审核，并发执行；各提示词共用相同前缀（背景、参考文件、待审核文件）。
+    details 为逐条结果 [{rule, passed, reason}]，全部通过才判定通过。
+    某条规则调用失败时：已有其他规则明确不通过则照常判定不通过（失败的规则标记 error），
+    否则无法给出结论，返回 None 由调用方降级处理。
+    """
+    with metrics.span("prompt_build"):
+        prompts = build_rule_audit_prompts(
+            rules=[f"{preface}\n{rule}" if preface else rule for rule in rule_items], **prompt_args
+        )
+    outcomes = await asyncio.gather(*(_audit_once(m, request) for m in prompts), return_exceptions=True)
+
+    details, infos, errors = [], [], 0
+    for rule, outcome in zip(rule_items, outcomes):
+        if isinstance(outcome, BaseException):
+            log.error(
+                "file_parse.audit_error", stepId=request.stepId, rule=rule,
+                error=f"{type(outcome).__name__}: {outcome}",
+            )
+            errors += 1
+            details.append({"rule": rule, "passed": False, "reason": "审核调用失败", "error": True})
+            continue
+        audit_result, call_info, shared = outcome
+        infos.append({**call_info, "coalesced": shared})
+        details.append({"rule": rule, "passed": audit_result["passed"], "reason": audit_result["reason"]})
+
+    failed = [d for d in details if not d["passed"] and not d.get("error")]
+    if errors and not failed:
+        return None
+    if queue_info is not None and infos:
+        # 逐条调用同时排队：以等待最久的一条为准
+        queue_info.update(max(infos, key=lambda i: i.get("waitMs") or 0))
+        queue_info.update(subAudits=len(rule_items), coalesced=all(i["coalesced"] for i in infos))
+        usages = [i["usage"] for i in infos if i.get("usage")]
+        if usages:
+            queue_info["usage"] = {
+                key: sum(u.get(key, 0) for u in usages) for key in ("promptTokens", "completionTokens")
+            }
+    failed += [d for d in details if d.get("error")]
+    log.info("file_parse.split_audit", stepId=request.stepId, rules=len(rule_items), failed=len(failed))
+    return {
+        "passed": not failed,
+        "reason": "；".join(f"{d['rule'].splitlines()[0]}：{d['reason']}" for d in failed),
+        "details": details,
     }
 
 
+def _build_text_fields(text: str, mode: str, digest: Optional[str] = None) -> dict:
+    """
+    按响应模式构建结果中的文本字段。
+    summary/reference 模式将全文存入 document_store，仅返回引用；digest 为已知的文本摘要。
+    """
+    if mode not in ("summary", "reference"):
+        return {"textContent": text}
+
+    digest = document_store.put_text(text, digest)
+    fields = {
+        "textRef": {
+            "digest": digest,
+            "length": len(text),
+            "url": f"/api/documents/{digest}/text",
+        },
+    }
+    if mode == "summary":
+        fields["textContent"] = text[:SUMMARY_PREVIEW_CHARS]
+        fields["textTruncated"] = len(text) > SUMMARY_PREVIEW_CHARS
+    return fields
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(range_header: str, size: int) -> Optional[tuple[int, int]]:
+    """解析单段 Range 请求头，返回闭区间 (start, end)；不可满足返回 None"""
+    match = _RANGE_RE.match(range_header.strip())
+    if size == 0 or not match or not any(match.groups()):
+        # 空文档没有可满足的范围
+        return None
+    start_s, end_s = match.groups()
+    if not start_s:
+        # bytes=-N：最后 N 个字节
+        length = int(end_s)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+@app.get("/api/documents/{digest}/text")
+def get_document_text(digest: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    获取 file-parse 以引用方式返回的文档全文（UTF-8 纯文本），支持 Range 分段读取。
+    """
+    data = document_store.get_bytes(digest)
+    if data is None:
+        return Response(status_code=404, content="文档不存在或已过期", media_type="text/plain; charset=utf-8")
+
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{digest}"'}
+    if not range_header:
+        return Response(content=data, media_type="text/plain; charset=utf-8", headers=headers)
+
+    byte_range = _parse_range(range_header, len(data))
+    if byte_range is None:
+        headers["Content-Range"] = f"bytes */{len(data)}"
+        return Response(status_code=416, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(
+        status_code=206,
+        content=data[start:end + 1],
+        media_type="text/plain; charset=utf-8",
+        headers=headers,
+    )
+
+
+@app.get("/api/sessions/{session_id}")
+def get_session(session_id: str):
+    """会话中已完成步骤的结果与已解析文档列表"""
+    session = session_store.get_session(session_id)
+    if session is None:
+        return FastJSONResponse({"success": False, "message": "会话不存在或已过期"}, status_code=404)
+    return session
+
+
+@app.get("/api/sessions/{session_id}/steps/{step_id}")
+def get_session_step(session_id: str, step_id: str):
+    """会话中单个步骤的结果"""
+    step = session_store.get_step(session_id, step_id)
+    if step is None:
+        return FastJSONResponse({"success": False, "message": "步骤结果不存在"}, status_code=404)
+    return step
+
+
+@app.delete("/api/sessions/{session_id}")
+def delete_session(session_id: str):
+    return {"success": session_store.delete_session(session_id)}
+
+
 @app.post("/api/steps/file-parse")
 async def file_parse(
     file: Optional[UploadFile] = File(None),
@@ -315,167 +827,293 @@ async def file_parse(
     reviewBackground: Optional[str] = Form(None),
     parseRules: Optional[str] = Form(None),
     backgroundFiles: Optional[str] = Form(None),
+    parseOptions: Optional[str] = Form(None),
+    responseMode: Optional[str] = Form(None),
+    documentRef: Optional[str] = Form(None),
+    priority: Optional[str] = Form(None),
+    splitRules: Optional[bool] = Form(None),
 ):
     """
     审核步骤 - 文件解析接口
     支持 multipart/form-data 文件上传，也支持直接传入 textContent（向后兼容）。
+    parseOptions 为 ParseOptions 的 JSON 字符串，format 可显式指定文件格式，
+    enableOcr/extractImages 控制扫描件与嵌入图片的 OCR 识别，pageRange 只取指定页参与审核，
+    extractTables 为真时在结果中附带解析出的表格。
+    responseMode 控制返回的文本内容：full（全文）、summary（预览 + 引用）、
+    reference（仅引用，全文通过 GET /api/documents/{digest}/text 按需获取）。
+    解析结果登记到会话（metadata.documentRef），后续步骤可传 documentRef 代替重新上传文件，
+    backgroundFiles 中的条目同样可用 documentRef 引用会话内的文档。
+    priority 指定大模型调用优先级（interactive / sub_workflow / batch），批量提交的审核应传 batch，
+    排队位置、预计等待与实际等待时间见 metadata.llmQueue。
     根据审核背景、背景技术文件、解析规则自动生成提示词，调用大模型执行审核。
     返回统一的审核步骤结果（JSON）：是否通过、不通过原因。
     """
-    print(f"[file_parse] stepId={stepId}, file={file.filename if file else None}")
-    start_time = time.time()
-
-    text_content_result = ""
-    file_name = None
-    file_size = 0
-
-    if file is not None:
-        file_bytes = await file.read()
-        file_name = file.filename
-        file_size = len(file_bytes)
-        text_content_result = parse_file(file_bytes, file_name or "")
+    with metrics.collect_timings() as timings:
+        log.info("file_parse.start", stepId=stepId, sessionId=sessionId, file=file.filename if file else None)
+        start_time = time.time()
+
+        text_content_result = ""
+        file_name = None
+        file_size = 0
+        parsed_doc = None
+        text_digest = None  # text_content_result 的摘要（已知时）
+        coalesced: list[str] = []
+
+        parse_options = None
+        if parseOptions:
+            try:
+                parse_options = ParseOptions(**json.loads(parseOptions))
+            except (json.JSONDecodeError, TypeError, ValueError):
+                parse_options = None
+
+        if file is not None:
+            with metrics.span("upload_read"):
+                file_bytes = await file.read()
+            file_name = file.filename
+            file_size = len(file_bytes)
+            parse_args = (
+                file_name or "",
+                parse_options.format if parse_options else None,
+                parse_options.enableOcr if parse_options else None,
+                parse_options.extractImages if parse_options else None,
+            )
+            # 相同文件与解析参数的并发请求共用一次解析（解析在线程池中执行，不阻塞事件循环）；
+            # 文件摘要只算一次，同时用作合并键与解析缓存键
+            file_digest = hashlib.sha256(file_bytes).hexdigest()
+            parsed_doc, parse_shared = await _parse_flight.do(
+                (file_digest, *parse_args),
+                lambda: asyncio.to_thread(_parse_upload, file_bytes, file_digest, *parse_args),
+            )
+            if parse_shared:
+                coalesced.append("parse")
+            metrics.record("parse", parsed_doc.duration_ms / 1000, format=parsed_doc.format or "unknown")
+            if parse_options and parse_options.pageRange:
+                text_content_result = parsed_doc.page_range(parse_options.pageRange.start, parse_options.pageRange.end)
+            else:
+                text_content_result = parsed_doc.text
+                text_digest = parsed_doc.text_digest() if parsed_doc.text else None
+            if sessionId and parsed_doc.text:
+                documentRef = await asyncio.to_thread(_store_document, sessionId, workflowId, file_name, parsed_doc)
+        elif documentRef:
+            text_content_result = await asyncio.to_thread(session_store.get_document_text, documentRef)
+            text_digest = documentRef
+            if text_content_result is None:
+                return step_response(
+                    None,
+                    message="引用的文档不存在或已过期",
+                    success=False,
+                    duration_ms=int((time.time() - start_time) * 1000),
+                )
     
-    if not text_content_result and textContent:
-        text_content_result = textContent
-
-    bg_files_parsed = None
-    if backgroundFiles:
-        try:
-            bg_files_parsed = json.loads(backgroundFiles)
-        except json.JSONDecodeError:
-            bg_files_parsed = None
-
-    request = FileParseRequest(
-        stepId=stepId,
-        workflowId=workflowId,
-        sessionId=sessionId,
-        textContent=text_content_result,
-        reviewBackground=reviewBackground,
-        backgroundFiles=[BackgroundFileItem(**bf) for bf in bg_files_parsed] if bg_files_parsed else None,
-        checkConfig=CheckConfig(parseRules=parseRules) if parseRules else None,
-    )
-
-    metadata = {
-        "pageCount": 1,
-        "author": "system",
-        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
-    }
-    if file_name:
-        metadata["fileName"] = file_name
-        metadata["fileSize"] = file_size
-
-    audit_result = _run_file_audit_with_llm(request, text_content_result)
-
-    duration_ms = int((time.time() - start_time) * 1000)
-
-    if audit_result is not None:
-        passed = audit_result["passed"]
-        msg = "审核通过" if passed else f"审核未通过：{audit_result.get('reason', '')}"
-        return {
-            "success": passed,
-            "code": 200 if passed else 400,
-            "message": msg,
-            "data": {
-                "success": passed,
-                "message": msg,
-                "data": {
-                    "textContent": text_content_result,
-                    "metadata": metadata,
-                    "auditResult": audit_result,
-                },
-                "duration": duration_ms,
-            },
-            "timestamp": int(time.time() * 1000),
+        if not text_content_result and textContent:
+            text_content_result = textContent
+            text_digest = None
+
+        bg_files_parsed = None
+        if backgroundFiles:
+            try:
+                bg_files_parsed = json.loads(backgroundFiles)
+            except json.JSONDecodeError:
+                bg_files_parsed = None
+
+        background_items = [BackgroundFileItem(**bf) for bf in bg_files_parsed] if bg_files_parsed else None
+        for item in background_items or []:
+            if item.documentRef and not (item.textContent or item.content):
+                item.textContent = await asyncio.to_thread(session_store.get_document_text, item.documentRef)
+
+        request = FileParseRequest(
+            stepId=stepId,
+            workflowId=workflowId,
+            sessionId=sessionId,
+            textContent=text_content_result,
+            parseOptions=parse_options,
+            reviewBackground=reviewBackground,
+            backgroundFiles=background_items,
+            checkConfig=CheckConfig(parseRules=parseRules, splitRules=splitRules) if parseRules else None,
+            priority=priority,
+        )
+
+        metadata = {
+            "pageCount": 1,
+            "author": "system",
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
         }
-
-    return {
-        "success": True,
-        "code": 200,
-        "message": "文件解析成功（未执行大模型审核）",
-        "data": {
-            "success": True,
-            "message": "文件解析成功",
-            "data": {
-                "textContent": text_content_result,
-                "metadata": metadata,
-            },
-            "duration": duration_ms,
-        },
-        "timestamp": int(time.time() * 1000),
-    }
+        if file_name:
+            metadata["fileName"] = file_name
+            metadata["fileSize"] = file_size
+        if parsed_doc is not None and parsed_doc.format:
+            metadata.update(parsed_doc.to_metadata())
+        if documentRef:
+            metadata["documentRef"] = documentRef
+
+        extra_data = {}
+        if parsed_doc is not None and parse_options and parse_options.extractTables:
+            extra_data["tables"] = parsed_doc.tables
+
+        queue_info: dict = {}
+        audit_result = await _run_file_audit_with_llm(request, text_content_result, queue_info)
+        if "usage" in queue_info:
+            metadata["llmUsage"] = queue_info.pop("usage")
+        if queue_info:
+            metadata["llmQueue"] = queue_info
+            if queue_info.get("coalesced"):
+                coalesced.append("audit")
+        if coalesced:
+            metadata["coalesced"] = coalesced
+        text_fields = _build_text_fields(text_content_result, responseMode or FILE_PARSE_RESPONSE_MODE, text_digest)
+
+        duration_ms = int((time.time() - start_time) * 1000)
+        timings["total"] = duration_ms
+        metadata["timings"] = timings
+
+        result_data = {**text_fields, "metadata": metadata, **extra_data}
+        if audit_result is not None:
+            passed = audit_result["passed"]
+            msg = "审核通过" if passed else f"审核未通过：{audit_result.get('reason', '')}"
+            result_data["auditResult"] = audit_result
+            response_args = {"message": msg, "success": passed}
+        else:
+            response_args = {"message": "文件解析成功（未执行大模型审核）", "inner_message": "文件解析成功"}
+
+        # 会话中只保存文本引用，全文由 documentRef 指向
+        await asyncio.to_thread(
+            session_store.record_step,
+            sessionId,
+            workflowId,
+            stepId,
+            request.stepType,
+            {k: v for k, v in result_data.items() if k not in ("textContent", "textRef")},
+            success=response_args.get("success", True),
+            message=response_args["message"],
+        )
+
+    # 序列化耗时只能进入 /metrics，无法写进已序列化的响应本身
+    with metrics.span("serialize"):
+        return step_response(result_data, duration_ms=duration_ms, **response_args)
 
 
 # ==================== 审核步骤 - 问答交互 API ====================
 
+def _step_result(request, data: Any, *, message: str, duration_ms: int, success: bool = True, **kwargs):
+    """把步骤结果记入会话，并构造统一返回结构"""
+    session_store.record_step(
+        request.sessionId, request.workflowId, request.stepId, request.stepType, data,
+        success=success, message=message,
+    )
+    return step_response(data, message=message, duration_ms=duration_ms, success=success, **kwargs)
+
+
 @app.post("/api/steps/qa-interaction")
-def qa_interaction(request: QAInteractionRequest):
+async def qa_interaction(request: QAInteractionRequest):
     """
     审核步骤 - 问答交互接口
-    仅接收请求参数并构建返回，不做具体处理。
+    先按参考答案做本地校验，仅模糊回答（且开启 useAiValidation）合并批量交给大模型判定。
     """
     start_time = time.time()
     answer = request.answer or (str(request.userInput) if request.userInput is not None else "")
-    question = request.questionConfig.question if request.questionConfig else ""
+    config = request.questionConfig or QuestionConfig()
+    question = config.question or ""
+
+    validation = await qa_validation.validate_answer(
+        answer,
+        question=question,
+        expected=config.expectedAnswer,
+        use_ai=bool(config.useAiValidation),
+        criteria=config.aiValidationPrompt,
+    )
 
     duration_ms = int((time.time() - start_time) * 1000)
 
-    return {
-        "success": True,
-        "code": 200,
-        "message": "问答交互完成",
-        "data": {
-            "success": True,
-            "message": "问答交互完成",
-            "data": {
-                "question": question,
-                "answer": answer,
-                "validation": {
-                    "isValid": True,
-                    "score": 100,
-                    "feedback": "回答符合预期",
-                },
-            },
-            "duration": duration_ms,
+    return _step_result(
+        request,
+        {
+            "question": question,
+            "answer": answer,
+            "validation": validation,
         },
-        "timestamp": int(time.time() * 1000),
-    }
+        message="回答符合预期" if validation["isValid"] else f"回答不符合预期：{validation['feedback']}",
+        success=validation["isValid"],
+        duration_ms=duration_ms,
+    )
 
 
 # ==================== 审核步骤 - 单选 API ====================
 
+def _compile_options(config) -> select_scoring.CompiledOptions:
+    if config is None:
+        return select_scoring.compile_options(())
+    return select_scoring.compile_options(
+        ((o.label, o.value, o.isCorrect) for o in config.options),
+        getattr(config, "minSelect", None),
+        getattr(config, "maxSelect", None),
+    )
+
+
+def _shuffle_seed(config, session_id: str, step_id: str) -> Optional[str]:
+    if config is None or not config.shuffle:
+        return None
+    return config.seed if config.seed is not None else f"{session_id}:{step_id}"
+
+
+def _single_selected(selected_value: Optional[str], user_input: Any) -> str:
+    return selected_value or (str(user_input) if user_input is not None else "")
+
+
+def _multi_selected(selected_values: Optional[list[str]], user_input: Any) -> list[str]:
+    if selected_values:
+        return selected_values
+    if user_input is None:
+        return []
+    return [str(v) for v in user_input] if isinstance(user_input, (list, tuple)) else [str(user_input)]
+
+
 @app.post("/api/steps/single-select")
 def single_select(request: SingleSelectRequest):
     """
     审核步骤 - 单选验证接口
-    仅接收请求参数并构建返回，不做具体处理。
+    按选项的 isCorrect 判定是否答对；未标注正确选项时 isCorrect 为 None。
     """
     start_time = time.time()
-    selected_value = request.selectedValue or (str(request.userInput) if request.userInput is not None else "")
-    selected_label = ""
-    if request.optionsConfig and request.optionsConfig.options:
-        for opt in request.optionsConfig.options:
-            if opt.value == selected_value:
-                selected_label = opt.label
-                break
+    compiled = _compile_options(request.optionsConfig)
+    result = select_scoring.grade_single(compiled, _single_selected(request.selectedValue, request.userInput))
+    seed = _shuffle_seed(request.optionsConfig, request.sessionId, request.stepId)
+    if seed is not None:
+        result["options"] = select_scoring.display_options(compiled, seed)
 
     duration_ms = int((time.time() - start_time) * 1000)
 
-    return {
-        "success": True,
-        "code": 200,
-        "message": "已选择",
-        "data": {
-            "success": True,
-            "message": "已选择",
-            "data": {
-                "selectedValue": selected_value,
-                "selectedLabel": selected_label,
-                "isCorrect": None,
-            },
-            "duration": duration_ms,
-        },
-        "timestamp": int(time.time() * 1000),
-    }
+    if not result["isValid"] and compiled.values:
+        return _step_result(request, result, message="所选选项不存在", success=False, duration_ms=duration_ms)
+    if result["isCorrect"] is None:
+        message = "已选择"
+    else:
+        message = "回答正确" if result["isCorrect"] else "回答错误"
+    return _step_result(request, result, message=message, duration_ms=duration_ms)
+
+
+@app.post("/api/steps/single-select/batch")
+def single_select_batch(request: SingleSelectBatchRequest):
+    """单选批量评分：选项配置只编译一次，逐个会话评分"""
+    start_time = time.time()
+    compiled = _compile_options(request.optionsConfig)
+    results = []
+    for sub in request.submissions:
+        result = select_scoring.grade_single(compiled, _single_selected(sub.selectedValue, sub.userInput))
+        results.append(result)
+    session_store.record_steps(request.workflowId, request.stepId, "single_select", [
+        (sub.sessionId, result, result["isCorrect"] is not False and result["isValid"])
+        for sub, result in zip(request.submissions, results)
+    ])
+    for sub, result in zip(request.submissions, results):
+        result["sessionId"] = sub.sessionId
+
+    duration_ms = int((time.time() - start_time) * 1000)
+
+    return step_response(
+        {"results": results, "summary": select_scoring.summarize(results, "isCorrect")},
+        message="批量评分完成",
+        duration_ms=duration_ms,
+    )
 
 
 # ==================== 审核步骤 - 多选 API ====================
@@ -484,42 +1122,49 @@ def single_select(request: SingleSelectRequest):
 def multi_select(request: MultiSelectRequest):
     """
     审核步骤 - 多选验证接口
-    仅接收请求参数并构建返回，不做具体处理。
+    按选项的 isCorrect 计算选对/选错/漏选数与得分，并校验 minSelect/maxSelect。
     """
     start_time = time.time()
-    selected_values = request.selectedValues or []
-    if not selected_values and request.userInput is not None:
-        selected_values = list(request.userInput) if isinstance(request.userInput, (list, tuple)) else [str(request.userInput)]
+    compiled = _compile_options(request.optionsConfig)
+    result = select_scoring.grade_multi(compiled, _multi_selected(request.selectedValues, request.userInput))
+    seed = _shuffle_seed(request.optionsConfig, request.sessionId, request.stepId)
+    if seed is not None:
+        result["options"] = select_scoring.display_options(compiled, seed)
+
+    duration_ms = int((time.time() - start_time) * 1000)
 
-    selected_labels = []
-    if request.optionsConfig and request.optionsConfig.options:
-        value_to_label = {opt.value: opt.label for opt in request.optionsConfig.options}
-        selected_labels = [value_to_label.get(v, "") for v in selected_values]
+    if result["constraintError"]:
+        return _step_result(request, result, message=result["constraintError"], success=False, duration_ms=duration_ms)
+    if result["isFullyCorrect"] is None:
+        message = "已选择"
+    else:
+        message = "回答正确" if result["isFullyCorrect"] else f"得分 {result['score']}"
+    return _step_result(request, result, message=message, duration_ms=duration_ms)
+
+
+@app.post("/api/steps/multi-select/batch")
+def multi_select_batch(request: MultiSelectBatchRequest):
+    """多选批量评分：选项配置只编译一次，逐个会话评分"""
+    start_time = time.time()
+    compiled = _compile_options(request.optionsConfig)
+    results = []
+    for sub in request.submissions:
+        result = select_scoring.grade_multi(compiled, _multi_selected(sub.selectedValues, sub.userInput))
+        results.append(result)
+    session_store.record_steps(request.workflowId, request.stepId, "multi_select", [
+        (sub.sessionId, result, result["isFullyCorrect"] is not False and result["isValid"])
+        for sub, result in zip(request.submissions, results)
+    ])
+    for sub, result in zip(request.submissions, results):
+        result["sessionId"] = sub.sessionId
 
     duration_ms = int((time.time() - start_time) * 1000)
 
-    return {
-        "success": True,
-        "code": 200,
-        "message": "已选择",
-        "data": {
-            "success": True,
-            "message": "已选择",
-            "data": {
-                "selectedValues": selected_values,
-                "selectedLabels": selected_labels,
-                "score": 100,
-                "isFullyCorrect": None,
-                "scoreDetails": {
-                    "correctCount": len(selected_values),
-                    "incorrectCount": 0,
-                    "missedCount": 0,
-                },
-            },
-            "duration": duration_ms,
-        },
-        "timestamp": int(time.time() * 1000),
-    }
+    return step_response(
+        {"results": results, "summary": select_scoring.summarize(results, "isFullyCorrect")},
+        message="批量评分完成",
+        duration_ms=duration_ms,
+    )
 
 
 # ==================== 审核步骤 - 脚本检查 API ====================
@@ -528,36 +1173,63 @@ def multi_select(request: MultiSelectRequest):
 def script_check(request: ScriptCheckRequest):
     """
     审核步骤 - 脚本执行检查接口
-    仅接收请求参数并构建返回，不做具体处理。
+    在沙箱工作进程中执行 python / javascript / sql 脚本，按脚本结论判定是否通过。
+    executionParams.timeout 单位为毫秒，memoryLimit 单位为 MB。
     """
     start_time = time.time()
     script_content = request.script.content if request.script else ""
-    script_language = request.script.language if request.script else "javascript"
+    script_language = (request.script.language if request.script else None) or "javascript"
+    params = request.executionParams or ExecutionParams()
 
-    duration_ms = int((time.time() - start_time) * 1000)
+    if not script_content.strip():
+        return _step_result(request, None, message="脚本内容为空", success=False, duration_ms=int((time.time() - start_time) * 1000))
 
-    return {
-        "success": True,
-        "code": 200,
-        "message": "脚本检查完成",
-        "data": {
-            "success": True,
-            "message": "脚本检查完成",
-            "data": {
-                "result": {"success": True},
-                "stdout": "",
-                "stderr": "",
-                "executionTime": duration_ms,
-                "passed": True,
-                "checkDetails": [
-                    {"name": "语法检查", "passed": True},
-                    {"name": "逻辑验证", "passed": True},
-                ],
-            },
-            "duration": duration_ms,
+    try:
+        with metrics.span("script_exec", format=script_language):
+            outcome = script_runner.run_script(
+                script_language,
+                script_content,
+                input_data=params.inputData,
+                env=params.env,
+                timeout_ms=params.timeout,
+                memory_mb=params.memoryLimit,
+            )
+    except (ValueError, RuntimeError) as e:
+        return _step_result(request, None, message=str(e), success=False, duration_ms=int((time.time() - start_time) * 1000))
+
+    log.info(
+        "script_check.result",
+        stepId=request.stepId,
+        language=script_language,
+        passed=outcome["passed"],
+        error=outcome.get("error"),
+        executionTime=outcome.get("executionTime"),
+    )
+    duration_ms = int((time.time() - start_time) * 1000)
+    passed = outcome["passed"]
+    if passed:
+        message = "脚本检查通过"
+    elif outcome.get("error"):
+        message = f"脚本检查未通过：{outcome['error']}"
+    else:
+        message = "脚本检查未通过"
+
+    return _step_result(
+        request,
+        {
+            "result": outcome.get("result"),
+            "stdout": outcome.get("stdout", ""),
+            "stderr": outcome.get("stderr", ""),
+            "executionTime": outcome.get("executionTime", duration_ms),
+            "passed": passed,
+            "timedOut": outcome.get("timedOut", False),
+            "error": outcome.get("error"),
+            "checkDetails": outcome.get("checkDetails", []),
         },
-        "timestamp": int(time.time() * 1000),
-    }
+        message=message,
+        success=passed,
+        duration_ms=duration_ms,
+    )
 
 
 # ==================== 审核步骤 - 子流程 API ====================
@@ -572,25 +1244,22 @@ def sub_workflow(request: SubWorkflowRequest):
 
     duration_ms = int((time.time() - start_time) * 1000)
 
-    return {
-        "success": True,
-        "code": 200,
-        "message": "子流程执行完成",
-        "data": {
-            "success": True,
-            "message": "子流程执行完成",
-            "data": {
-                "status": "completed",
-                "totalSteps": 0,
-                "completedSteps": 0,
-                "stepResults": [],
-                "overallResult": {
-                    "success": True,
-                    "passedSteps": 0,
-                    "failedSteps": 0,
-                },
+    return _step_result(
+        request,
+        {
+            "status": "completed",
+            "totalSteps": 0,
+            "completedSteps": 0,
+            "stepResults": [],
+            "overallResult": {
+                "success": True,
+                "passedSteps": 0,
+                "failedSteps": 0,
             },
-            "duration": duration_ms,
         },
-        "timestamp": int(time.time() * 1000),
-    }
\ No newline at end of file
+        message="子流程执行完成",
+        duration_ms=duration_ms,
+    )
+
+
+warmup.record_import(__name__, time.perf_counter() - _IMPORT_START)
@@ -18,6 +18,52 @@ AUDIT_RESULT_SCHEMA = """
 """
 
 
+_AUDIT_SYSTEM_PROMPT = f"""你是一个专业的质量审核助手。你的任务是根据审核背景、参考技术文件和解析规则，对提交的待审核文件进行合规性审核。
+
+请严格按照以下规则进行评估：
+1. 结合审核背景理解审核目标；
+2. 参考背景技术文件中的要求、标准或规范；
+3. 依据解析规则逐项检查待审核文件；
+4. 给出明确的审核结论（通过/不通过）及理由。
+
+{AUDIT_RESULT_SCHEMA}
+"""
+
+
+def _format_background_files(background_files: list[dict[str, Any]] | None) -> str:
+    """背景技术文件内容拼接"""
+    bg_sections = []
+    for f in background_files or []:
+        name = f.get("fileName", f.get("name", "未知文件"))
+        content = f.get("textContent", f.get("content", ""))
+        if content:
+            bg_sections.append(f"### {name}\n```\n{content[:15000]}\n```")  # 限制长度
+    return "\n\n".join(bg_sections) if bg_sections else "（无背景技术文件）"
+
+
+def _format_rule_findings(rule_findings: list[dict[str, Any]] | None) -> str:
+    if not rule_findings:
+        return ""
+    lines = [
+        f"- [{'待确认' if f.get('uncertain') else '通过' if f['passed'] else '不通过'}] "
+        f"{f['rule'].lstrip('@')}：{f['message']}"
+        for f in rule_findings
+    ]
+    return (
+        "## 本地规则预检结果（通过/不通过为程序确定性检查，可直接作为审核依据；"
+        "待确认为程序无法确定的项，请对照待审核文件内容判断）\n" + "\n".join(lines) + "\n\n"
+    )
+
+
+def _format_file(file_name: str, file_content: str) -> str:
+    return f"""## 待审核文件
+- 文件名：{file_name or "未命名"}
+- 内容：
+```
+{file_content[:30000] if file_content else "（文件内容为空）"}
+```"""
+
+
 def build_file_audit_prompt(
     *,
     review_background: str = "",
@@ -25,6 +71,7 @@ def build_file_audit_prompt(
     parse_rules: str = "",
     file_name: str = "",
     file_content: str = "",
+    rule_findings: list[dict[str, Any]] | None = None,
 ) -> list[dict[str, str]]:
     """
     构建文件审核的提示词（系统提示 + 用户消息）。
@@ -35,53 +82,117 @@ def build_file_audit_prompt(
         parse_rules: 审核步骤中配置的解析规则
         file_name: 待审核文件名
         file_content: 待审核文件内容
+        rule_findings: 本地规则预检结果 [{"rule", "passed", "hard", "uncertain", "message"}]（见 audit_rules）
 
     Returns:
         messages 列表，可直接传入 call_llm
     """
-    background_files = background_files or []
-
-    # 背景技术文件内容拼接
-    bg_sections = []
-    for f in background_files:
-        name = f.get("fileName", f.get("name", "未知文件"))
-        content = f.get("textContent", f.get("content", ""))
-        if content:
-            bg_sections.append(f"### {name}\n```\n{content[:15000]}\n```")  # 限制长度
-
-    bg_text = "\n\n".join(bg_sections) if bg_sections else "（无背景技术文件）"
     rules_text = parse_rules.strip() or "无具体解析规则，请基于通用质量审核标准进行评估。"
     background_text = review_background.strip() or "无特定审核背景。"
 
-    system_prompt = f"""你是一个专业的质量审核助手。你的任务是根据审核背景、参考技术文件和解析规则，对提交的待审核文件进行合规性审核。
-
-请严格按照以下规则进行评估：
-1. 结合审核背景理解审核目标；
-2. 参考背景技术文件中的要求、标准或规范；
-3. 依据解析规则逐项检查待审核文件；
-4. 给出明确的审核结论（通过/不通过）及理由。
-
-{AUDIT_RESULT_SCHEMA}
-"""
-
     user_content = f"""## 审核背景
 {background_text}
 
 ## 参考背景技术文件
-{bg_text}
+{_format_background_files(background_files)}
 
 ## 解析规则（本步骤的审核依据）
 {rules_text}
 
-## 待审核文件
-- 文件名：{file_name or "未命名"}
-- 内容：
-```
-{file_content[:30000] if file_content else "（文件内容为空）"}
-```
+{_format_rule_findings(rule_findings)}{_format_file(file_name, file_content)}
 
 请根据上述信息进行审核，并仅返回符合格式要求的 JSON 审核结果。"""
 
+    return [
+        {"role": "system", "content": _AUDIT_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def build_rule_audit_prompts(
+    *,
+    review_background: str = "",
+    background_files: list[dict[str, Any]] | None = None,
+    rules: list[str],
+    file_name: str = "",
+    file_content: str = "",
+    rule_findings: list[dict[str, Any]] | None = None,
+) -> list[list[dict[str, str]]]:
+    """
+    按规则拆分的审核提示词：每条规则一组 messages，可并发调用。
+
+    各组的系统提示与用户消息前半部分（背景、参考文件、预检结果、待审核文件）完全相同，
+    只有末尾的规则不同，便于大模型服务复用相同前缀的缓存。
+    """
+    background_text = review_background.strip() or "无特定审核背景。"
+    prefix = f"""## 审核背景
+{background_text}
+
+## 参考背景技术文件
+{_format_background_files(background_files)}
+
+{_format_rule_findings(rule_findings)}{_format_file(file_name, file_content)}
+
+## 本次只检查以下一条解析规则
+"""
+    suffix = "\n\n只依据这一条规则判断是否通过，不要评价其他方面，并仅返回符合格式要求的 JSON 审核结果。"
+    return [
+        [
+            {"role": "system", "content": _AUDIT_SYSTEM_PROMPT},
+            {"role": "user", "content": prefix + rule.strip() + suffix},
+        ]
+        for rule in rules
+    ]
+
+
+# 问答批量校验结果的 JSON schema 说明
+QA_VALIDATION_SCHEMA = """
+请以严格的 JSON 格式返回每个回答的校验结果，且只返回 JSON，不要包含其他说明文字。
+格式如下：
+{
+  "results": [
+    {"id": 回答编号, "isValid": true 或 false, "score": 0-100 的整数, "feedback": "简短评语"}
+  ]
+}
+results 中必须包含每一个回答编号。
+"""
+
+
+def build_qa_validation_prompt(items: list[dict[str, Any]]) -> list[dict[str, str]]:
+    """
+    构建问答批量校验的提示词，多个回答合并到一次调用中。
+
+    Args:
+        items: [{"id": 编号, "question": "...", "expectedAnswer": "...", "answer": "...",
+                 "criteria": "可选，步骤配置的 aiValidationPrompt"}]
+
+    Returns:
+        messages 列表，可直接传入 call_llm
+    """
+    system_prompt = f"""你是一个专业的质量培训考核助手。你的任务是判断每个回答是否在语义上符合参考答案的要求。
+
+请逐条评估：
+1. 回答与参考答案表达方式不同但含义一致时视为正确；
+2. 回答遗漏关键要点或存在事实错误时视为不正确；
+3. 若给出了评判要求，优先按评判要求判断。
+
+{QA_VALIDATION_SCHEMA}
+"""
+
+    sections = []
+    for item in items:
+        lines = [
+            f"### 回答 {item['id']}",
+            f"- 问题：{item.get('question') or '（未提供）'}",
+            f"- 参考答案：{item.get('expectedAnswer') or '（未提供）'}",
+        ]
+        if item.get("criteria"):
+            lines.append(f"- 评判要求：{item['criteria']}")
+        lines.append(f"- 回答：{item.get('answer', '')[:2000]}")
+        sections.append("\n".join(lines))
+
+    user_content = "\n\n".join(sections) + "\n\n请对以上每个回答进行校验，并仅返回符合格式要求的 JSON。"
+
     return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_content},
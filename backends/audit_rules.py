@@ -0,0 +1,303 @@
+"""
+审核规则预检 - parseRules 中以 @ 开头的行编译为本地检查，在调用大模型之前对解析出的文本执行
+
+规则语法（每行一条，参数以空白或逗号分隔）：
+  @required 字段[,字段...]        字段存在且填写了值（"字段：值" 形式）
+  @signed 字段[,字段...]          字段已签署：值不能为空或 "/"、"无"、"待签" 等占位内容
+  @contains 文本                  全文包含该文本
+  @regex 正则                     全文匹配该正则
+  @forbid 正则                    全文不得匹配该正则
+  @pattern 字段 正则              字段值完整匹配该正则，如 @pattern 返修工艺编号 FX-\\d{4}
+  @date_order 字段A < 字段B       两个字段的日期先后（< 严格早于，<= 不晚于）
+规则名前加 soft（如 "@soft signed 批准"）表示软规则：不通过只作为发现交给大模型参考，不直接判定失败。
+
+字段按以下形式识别（docx/xlsx 表格每行输出为一行，单元格以 " | " 分隔）：
+  "标签：值"、"标签（说明）：值"     值到连续空白、下一个 "标签："、单元格分隔符或行尾为止
+  "标签： | 值"、"标签 | 值"          表格中值在下一个单元格
+冒号后为空白、"|" 或紧接下一个标签时值为空。无法确定字段值时（如冒号与后续文字间隔较宽、
+标签出现在文中但不是上述形式）检查结果为"待确认"，不判定失败，交给大模型核对原文。
+
+硬规则不通过时直接判定审核不通过，不调用大模型；其余发现（含待确认）随提示词交给大模型。
+不以 @ 开头的行保持原样作为自然语言规则交给大模型；无法识别的 @ 规则同样按自然语言处理。
+自然语言规则可按编号拆分（split_numbered），每条单独审核。
+"""
+
+import datetime
+import functools
+import re
+from typing import Any, Callable, Optional
+
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+# 未签署时常见的占位内容
+_PLACEHOLDERS = {"", "/", "／", "\\", "无", "空", "未签", "待签", "未填", "待定", "n/a", "na", "none"}
+_DATE_RE = re.compile(r"(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})")
+_SPLIT_RE = re.compile(r"[\s,，、]+")
+# 编号规则的起始：1. / 1、 / 1) / (1) / （1） / 一、；"." 后紧跟数字的是日期或版本号（2024.01、3.5），不是编号
+_NUMBERED_RE = re.compile(r"^\s*(?:\d+\s*(?:[、)）]|\.(?!\d))|[（(]\d+[)）]|[一二三四五六七八九十]+、)")
+# 标签后的括号说明，如 "军检（如需要）："
+_NOTE = r"(?:\s*[（(][^（）()|\n]{0,20}[)）])?"
+# 另一个字段的开始："标签："
+_LABEL = rf"[一-龥A-Za-z]{{1,12}}{_NOTE}\s*[:：]"
+_LABEL_START_RE = re.compile(_LABEL)
+# 冒号后的值：至多跳过一个空格，到连续空白、下一个 "标签：" 或单元格末尾为止
+_VALUE_RE = re.compile(rf"[ 　]?(.*?)(?=\s{{2,}}|\t|\s+{_LABEL}|\s*$)")
+_CELL_SEP_RE = re.compile(r"\s*\|\s*")
+
+
+def _field_re(label: str) -> re.Pattern:
+    """字段标签（可带括号说明），colon 组为其后的冒号"""
+    return re.compile(rf"{re.escape(label)}{_NOTE}\s*(?P<colon>[:：])?")
+
+
+class Check:
+    """一条编译后的本地规则"""
+
+    __slots__ = ("rule", "hard", "func")
+
+    def __init__(self, rule: str, hard: bool, func: Callable[[str], tuple[Optional[bool], str]]):
+        self.rule = rule
+        self.hard = hard
+        self.func = func
+
+    def evaluate(self, text: str) -> dict[str, Any]:
+        # 检查函数返回 None 表示无法确定（待确认）
+        passed, message = self.func(text)
+        return {
+            "rule": self.rule,
+            "passed": bool(passed),
+            "hard": self.hard,
+            "uncertain": passed is None,
+            "message": message,
+        }
+
+
+def _cell_value(cell: str) -> tuple[str, bool]:
+    """表格中标签右侧单元格的值；该单元格是另一个 "标签：" 时值为空"""
+    return ("", True) if _LABEL_START_RE.match(cell) else (cell.strip(), True)
+
+
+def _colon_value(rest: str, next_cell: Optional[str]) -> tuple[str, bool]:
+    match = _VALUE_RE.match(rest)
+    value = match.group(1).strip()
+    if value:
+        return value, True
+    tail = rest[match.end():].strip()
+    if not tail:
+        return ("", True) if next_cell is None else _cell_value(next_cell)
+    if _LABEL_START_RE.match(tail):
+        return "", True
+    # 冒号与后续文字间隔较宽，可能是该字段的值，也可能是无关内容
+    return "", False
+
+
+def _field_values(pattern: re.Pattern, text: str) -> list[tuple[str, bool]]:
+    """字段各次出现的 (值, 是否确定)"""
+    found = []
+    for line in text.splitlines():
+        if not pattern.search(line):
+            continue
+        cells = _CELL_SEP_RE.split(line.strip())
+        for i, cell in enumerate(cells):
+            next_cell = cells[i + 1] if i + 1 < len(cells) else None
+            for match in pattern.finditer(cell):
+                if match.group("colon"):
+                    found.append(_colon_value(cell[match.end():], next_cell))
+                elif next_cell is not None and not cell[: match.start()].strip() and not cell[match.end():].strip():
+                    # 表格中的 "标签 | 值"
+                    found.append(_cell_value(next_cell))
+    return found
+
+
+def _unclear(label: str, values: list[tuple[str, bool]], text: str) -> bool:
+    """有无法确定的值，或标签出现在文中却没有按字段形式识别出来"""
+    return any(not certain for _, certain in values) or (not values and label in text)
+
+
+def _labels(args: str) -> list[str]:
+    return [a for a in _SPLIT_RE.split(args) if a]
+
+
+def _required(args: str, *, signed: bool = False) -> Callable[[str], tuple[Optional[bool], str]]:
+    fields = [(label, _field_re(label)) for label in _labels(args)]
+    if not fields:
+        raise ValueError("缺少字段名")
+
+    def check(text: str) -> tuple[Optional[bool], str]:
+        missing, unsigned, unclear = [], [], []
+        for label, pattern in fields:
+            values = _field_values(pattern, text)
+            if any(
+                certain and v and (not signed or v.strip("_-—　 ").lower() not in _PLACEHOLDERS)
+                for v, certain in values
+            ):
+                continue
+            if _unclear(label, values, text):
+                unclear.append(label)
+            elif not values:
+                missing.append(label)
+            else:
+                unsigned.append(label)
+        problems = []
+        if missing:
+            problems.append(f"缺少字段：{'、'.join(missing)}")
+        if unsigned:
+            problems.append(f"{'未签署' if signed else '未填写'}：{'、'.join(unsigned)}")
+        if unclear:
+            problems.append(f"无法确定是否{'签署' if signed else '填写'}：{'、'.join(unclear)}")
+        if missing or unsigned:
+            return False, "；".join(problems)
+        if unclear:
+            return None, "；".join(problems)
+        return True, f"{'已签署' if signed else '已填写'}：{'、'.join(label for label, _ in fields)}"
+
+    return check
+
+
+def _contains(args: str) -> Callable[[str], tuple[bool, str]]:
+    if not args:
+        raise ValueError("缺少文本")
+    return lambda text: (True, f"包含“{args}”") if args in text else (False, f"未包含“{args}”")
+
+
+def _regex(args: str, *, forbid: bool = False) -> Callable[[str], tuple[bool, str]]:
+    pattern = re.compile(args, re.MULTILINE)
+
+    def check(text: str) -> tuple[bool, str]:
+        match = pattern.search(text)
+        if forbid:
+            return (False, f"出现禁止内容：{match.group(0)[:50]}") if match else (True, "未出现禁止内容")
+        return (True, f"匹配：{match.group(0)[:50]}") if match else (False, f"未找到符合 {args} 的内容")
+
+    return check
+
+
+def _pattern(args: str) -> Callable[[str], tuple[Optional[bool], str]]:
+    label, _, expr = args.partition(" ")
+    if not label or not expr.strip():
+        raise ValueError("格式应为：字段 正则")
+    field = _field_re(label)
+    value_re = re.compile(expr.strip())
+
+    def check(text: str) -> tuple[Optional[bool], str]:
+        values = _field_values(field, text)
+        for value, _ in values:
+            if value and value_re.fullmatch(value):
+                return True, f"{label}：{value}"
+        if _unclear(label, values, text):
+            return None, f"无法确定 {label} 的值"
+        if not values:
+            return False, f"缺少字段：{label}"
+        return False, f"{label} 格式不符：{values[0][0][:50]}"
+
+    return check
+
+
+def _parse_date(value: str) -> Optional[datetime.date]:
+    match = _DATE_RE.search(value)
+    if not match:
+        return None
+    try:
+        return datetime.date(*(int(g) for g in match.groups()))
+    except ValueError:
+        return None
+
+
+def _date_order(args: str) -> Callable[[str], tuple[Optional[bool], str]]:
+    match = re.fullmatch(r"(\S+)\s*(<=|<)\s*(\S+)", args)
+    if not match:
+        raise ValueError("格式应为：字段A < 字段B")
+    first, op, second = match.groups()
+    first_re, second_re = _field_re(first), _field_re(second)
+
+    def check(text: str) -> tuple[Optional[bool], str]:
+        dates = []
+        for label, pattern in ((first, first_re), (second, second_re)):
+            values = _field_values(pattern, text)
+            parsed = [d for d in (_parse_date(v) for v, _ in values) if d]
+            if not parsed:
+                if _unclear(label, values, text):
+                    return None, f"无法确定 {label} 的日期"
+                return False, f"{label} 缺少有效日期"
+            dates.append(parsed[0])
+        ok = dates[0] < dates[1] if op == "<" else dates[0] <= dates[1]
+        relation = f"{first} {dates[0].isoformat()} {op} {second} {dates[1].isoformat()}"
+        return (True, relation) if ok else (False, f"日期顺序错误：{relation} 不成立")
+
+    return check
+
+
+# 规则名 -> 编译函数(参数) -> 检查函数（返回 (是否通过, 说明)，无法确定时为 None）
+_RULES: dict[str, Callable[[str], Callable[[str], tuple[Optional[bool], str]]]] = {
+    "required": _required,
+    "signed": functools.partial(_required, signed=True),
+    "contains": _contains,
+    "regex": _regex,
+    "forbid": functools.partial(_regex, forbid=True),
+    "pattern": _pattern,
+    "date_order": _date_order,
+}
+
+
+class CompiledRules:
+    """parseRules 编译结果：本地检查 + 交给大模型的剩余规则文本"""
+
+    __slots__ = ("checks", "remaining")
+
+    def __init__(self, checks: list[Check], remaining: str):
+        self.checks = checks
+        self.remaining = remaining
+
+    def evaluate(self, text: str) -> list[dict[str, Any]]:
+        return [check.evaluate(text or "") for check in self.checks]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_rules(parse_rules: str) -> CompiledRules:
+    """编译 parseRules（同一规则文本只编译一次）"""
+    checks, remaining = [], []
+    for line in (parse_rules or "").splitlines():
+        stripped = line.strip()
+        if not stripped.startswith("@"):
+            remaining.append(line)
+            continue
+        name, _, args = stripped[1:].partition(" ")
+        hard = True
+        if name == "soft":
+            hard = False
+            name, _, args = args.strip().partition(" ")
+        factory = _RULES.get(name)
+        try:
+            if factory is None:
+                raise ValueError("未知规则")
+            checks.append(Check(stripped, hard, factory(args.strip())))
+        except (ValueError, re.error) as e:
+            log.warning("audit_rules.invalid_rule", rule=stripped, error=str(e))
+            remaining.append(stripped[1:])
+    return CompiledRules(checks, "\n".join(remaining).strip())
+
+
+def hard_failures(findings: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return [f for f in findings if f["hard"] and not f["passed"] and not f["uncertain"]]
+
+
+def split_numbered(rules_text: str) -> tuple[str, list[str]]:
+    """
+    按编号拆分规则文本，返回 (共同前言, 各条规则)：未编号的续行归入上一条，第一条编号之前的
+    说明行作为前言。编号规则少于两条时各条规则为空列表（无需拆分）。
+    """
+    preface, items = [], []
+    for line in (rules_text or "").splitlines():
+        if not line.strip():
+            continue
+        if _NUMBERED_RE.match(line):
+            items.append([line.strip()])
+        elif items:
+            items[-1].append(line.strip())
+        else:
+            preface.append(line.strip())
+    if len(items) < 2:
+        return "\n".join(preface), []
+    return "\n".join(preface), ["\n".join(item) for item in items]
@@ -0,0 +1,245 @@
+"""
+端到端负载基准 - 启动 Mock LLM 与 API 服务，在并发负载下测量吞吐与延迟
+
+在 backends 目录下运行：
+    python -m benchmarks.e2e --concurrency 16 --requests 200 --output bench_e2e.json
+    python -m benchmarks.e2e --compare bench_e2e.json --threshold 0.2
+
+API 以 uvicorn 子进程启动，环境变量 LLM_API_BASE 指向 Mock 服务、KNOWLEDGE_PATH 指向
+使用仓库内标准文件的临时 knowledge.json，因此结果不依赖外部 FastGPT。
+存在超出阈值的回归时退出码为 1。
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import httpx
+
+from benchmarks import fixtures, report
+from benchmarks.mock_llm_server import MockLLMConfig, start_mock_server
+
+PARSE_RULES = "检查返修检验记录单的审核、批准签字是否齐全，检验日期是否在返修工艺批准日期之后。"
+COMMON = {"stepId": "bench-step", "workflowId": "bench-wf", "sessionId": "bench-session"}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    build: Callable[[], dict[str, Any]]  # 返回 httpx 请求参数（files/data/json）
+
+
+@dataclass
+class ScenarioResult:
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    status_counts: dict[str, int] = field(default_factory=dict)
+
+
+def build_scenarios(scale: int) -> list[Scenario]:
+    files = {fmt: fixtures.build_fixture(fmt, scale) for fmt in ("txt", "pdf", "docx")}
+
+    def file_parse(fmt: str) -> Callable[[], dict[str, Any]]:
+        return lambda: {
+            "files": {"file": (f"返修检验记录单.{fmt}", files[fmt])},
+            "data": {**COMMON, "parseRules": PARSE_RULES, "reviewBackground": "返修审核"},
+        }
+
+    options = [
+        {"label": "合格", "value": "pass", "isCorrect": True},
+        {"label": "不合格", "value": "fail", "isCorrect": False},
+        {"label": "让步接收", "value": "concession", "isCorrect": True},
+    ]
+    inspection_rows = [{"id": i, "item": f"检验项{i}", "qty": i % 7} for i in range(50 * scale)]
+    return [
+        Scenario("file_parse_txt", "POST", "/api/steps/file-parse", file_parse("txt")),
+        Scenario("file_parse_pdf", "POST", "/api/steps/file-parse", file_parse("pdf")),
+        Scenario("file_parse_docx", "POST", "/api/steps/file-parse", file_parse("docx")),
+        Scenario("prompt_generate", "POST", "/prompt/generate", lambda: {"json": {
+            "query": "不合格品控制", "background": "军工产品制造企业",
+            "structure": "** 目的\n** 范围\n** 职责\n** 工作程序", "replace": "",
+        }}),
+        Scenario("qa_interaction", "POST", "/api/steps/qa-interaction", lambda: {"json": {
+            **COMMON, "answer": "返修后需重新检验",
+            "questionConfig": {"question": "返修后产品如何处理？", "expectedAnswer": "返修后需重新检验"},
+        }}),
+        Scenario("qa_interaction_ai", "POST", "/api/steps/qa-interaction", lambda: {"json": {
+            **COMMON, "answer": "返修完成以后要重新进行检验",
+            "questionConfig": {
+                "question": "返修后产品如何处理？", "expectedAnswer": "返修后需重新检验", "useAiValidation": True,
+            },
+        }}),
+        Scenario("single_select", "POST", "/api/steps/single-select", lambda: {"json": {
+            **COMMON, "selectedValue": "pass", "optionsConfig": {"options": options},
+        }}),
+        Scenario("multi_select", "POST", "/api/steps/multi-select", lambda: {"json": {
+            **COMMON, "selectedValues": ["pass", "concession"], "optionsConfig": {"options": options},
+        }}),
+        Scenario("multi_select_batch", "POST", "/api/steps/multi-select/batch", lambda: {"json": {
+            "stepId": COMMON["stepId"], "workflowId": COMMON["workflowId"],
+            "optionsConfig": {"options": options, "maxSelect": 2},
+            "submissions": [
+                {"sessionId": f"bench-{i}", "selectedValues": ["pass", "concession", "fail"][: 1 + i % 3]}
+                for i in range(100)
+            ],
+        }}),
+        Scenario("script_check", "POST", "/api/steps/script-check", lambda: {"json": {
+            **COMMON,
+            "script": {"language": "python", "content": "result = all(r['qty'] >= 0 for r in inputData)"},
+            "executionParams": {"inputData": inspection_rows},
+        }}),
+        Scenario("script_check_sql", "POST", "/api/steps/script-check", lambda: {"json": {
+            **COMMON,
+            "script": {"language": "sql", "content": "SELECT id FROM input WHERE qty < 0"},
+            "executionParams": {"inputData": inspection_rows},
+        }}),
+        Scenario("sub_workflow", "POST", "/api/steps/sub-workflow", lambda: {"json": {
+            **COMMON, "subWorkflowId": "1770172947112-yitg2xomv",
+        }}),
+    ]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int, warmup: int) -> tuple[ScenarioResult, float]:
+    """先发 warmup 个请求预热，再以固定并发发送 requests 个请求，返回结果与墙钟耗时"""
+    for _ in range(warmup):
+        await client.request(scenario.method, scenario.path, **scenario.build())
+
+    result = ScenarioResult()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                resp = await client.request(scenario.method, scenario.path, **scenario.build())
+                status = str(resp.status_code)
+                if resp.status_code >= 400:
+                    result.errors += 1
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+                result.errors += 1
+            result.latencies_ms.append((time.perf_counter() - start) * 1000)
+            result.status_counts[status] = result.status_counts.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return result, time.perf_counter() - start
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(mock_base: str, knowledge_path: str, workers: int) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        LLM_API_BASE=mock_base,
+        KNOWLEDGE_PATH=knowledge_path,
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=fixtures.BACKENDS_DIR,
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API 进程启动失败，退出码 {proc.returncode}")
+        try:
+            if httpx.get(f"{base}/health/ready", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API 进程启动超时")
+
+
+async def run_all(args, base: str) -> dict[str, dict]:
+    scenarios = build_scenarios(args.scale)
+    if args.only:
+        scenarios = [s for s in scenarios if s.name in args.only]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base, timeout=300, limits=limits) as client:
+        for scenario in scenarios:
+            result, elapsed = await run_scenario(client, scenario, args.requests, args.concurrency, args.warmup)
+            results[scenario.name] = {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "errors": result.errors,
+                "statusCounts": result.status_counts,
+                "durationSec": round(elapsed, 3),
+                "throughputRps": round(args.requests / elapsed, 2) if elapsed else 0.0,
+                "latencyMs": report.summarize_latencies(result.latencies_ms),
+            }
+            print(f"{scenario.name:<18} {results[scenario.name]['throughputRps']:>8} req/s  "
+                  f"p50={results[scenario.name]['latencyMs']['p50']}ms  "
+                  f"p95={results[scenario.name]['latencyMs']['p95']}ms  "
+                  f"p99={results[scenario.name]['latencyMs']['p99']}ms  errors={result.errors}",
+                  file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端负载基准")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=1, help="夹具内容重复倍数")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 数")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="只运行指定场景")
+    parser.add_argument("--output", help="结果 JSON 路径，默认输出到标准输出")
+    parser.add_argument("--compare", help="与基线结果 JSON 比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对退化比例")
+    args = parser.parse_args()
+
+    mock = start_mock_server(MockLLMConfig(args.llm_latency_ms, args.llm_jitter_ms, seed=args.seed))
+    mock_base = f"http://127.0.0.1:{mock.server_address[1]}/api"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, base = start_api(mock_base, fixtures.write_knowledge_fixture(tmp), args.workers)
+        try:
+            results = asyncio.run(run_all(args, base))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+            mock.shutdown()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    output = {"meta": report.run_metadata(config), "scenarios": results}
+    report.write_report(output, args.output)
+
+    if args.compare:
+        regressions = report.compare(
+            results,
+            report.load_report(args.compare)["scenarios"],
+            {"latencyMs.p95": "lower", "latencyMs.p99": "lower", "throughputRps": "higher"},
+            args.threshold,
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+基准测试夹具 - 基于 export/ 下的返修样例文本生成 txt / pdf / docx 文件
+
+PDF 使用 PDF 内置的 STSong-Light 中文字体（UniGB-UCS2-H 编码），无需额外依赖；
+docx 只写入最小必要部件。scale 参数把样例内容重复多次，用于构造大文件。
+"""
+
+import io
+import json
+import os
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+BACKENDS_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = BACKENDS_DIR.parent
+EXPORT_DIR = REPO_DIR / "export"
+
+# 每页行数，控制生成 PDF 的页数
+PDF_LINES_PER_PAGE = 45
+
+
+def sample_text(scale: int = 1) -> str:
+    """export/ 下所有 txt 样例拼接后重复 scale 次"""
+    parts = [p.read_text(encoding="utf-8") for p in sorted(EXPORT_DIR.glob("*.txt"))]
+    return "\n".join(parts * max(scale, 1))
+
+
+def build_txt(text: str) -> bytes:
+    return text.encode("utf-8")
+
+
+def build_docx(text: str) -> bytes:
+    """每行一个段落；形如 "键：值" 的连续行合并为两列表格，模拟检验记录单"""
+    w_ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = []
+    rows = []
+
+    def flush_rows():
+        if rows:
+            body.append("<w:tbl>" + "".join(rows) + "</w:tbl>")
+            rows.clear()
+
+    for line in text.splitlines():
+        key, sep, value = line.partition("：")
+        if sep and len(key) <= 8 and value:
+            rows.append(
+                f"<w:tr><w:tc><w:p><w:r><w:t>{escape(key)}</w:t></w:r></w:p></w:tc>"
+                f"<w:tc><w:p><w:r><w:t>{escape(value)}</w:t></w:r></w:p></w:tc></w:tr>"
+            )
+            continue
+        flush_rows()
+        body.append(f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>')
+    flush_rows()
+
+    document = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{w_ns}"><w:body>{"".join(body)}</w:body></w:document>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", content_types)
+        zf.writestr("_rels/.rels", rels)
+        zf.writestr("word/document.xml", document)
+    return buf.getvalue()
+
+
+def build_pdf(text: str) -> bytes:
+    """生成带文本层的多页 PDF"""
+    lines = text.splitlines() or [""]
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)]
+
+    objects: list[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog = add(b"")  # 占位，稍后回填
+    pages_id = add(b"")
+    font_id = add(
+        b"<</Type/Font/Subtype/Type0/BaseFont/STSong-Light/Encoding/UniGB-UCS2-H"
+        b"/DescendantFonts[<</Type/Font/Subtype/CIDFontType0/BaseFont/STSong-Light"
+        b"/CIDSystemInfo<</Registry(Adobe)/Ordering(GB1)/Supplement 2>>"
+        b"/FontDescriptor<</Type/FontDescriptor/FontName/STSong-Light/Flags 6"
+        b"/FontBBox[-25 -254 1000 880]/ItalicAngle 0/Ascent 880/Descent -120/CapHeight 880/StemV 93>>"
+        b">>]>>"
+    )
+    page_ids = []
+    for page_lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        for line in page_lines:
+            hex_text = line.encode("utf-16-be", "replace").hex().upper()
+            ops.append(f"<{hex_text}> Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("ascii")
+        content_id = add(b"<</Length %d>>stream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<</Type/Page/Parent %d 0 R/MediaBox[0 0 595 842]/Resources<</Font<</F1 %d 0 R>>>>/Contents %d 0 R>>"
+            % (pages_id, font_id, content_id)
+        ))
+    objects[catalog - 1] = b"<</Type/Catalog/Pages %d 0 R>>" % pages_id
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids).encode("ascii")
+    objects[pages_id - 1] = b"<</Type/Pages/Kids[%s]/Count %d>>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<</Size %d/Root %d 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+BUILDERS = {"txt": build_txt, "pdf": build_pdf, "docx": build_docx}
+
+
+def build_fixture(fmt: str, scale: int = 1) -> bytes:
+    """按格式生成夹具文件内容"""
+    return BUILDERS[fmt](sample_text(scale))
+
+
+def write_knowledge_fixture(directory: str) -> str:
+    """
+    生成指向仓库内标准 MD 文件的 knowledge.json（仓库自带的 knowledge.json 使用 Windows 绝对路径），
+    返回文件路径。
+    """
+    with open(BACKENDS_DIR / "knowledge.json", "r", encoding="utf-8") as f:
+        knowledge = json.load(f)
+    knowledge["file_path"] = str(BACKENDS_DIR / "GJB9001" / "GJB9001C.md")
+    local_571 = next(BACKENDS_DIR.glob("GJB-571A-2024*/*.md"), None)
+
+    def fix_paths(domains):
+        for domain in domains:
+            if domain.get("file") and local_571 is not None:
+                domain["file_path"] = str(local_571)
+            fix_paths(domain.get("related_domains", []))
+
+    fix_paths(knowledge.get("process_domains", []))
+    path = os.path.join(directory, "knowledge.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(knowledge, f, ensure_ascii=False)
+    return path
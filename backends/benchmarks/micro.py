@@ -0,0 +1,200 @@
+"""
+热点函数微基准 - 解析、提示词构建、JSON 提取、过程组提示词生成
+
+在 backends 目录下运行：
+    python -m benchmarks.micro                               # 运行全部并打印结果
+    python -m benchmarks.micro -k parse --save base.json     # 只跑名称含 parse 的用例并保存基线
+    python -m benchmarks.micro --compare base.json --threshold 0.15
+
+每个用例先自动标定单轮迭代次数（单轮不少于 --min-time / --rounds 秒），再取多轮单次耗时的中位数；
+与基线比较时以中位数为准，存在超出阈值的回归时退出码为 1。
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+from benchmarks import fixtures, report
+
+# 用例名 -> 准备函数；准备函数完成夹具构造后返回被计时的无参函数
+BENCHMARKS: dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def bench(name: str):
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def measure(fn: Callable[[], Any], min_time: float, rounds: int) -> dict[str, Any]:
+    """自动标定迭代次数后测量多轮，返回单次耗时统计（微秒）"""
+    per_round = min_time / rounds
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= per_round or iterations >= 1 << 20:
+            break
+        iterations = max(iterations * 2, int(iterations * per_round / max(elapsed, 1e-9)))
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return {
+        "medianUs": round(statistics.median(samples), 3),
+        "meanUs": round(statistics.fmean(samples), 3),
+        "minUs": round(min(samples), 3),
+        "stdevUs": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+    }
+
+
+# ==================== 文件解析 ====================
+
+def _register_parse_benchmarks():
+    from file_parser import parse_file
+
+    def make(fmt: str, scale: int, builder: Callable[[str], bytes]):
+        @bench(f"parse_file[{fmt}-x{scale}]")
+        def setup():
+            data = builder(fixtures.sample_text(scale))
+            return lambda: parse_file(data, f"fixture.{fmt}")
+
+    for scale in (1, 10):
+        make("txt", scale, fixtures.build_txt)
+        make("pdf", scale, fixtures.build_pdf)
+        make("docx", scale, fixtures.build_docx)
+        make("csv", scale, _build_csv)
+        make("json", scale, _build_json)
+        make("xlsx", scale, _build_xlsx)
+
+
+def _rows(text: str) -> list[list[str]]:
+    return [[str(i), *line.partition("：")[::2]] for i, line in enumerate(text.splitlines()) if line.strip()]
+
+
+def _build_csv(text: str) -> bytes:
+    import csv
+    buf = io.StringIO()
+    csv.writer(buf).writerows([["序号", "项目", "内容"], *_rows(text)])
+    return buf.getvalue().encode("utf-8")
+
+
+def _build_json(text: str) -> bytes:
+    records = [{"序号": r[0], "项目": r[1], "内容": r[2]} for r in _rows(text)]
+    return json.dumps(records, ensure_ascii=False).encode("utf-8")
+
+
+def _build_xlsx(text: str) -> bytes:
+    try:
+        import openpyxl
+    except ImportError:
+        return b""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["序号", "项目", "内容"])
+    for row in _rows(text):
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+# ==================== 审核提示词 / JSON 提取 ====================
+
+@bench("build_file_audit_prompt[bg=20x20KB]")
+def _bench_audit_prompt():
+    from audit_prompt import build_file_audit_prompt
+
+    text = fixtures.sample_text(2)
+    background = [{"fileName": f"背景文件{i}.txt", "textContent": text[:20000]} for i in range(20)]
+    return lambda: build_file_audit_prompt(
+        review_background="返修审核",
+        background_files=background,
+        parse_rules="检查审核、批准签字是否齐全",
+        file_name="返修检验记录单.docx",
+        file_content=text,
+    )
+
+
+@bench("extract_json_from_text[50KB-prose]")
+def _bench_extract_json_prose():
+    from llm_client import extract_json_from_text
+
+    reply = "审核说明：" + fixtures.sample_text(3)[:50000] + '\n{"passed": false, "reason": "缺少批准签字", "details": ""}'
+    return lambda: extract_json_from_text(reply)
+
+
+@bench("extract_json_from_text[nested-details]")
+def _bench_extract_json_nested():
+    from llm_client import extract_json_from_text
+
+    details = [{"rule": f"第{i}条", "passed": i % 3 != 0, "reason": "记录" * 20} for i in range(200)]
+    reply = "```json\n" + json.dumps({"passed": False, "reason": "", "details": details}, ensure_ascii=False) + "\n```"
+    return lambda: extract_json_from_text(reply)
+
+
+# ==================== 过程组提示词 ====================
+
+@bench("generate_prompt[不合格品控制]")
+def _bench_generate_prompt():
+    from prompt_generate import ProcessGroupPromptGenerator
+
+    tmp = tempfile.mkdtemp()
+    with open(fixtures.write_knowledge_fixture(tmp), "r", encoding="utf-8") as f:
+        knowledge = json.load(f)
+    return lambda: ProcessGroupPromptGenerator(knowledge).generate_prompt(
+        "不合格品控制", "军工产品制造企业", "** 目的\n** 范围\n** 职责", ""
+    )
+
+
+_register_parse_benchmarks()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点函数微基准")
+    parser.add_argument("-k", dest="keyword", help="只运行名称包含该关键字的用例")
+    parser.add_argument("--min-time", type=float, default=0.5, help="每个用例的最短测量时间（秒）")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--save", help="将结果保存为基线 JSON")
+    parser.add_argument("--compare", help="与基线 JSON 比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对退化比例")
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.keyword and args.keyword not in name:
+            continue
+        results[name] = measure(setup(), args.min_time, args.rounds)
+        print(f"{name:<42} median={results[name]['medianUs']:>12.1f}us  "
+              f"stdev={results[name]['stdevUs']:.1f}us  n={results[name]['iterations']}", file=sys.stderr)
+
+    config = {"minTime": args.min_time, "rounds": args.rounds, "keyword": args.keyword}
+    output = {"meta": report.run_metadata(config), "benchmarks": results}
+    if args.save:
+        report.write_report(output, args.save)
+
+    if args.compare:
+        regressions = report.compare(
+            results, report.load_report(args.compare)["benchmarks"], {"medianUs": "lower"}, args.threshold
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
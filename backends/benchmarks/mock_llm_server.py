@@ -0,0 +1,121 @@
+"""
+本地 Mock LLM 服务 - 模拟 FastGPT /v2/chat/completions 接口，用于基准测试
+
+    python -m benchmarks.mock_llm_server --port 18080 --latency-ms 300 --jitter-ms 50
+
+返回固定的审核结果 JSON；支持 stream=true 时以 SSE 分块返回。
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+DEFAULT_REPLY = '{"passed": true, "reason": "", "details": "mock"}'
+
+
+class MockLLMConfig:
+    """Mock 服务行为配置"""
+
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 0, reply: str = DEFAULT_REPLY,
+                 chunk_chars: int = 8, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.reply = reply
+        self.chunk_chars = chunk_chars
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def next_delay(self) -> float:
+        """单次响应延迟（秒），正态抖动且不小于 0"""
+        with self.lock:
+            self.request_count += 1
+            jitter = self.random.gauss(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+
+def _make_handler(config: MockLLMConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/v2/chat/completions"):
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self.send_error(400)
+                return
+
+            delay = config.next_delay()
+            if payload.get("stream"):
+                self._stream(delay)
+                return
+
+            time.sleep(delay)
+            body = json.dumps({
+                "id": payload.get("chatId", ""),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": config.reply}}],
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, delay: float):
+            chunks = [config.reply[i:i + config.chunk_chars] for i in range(0, len(config.reply), config.chunk_chars)]
+            per_chunk = delay / max(len(chunks), 1)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for chunk in chunks:
+                time.sleep(per_chunk)
+                event = {"choices": [{"index": 0, "delta": {"content": chunk}}]}
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_mock_server(config: MockLLMConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动 Mock 服务，port=0 时自动分配端口（server.server_address[1]）"""
+    server = ThreadingHTTPServer((host, port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock FastGPT /v2/chat/completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(args.latency_ms, args.jitter_ms, args.reply, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(config))
+    print(f"mock LLM listening on http://{args.host}:{server.server_address[1]}/api/v2/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+基准测试结果统计与回归比较
+"""
+
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """最近秩法百分位（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(latencies_ms: list[float]) -> dict[str, float]:
+    values = sorted(latencies_ms)
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "min": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(statistics.fmean(values), 3),
+        "min": round(values[0], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def run_metadata(config: dict[str, Any]) -> dict[str, Any]:
+    """记录环境信息，便于比较不同机器/版本的结果"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=Path(__file__).parent, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": config,
+    }
+
+
+def compare(current: dict[str, dict], baseline: dict[str, dict], metrics: dict[str, str], threshold: float) -> list[str]:
+    """
+    比较两次结果，返回超出阈值的回归描述列表。
+
+    Args:
+        current / baseline: {场景名: 结果字典}
+        metrics: {结果中的指标路径（以 . 分隔）: "lower" 或 "higher"（越低/越高越好）}
+        threshold: 允许的相对退化比例，如 0.2 表示 20%
+    """
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for path, better in metrics.items():
+            cur_v, base_v = _get(result, path), _get(base, path)
+            if cur_v is None or not base_v:
+                continue
+            change = (cur_v - base_v) / base_v
+            worse = change > threshold if better == "lower" else change < -threshold
+            if worse:
+                regressions.append(f"{name} {path}: {base_v} -> {cur_v} ({change:+.1%})")
+    return regressions
+
+
+def _get(data: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def write_report(report: dict[str, Any], output: str | None) -> None:
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+def load_report(path: str) -> dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
@@ -0,0 +1,30 @@
+"""
+测试公共配置
+"""
+
+from collections import OrderedDict
+
+import pytest
+
+import session_store
+import shared_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_shared_cache(monkeypatch, tmp_path):
+    """每个测试使用独立的共享缓存文件，避免不同测试（及历次运行）之间互相命中"""
+    monkeypatch.setattr(shared_cache, "SHARED_CACHE_PATH", str(tmp_path / "shared_cache.db"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_session_store(monkeypatch, tmp_path):
+    """每个测试使用独立的会话数据库与内存状态，测试运行不会在 backends/data 下留下 sessions.db"""
+    monkeypatch.setattr(session_store, "SESSION_DB_PATH", str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(session_store, "_conn", None)
+    monkeypatch.setattr(session_store, "_sessions", OrderedDict())
+    monkeypatch.setattr(session_store, "_dirty", set())
+    monkeypatch.setattr(session_store, "_dirty_docs", set())
+    yield session_store
+    with session_store._db_lock:
+        if session_store._conn is not None:
+            session_store._conn.close()
@@ -0,0 +1,167 @@
+"""
+程序文件生成 - 按文件结构拆分章节，并发生成各章节，完成一个推送一个
+
+文件结构（structure）按行拆分，每个顶层条目为一个章节，例如 "** 目的\\n** 范围\\n** 职责"；
+更深层级的条目或无标记的说明行归入上一个章节的提纲。各章节共用同一段参考上下文
+（generate_prompt_from_json 生成的提示词，作为系统消息），只在用户消息中指定本次生成的章节，
+便于大模型服务复用相同前缀。
+
+生成结果以事件流（每行一个 JSON）返回：
+  {"type": "start", "processGroup", "sections": [章节标题...]}
+  {"type": "section", "index", "title", "content", "durationMs"}      章节完成（按完成顺序）
+  {"type": "section_error", "index", "title", "error"}                章节生成失败
+  {"type": "done", "document", "failed": [失败章节序号...], "durationMs"}  按原顺序拼接的全文
+
+环境变量：
+  DOC_GEN_CONCURRENCY  - 同一文档同时生成的章节数，默认 4
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Optional
+
+import llm_client
+import llm_scheduler
+import metrics
+from structured_log import get_logger
+
+DOC_GEN_CONCURRENCY = int(os.getenv("DOC_GEN_CONCURRENCY", "4"))
+
+log = get_logger(__name__)
+
+# 结构行的层级标记：** 目的 / ## 目的 / - 目的 / 4.1 目的 / 4.1、目的 / 一、目的
+_MARK_RE = re.compile(
+    r"^\s*(?:(?P<stars>[*#]+)\s*|[-+•]\s+|(?P<num>\d+(?:\.\d+)*)(?:[.、)）]\s*|\s+)|[一二三四五六七八九十]+、\s*)"
+)
+
+
+def _level(line: str) -> tuple[int, str]:
+    """结构行 -> (层级, 去除标记后的标题)；无标记的行层级为 0"""
+    match = _MARK_RE.match(line)
+    if match is None:
+        return 0, line.strip()
+    if match.group("stars"):
+        level = len(match.group("stars"))
+    elif match.group("num"):
+        level = match.group("num").count(".") + 1
+    else:
+        level = 1
+    return level, line[match.end():].strip().rstrip("*#").strip()
+
+
+def split_structure(structure: str) -> list[dict[str, str]]:
+    """
+    拆分文件结构，返回 [{"title": 章节标题, "outline": 子条目与说明}]。
+    没有任何层级标记时整个结构作为一个章节。
+    """
+    lines = [(line, *_level(line)) for line in (structure or "").splitlines() if line.strip()]
+    marked = [level for _, level, title in lines if level and title]
+    if not marked:
+        text = (structure or "").strip()
+        return [{"title": text or "全文", "outline": ""}]
+
+    top = min(marked)
+    sections: list[dict[str, Any]] = []
+    preface: list[str] = []
+    for raw, level, title in lines:
+        if level == top and title:
+            sections.append({"title": title, "outline": []})
+        elif sections:
+            sections[-1]["outline"].append(raw.strip())
+        else:
+            preface.append(raw.strip())
+    if preface:
+        # 第一个章节之前的说明行归入第一个章节
+        sections[0]["outline"][:0] = preface
+    return [{"title": s["title"], "outline": "\n".join(s["outline"])} for s in sections]
+
+
+def build_section_messages(
+    reference_prompt: str, sections: list[dict[str, str]], index: int
+) -> list[dict[str, str]]:
+    """单个章节的消息：参考上下文相同（系统消息），只有用户消息随章节变化"""
+    section = sections[index]
+    overview = "\n".join(f"{i + 1}. {s['title']}" for i, s in enumerate(sections))
+    outline = f"\n本章节应包含：\n{section['outline']}" if section["outline"] else ""
+    user = f"""完整文件结构如下：
+{overview}
+
+现在只生成第 {index + 1} 部分【{section['title']}】的内容。{outline}
+
+要求：
+1. 只输出本章节内容，以本章节标题开头，不要输出其他章节；
+2. 与其他章节的分工保持一致，避免重复其他章节的内容；
+3. 直接输出正文，不要包含任何解释说明。"""
+    return [
+        {"role": "system", "content": reference_prompt},
+        {"role": "user", "content": user},
+    ]
+
+
+async def generate_sections(
+    reference_prompt: str,
+    sections: list[dict[str, str]],
+    *,
+    process_group: str = "",
+    concurrency: int = DOC_GEN_CONCURRENCY,
+    call: Optional[Callable[[list[dict]], str]] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    并发生成各章节，按完成顺序产出事件；生成器被关闭（如客户端断开）时取消未完成的章节。
+    call 为同步的大模型调用函数，默认 llm_client.call_generation（生成应用，不使用审核应用），
+    经 llm_scheduler 排队后在线程池中执行。
+    """
+    call = call or llm_client.call_generation
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int) -> tuple[int, str, float]:
+        async with semaphore:
+            t0 = time.perf_counter()
+            with metrics.span("doc_section"):
+                content = await llm_scheduler.run(
+                    call, build_section_messages(reference_prompt, sections, index), priority=llm_scheduler.INTERACTIVE
+                )
+            return index, content, (time.perf_counter() - t0) * 1000
+
+    yield {"type": "start", "processGroup": process_group, "sections": [s["title"] for s in sections]}
+
+    tasks = {asyncio.ensure_future(run(i)): i for i in range(len(sections))}
+    contents: dict[int, str] = {}
+    failed: list[int] = []
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.get):
+                index = tasks[task]
+                title = sections[index]["title"]
+                try:
+                    _, content, duration_ms = task.result()
+                except Exception as e:
+                    failed.append(index)
+                    log.warning("document.section_failed", index=index, title=title, error=f"{type(e).__name__}: {e}")
+                    yield {"type": "section_error", "index": index, "title": title, "error": str(e)}
+                    continue
+                contents[index] = content
+                yield {
+                    "type": "section",
+                    "index": index,
+                    "title": title,
+                    "content": content,
+                    "durationMs": round(duration_ms, 2),
+                }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    duration_ms = (time.perf_counter() - start) * 1000
+    log.info("document.generated", sections=len(sections), failed=len(failed), duration_ms=round(duration_ms, 2))
+    yield {
+        "type": "done",
+        "document": "\n\n".join(contents[i] for i in sorted(contents)),
+        "failed": sorted(failed),
+        "durationMs": round(duration_ms, 2),
+    }
@@ -0,0 +1,75 @@
+"""
+文档文本存储 - 按内容摘要缓存解析出的文本，供 file-parse 以引用方式返回后按需拉取
+
+进程内 LRU 之外同时写入 shared_cache，多 worker 部署时由其他 worker 返回的引用同样可取。
+
+环境变量：
+  DOCUMENT_STORE_MAX_BYTES  - 缓存文本的总字节上限（UTF-8），默认 256MB，超出按 LRU 淘汰
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import shared_cache
+
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv("DOCUMENT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_store: "OrderedDict[str, bytes]" = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+
+
+def text_digest(text: str) -> str:
+    """文本的 sha256 摘要，作为文档引用 ID"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def put_text(text: str, digest: Optional[str] = None) -> str:
+    """
+    存入文本，返回摘要。相同内容只存一份。
+
+    Args:
+        text: 文本
+        digest: 调用方已算出的文本摘要（text_digest），传入时不再重复计算
+
+    Returns:
+        文本摘要（sha256 十六进制）
+    """
+    data = text.encode("utf-8")
+    digest = digest or hashlib.sha256(data).hexdigest()
+    if _put_local(digest, data):
+        shared_cache.set("document", digest, text)
+    return digest
+
+
+def _put_local(digest: str, data: bytes) -> bool:
+    """存入进程内 LRU，返回是否为新条目"""
+    global _total_bytes
+    with _lock:
+        if digest in _store:
+            _store.move_to_end(digest)
+            return False
+        _store[digest] = data
+        _total_bytes += len(data)
+        while _total_bytes > DOCUMENT_STORE_MAX_BYTES and len(_store) > 1:
+            _, evicted = _store.popitem(last=False)
+            _total_bytes -= len(evicted)
+    return True
+
+
+def get_bytes(digest: str) -> Optional[bytes]:
+    """按摘要取文本的 UTF-8 字节，进程内未命中时查共享缓存，不存在返回 None"""
+    with _lock:
+        data = _store.get(digest)
+        if data is not None:
+            _store.move_to_end(digest)
+            return data
+    text = shared_cache.get("document", digest)
+    if not isinstance(text, str):
+        return None
+    data = text.encode("utf-8")
+    _put_local(digest, data)
+    return data
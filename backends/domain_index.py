@@ -0,0 +1,186 @@
+"""
+过程域索引 - 知识树（process_domains 及各级 related_domains）编译为查找索引，每个知识树版本构建一次
+
+  - 精确索引：规范化名称 -> 节点
+  - 字符 n-gram 倒排索引：部分名称/近似名称按 Dice 相似度排序给出候选
+  - 邻接关系：父节点、子节点、祖先链
+
+过程组解析（resolve_group）规则：
+  1. 规范化后名称完全一致 -> 命中
+  2. 名称包含查询串的过程组唯一 -> 命中；多个 -> 不唯一，返回候选
+  3. 相似度最高的过程组 >= DOMAIN_MATCH_MIN 且领先第二名 DOMAIN_MATCH_MARGIN 以上 -> 命中
+缺少名称的节点保留在树结构中，但不参与名称匹配。
+
+环境变量：
+  DOMAIN_MATCH_MIN     - 模糊匹配命中的最低相似度，默认 0.5
+  DOMAIN_MATCH_MARGIN  - 模糊匹配第一名需领先第二名的相似度，默认 0.1
+"""
+
+import os
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Iterator, Optional
+
+DOMAIN_MATCH_MIN = float(os.getenv("DOMAIN_MATCH_MIN", "0.5"))
+DOMAIN_MATCH_MARGIN = float(os.getenv("DOMAIN_MATCH_MARGIN", "0.1"))
+
+
+def normalize(name: Any) -> str:
+    """NFKC 规范化、转小写并去除空白"""
+    text = unicodedata.normalize("NFKC", str(name or "")).lower()
+    return "".join(text.split())
+
+
+def _grams(text: str) -> set[str]:
+    """字符 bigram；单字符名称以该字符本身作为 gram"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class DomainNode:
+    """知识树节点；level 0 为过程组（process_domains 顶层），data 为原始 JSON 对象"""
+
+    __slots__ = ("id", "name", "key", "level", "parent", "children", "data")
+
+    def __init__(self, node_id: int, data: dict[str, Any], level: int, parent: Optional[int]):
+        self.id = node_id
+        self.name = str(data.get("name") or "")
+        self.key = normalize(self.name)
+        self.level = level
+        self.parent = parent
+        self.children: list[int] = []
+        self.data = data
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "name": self.name, "level": self.level, "type": self.data.get("type", "")}
+
+
+class DomainIndex:
+    """知识树的只读索引"""
+
+    def __init__(self, json_data: dict[str, Any]):
+        self.nodes: list[DomainNode] = []
+        self.groups: list[int] = []
+        self._exact: dict[str, list[int]] = defaultdict(list)
+        self._postings: dict[str, list[int]] = defaultdict(list)
+        self._gram_count: list[int] = []
+
+        # 迭代遍历，避免过深的知识树触发递归上限；同一对象重复出现时只索引一次（防止环引用）
+        seen: set[int] = set()
+        stack = [(d, 0, None) for d in reversed(json_data.get("process_domains") or [])]
+        while stack:
+            data, level, parent = stack.pop()
+            if not isinstance(data, dict) or id(data) in seen:
+                continue
+            seen.add(id(data))
+            node = DomainNode(len(self.nodes), data, level, parent)
+            self.nodes.append(node)
+            if parent is None:
+                self.groups.append(node.id)
+            else:
+                self.nodes[parent].children.append(node.id)
+            grams = _grams(node.key)
+            self._gram_count.append(len(grams))
+            if node.key:
+                self._exact[node.key].append(node.id)
+                for gram in grams:
+                    self._postings[gram].append(node.id)
+            stack.extend((d, level + 1, node.id) for d in reversed(data.get("related_domains") or []))
+
+    # ==================== 名称查找 ====================
+
+    def exact(self, name: str) -> list[DomainNode]:
+        return [self.nodes[i] for i in self._exact.get(normalize(name), ())]
+
+    def search(self, query: str, limit: int = 10, *, groups_only: bool = False) -> list[tuple[DomainNode, float]]:
+        """按 bigram Dice 相似度排序的候选；名称包含查询串的节点相似度至少计为 DOMAIN_MATCH_MIN"""
+        key = normalize(query)
+        grams = _grams(key)
+        if not grams:
+            return []
+        overlap: Counter = Counter()
+        for gram in grams:
+            overlap.update(self._postings.get(gram, ()))
+        scored = []
+        for node_id, shared in overlap.items():
+            node = self.nodes[node_id]
+            if groups_only and node.parent is not None:
+                continue
+            score = 2 * shared / (len(grams) + self._gram_count[node_id])
+            if key in node.key:
+                score = max(score, DOMAIN_MATCH_MIN)
+            scored.append((node, round(score, 4)))
+        scored.sort(key=lambda item: (-item[1], item[0].id))
+        return scored[:limit]
+
+    def resolve_group(self, name: str) -> tuple[Optional[DomainNode], list[DomainNode]]:
+        """
+        解析过程组名称，返回 (命中的过程组, 候选列表)。
+        未命中时：候选为空表示未找到，非空表示名称不唯一或只有近似项。
+        """
+        exact = [n for n in self.exact(name) if n.parent is None]
+        if exact:
+            return exact[0], exact
+        key = normalize(name)
+        ranked = self.search(name, len(self.groups), groups_only=True)
+        containing = [n for n, _ in ranked if key and key in n.key]
+        if len(containing) == 1:
+            return containing[0], containing
+        if containing:
+            return None, containing
+        if ranked and ranked[0][1] >= DOMAIN_MATCH_MIN and (
+            len(ranked) == 1 or ranked[0][1] - ranked[1][1] >= DOMAIN_MATCH_MARGIN
+        ):
+            return ranked[0][0], [ranked[0][0]]
+        return None, [n for n, _ in ranked]
+
+    # ==================== 邻接关系 ====================
+
+    def parent(self, node: DomainNode) -> Optional[DomainNode]:
+        return self.nodes[node.parent] if node.parent is not None else None
+
+    def children(self, node: DomainNode) -> list[DomainNode]:
+        return [self.nodes[i] for i in node.children]
+
+    def ancestors(self, node: DomainNode) -> Iterator[DomainNode]:
+        """由近及远的祖先节点"""
+        while node.parent is not None:
+            node = self.nodes[node.parent]
+            yield node
+
+    def descendants(self, node: DomainNode) -> Iterator[DomainNode]:
+        """先序遍历的子孙节点"""
+        stack = list(reversed(node.children))
+        while stack:
+            child = self.nodes[stack.pop()]
+            yield child
+            stack.extend(reversed(child.children))
+
+
+def not_found_message(name: str, candidates: list[DomainNode]) -> str:
+    """过程组解析失败时的错误提示（与原有 "错误：" 前缀保持一致）"""
+    if not candidates:
+        return f"错误：未找到名为 '{name}' 的过程组"
+    names = "、".join(n.name for n in candidates[:5])
+    return f"错误：过程组名称 '{name}' 不唯一或不存在，候选：{names}"
+
+
+# 最近构建的索引：(知识树版本, 索引)
+_cached: Optional[tuple[str, DomainIndex]] = None
+_lock = threading.Lock()
+
+
+def get_index(json_data: dict[str, Any], version: Optional[str] = None) -> DomainIndex:
+    """按知识树版本缓存索引；不传版本时每次重新构建"""
+    global _cached
+    if version is None:
+        return DomainIndex(json_data)
+    entry = _cached
+    if entry is None or entry[0] != version:
+        with _lock:
+            entry = _cached
+            if entry is None or entry[0] != version:
+                entry = _cached = (version, DomainIndex(json_data))
+    return entry[1]
@@ -1,91 +1,745 @@
 """
-文件解析模块 - 支持 txt, pdf, docx 格式解析
+文件解析模块 - 支持 txt, pdf, docx, xlsx, csv, json, xml 及图片（OCR）格式解析
+
+解析器通过 register_parser 注册到格式注册表；格式优先取调用方显式指定值，
+其次按文件头魔数识别，再按扩展名，最后对文本内容做嗅探。
+解析结果为 ParsedDocument：全文只拼接一次，按页偏移切片即可取单页或页码范围。
 """
+import csv
+import datetime
+import functools
+import hashlib
+import importlib
+import io
+import json
 import os
+import re
+import struct
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Any, Callable, Optional
+
+import ocr
+import shared_cache
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+
+# 表格类格式（xlsx/csv/json 记录/xml）最多输出的行数，避免超大文件撑爆提示词
+MAX_TABLE_ROWS = int(os.getenv("PARSE_MAX_ROWS", "2000"))
+# 解析结果共享缓存的版本号，解析器输出格式变化时递增，使旧缓存失效
+PARSE_CACHE_VERSION = 1
+
+
+
+class ParsedDocument:
+    """
+    文件解析结果。
+
+    各页文本拼接为一个字符串（非空页之间以换行分隔），每页在全文中的
+    [起, 止) 偏移存放在紧凑的 array 中，取页或页码范围只做一次切片。
+    """
+
+    __slots__ = (
+        "format", "encoding", "tables", "duration_ms", "error", "_chunks", "_length", "_offsets", "_text", "_digest"
+    )
+
+    def __init__(self, fmt: Optional[str] = None):
+        self.format = fmt
+        self.encoding: Optional[str] = None
+        self.error: Optional[str] = None  # 解析器异常（文档已损坏或超出解析器限制）
+        self.tables: list[list[list[str]]] = []
+        self.duration_ms = 0.0
+        self._chunks: list[str] = []
+        self._length = 0
+        self._offsets = array("I")
+        self._text: Optional[str] = ""
+        self._digest: Optional[str] = None
+
+    def add_page(self, text: str) -> None:
+        """追加一页文本（空页也计入页数）"""
+        text = text or ""
+        if not text:
+            # 空页：起点取下一非空页的位置，止点取当前末尾，切片结果为空且不含分隔符
+            self._offsets.append(self._length + 1 if self._length else 0)
+            self._offsets.append(self._length)
+            return
+        if self._length:
+            self._chunks.append("\n")
+            self._length += 1
+        self._chunks.append(text)
+        self._text = None
+        self._digest = None
+        self._offsets.append(self._length)
+        self._length += len(text)
+        self._offsets.append(self._length)
+
+    def add_table(self, rows: list[list[str]]) -> None:
+        """记录一张表格（行 -> 单元格文本）"""
+        if rows:
+            self.tables.append(rows)
+
+    @property
+    def text(self) -> str:
+        """全文"""
+        if self._text is None:
+            self._text = "".join(self._chunks)
+            self._chunks = [self._text] if self._text else []
+        return self._text
+
+    def text_digest(self) -> str:
+        """全文的 sha256 摘要（与 document_store 的文本引用一致），只计算一次"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+        return self._digest
+
+    @property
+    def page_count(self) -> int:
+        return len(self._offsets) // 2
+
+    def page(self, index: int) -> str:
+        """取第 index 页（从 0 开始）的文本"""
+        if not 0 <= index < self.page_count:
+            raise IndexError(f"页码越界: {index}")
+        return self.text[self._offsets[2 * index]:self._offsets[2 * index + 1]]
+
+    def page_range(self, start: int, end: int) -> str:
+        """
+        取页码范围的文本（与 PageRange 一致，从 1 开始，闭区间），越界部分自动截断。
+        """
+        count = self.page_count
+        start = max(start, 1)
+        end = min(end, count)
+        if start > end:
+            return ""
+        return self.text[self._offsets[2 * (start - 1)]:self._offsets[2 * end - 1]]
+
+    def to_cache(self) -> dict[str, Any]:
+        """序列化为可 JSON 存储的字典（供 shared_cache 使用）"""
+        return {
+            "format": self.format,
+            "encoding": self.encoding,
+            "tables": self.tables,
+            "text": self.text,
+            "offsets": self._offsets.tolist(),
+        }
 
+    @classmethod
+    def from_cache(cls, data: dict[str, Any]) -> "ParsedDocument":
+        doc = cls(data["format"])
+        doc.encoding = data["encoding"]
+        doc.tables = data["tables"]
+        doc._text = data["text"]
+        doc._chunks = [doc._text] if doc._text else []
+        doc._length = len(doc._text)
+        doc._offsets = array("I", data["offsets"])
+        return doc
 
-def parse_file(file_bytes: bytes, filename: str) -> str:
+    def to_metadata(self) -> dict[str, Any]:
+        """响应 metadata 中与解析相关的字段"""
+        metadata = {
+            "pageCount": self.page_count,
+            "format": self.format,
+            "encoding": self.encoding,
+            "tableCount": len(self.tables),
+            "parseDurationMs": round(self.duration_ms, 2),
+        }
+        if self.error:
+            metadata["parseError"] = self.error
+        return metadata
+
+
+# 格式名 -> 解析函数；扩展名 -> 格式名
+# 解析函数签名为 (file_bytes, doc, options) -> None，向 doc 追加页与表格，options 见 parse_document
+_PARSERS: dict[str, Callable[[bytes, ParsedDocument, dict], None]] = {}
+_EXTENSIONS: dict[str, str] = {}
+
+
+def register_parser(fmt: str, *extensions: str):
+    """
+    注册解析器的装饰器。
+
+    Args:
+        fmt: 格式名，与 ParseOptions.format 取值一致
+        extensions: 关联的文件扩展名（含点号）
+    """
+    def decorator(func: Callable[[bytes, ParsedDocument, dict], None]) -> Callable[[bytes, ParsedDocument, dict], None]:
+        _PARSERS[fmt] = func
+        for ext in extensions:
+            _EXTENSIONS[ext.lower()] = fmt
+        return func
+    return decorator
+
+
+def supported_formats() -> list[str]:
+    """返回已注册的格式名列表"""
+    return sorted(_PARSERS)
+
+
+# 解析器使用的可选重量级依赖，按需导入，可由 warm_up 在启动时预先导入
+OPTIONAL_MODULES = ("pdfplumber", "PyPDF2", "openpyxl")
+
+
+@functools.lru_cache(maxsize=None)
+def _optional_import(name: str):
+    """导入可选依赖，未安装返回 None；结果缓存，缺失的依赖不会在每次解析时重复搜索导入路径"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def warm_up() -> dict[str, bool]:
+    """预先导入解析器依赖，返回 {模块名: 是否可用}"""
+    return {name: _optional_import(name) is not None for name in OPTIONAL_MODULES}
+
+
+def parse_file(
+    file_bytes: bytes,
+    filename: str,
+    fmt: Optional[str] = None,
+    *,
+    enable_ocr: Optional[bool] = None,
+    extract_images: Optional[bool] = None,
+) -> str:
     """
     解析文件内容，返回文本字符串。
     
     Args:
         file_bytes: 文件二进制内容
         filename: 文件名（用于判断格式）
+        fmt: 显式指定的格式（如 ParseOptions.format），优先于自动识别
+        enable_ocr: 是否对无文本层的页面/图片执行 OCR，None 时取 OCR_DEFAULT 配置
+        extract_images: 是否识别 docx 中嵌入图片的文字（需同时启用 OCR）
     
     Returns:
         解析后的文本内容，解析失败或不支持的格式返回空字符串
     """
-    if not filename:
-        return ""
-    
-    ext = os.path.splitext(filename)[1].lower()
-    
-    if ext == ".txt":
-        return _parse_txt(file_bytes)
-    elif ext == ".pdf":
-        return _parse_pdf(file_bytes)
-    elif ext == ".docx":
-        return _parse_docx(file_bytes)
-    else:
-        return ""
+    return parse_document(
+        file_bytes, filename, fmt, enable_ocr=enable_ocr, extract_images=extract_images
+    ).text
 
 
-def _parse_txt(file_bytes: bytes) -> str:
-    """解析 txt 文件"""
-    for encoding in ["utf-8", "gbk", "gb2312", "latin-1"]:
+def parse_document(
+    file_bytes: bytes,
+    filename: str,
+    fmt: Optional[str] = None,
+    *,
+    enable_ocr: Optional[bool] = None,
+    extract_images: Optional[bool] = None,
+    cache: bool = False,
+    digest: Optional[str] = None,
+) -> ParsedDocument:
+    """
+    解析文件内容，返回带分页偏移、表格与元数据的 ParsedDocument。
+
+    参数同 parse_file；解析失败或不支持的格式返回空文档（page_count 为 0），
+    解析器抛出的异常记录在 error 中（metadata 的 parseError），失败结果不写入缓存。
+    cache 为真时按文件内容与解析配置查询/写入 shared_cache，其他 worker 解析过的文件直接复用；
+    digest 为调用方已算出的文件内容 sha256，传入时不再重复计算。
+    """
+    start = time.perf_counter()
+    detected = detect_format(file_bytes, filename, fmt) if file_bytes else None
+    doc = ParsedDocument(detected)
+
+    parser = _PARSERS.get(detected or "")
+    if parser is not None:
+        options = {
+            "enable_ocr": ocr.ocr_enabled(enable_ocr),
+            "extract_images": bool(extract_images),
+        }
+        key = None
+        if cache:
+            key = shared_cache.make_key(
+                PARSE_CACHE_VERSION, digest or hashlib.sha256(file_bytes).hexdigest(), detected, options,
+                MAX_TABLE_ROWS, ocr.TESSERACT_CMD, ocr.OCR_LANG, ocr.OCR_DPI,
+            )
+            cached = shared_cache.get("parse", key)
+            if cached is not None:
+                doc = ParsedDocument.from_cache(cached)
+                doc.duration_ms = (time.perf_counter() - start) * 1000
+                return doc
         try:
-            return file_bytes.decode(encoding)
+            parser(file_bytes, doc, options)
+        except Exception as e:
+            # 损坏的文件或超出解析器限制（如 csv 字段过长、JSON 嵌套过深）按空文档返回，不向上抛出
+            log.warning("parse.failed", format=detected, filename=filename, error=f"{type(e).__name__}: {e}")
+            doc = ParsedDocument(detected)
+            doc.error = f"{type(e).__name__}: {e}"
+            key = None
+        if key is not None:
+            shared_cache.set("parse", key, doc.to_cache())
+
+    doc.duration_ms = (time.perf_counter() - start) * 1000
+    return doc
+
+
+def detect_format(file_bytes: bytes, filename: str = "", fmt: Optional[str] = None) -> Optional[str]:
+    """
+    识别文件格式：显式指定 > 魔数 > 扩展名 > 文本嗅探。
+
+    Returns:
+        已注册的格式名，无法识别返回 None
+    """
+    if fmt and fmt.lower() in _PARSERS:
+        return fmt.lower()
+
+    sniffed = _sniff_binary(file_bytes)
+    if sniffed:
+        return sniffed
+
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+
+    return _sniff_text(file_bytes)
+
+
+_IMAGE_MAGIC = (b"\x89PNG", b"\xff\xd8\xff", b"II*\x00", b"MM\x00*")
+# BMP 的 DIB 信息头长度（BITMAPCOREHEADER / INFOHEADER / V2-V5）
+_BMP_DIB_SIZES = {12, 40, 52, 56, 64, 108, 124}
+
+
+def _is_bmp(data: bytes) -> bool:
+    """
+    "BM" 两字节过短，文本文件也可能以此开头；须同时校验文件头中的文件大小、
+    DIB 信息头长度与像素数据偏移
+    """
+    if len(data) < 26 or not data.startswith(b"BM"):
+        return False
+    size, offset, dib_size = struct.unpack_from("<I4xII", data, 2)
+    return size in (0, len(data)) and dib_size in _BMP_DIB_SIZES and 14 + dib_size <= offset <= len(data)
+
+
+def _is_image(data: bytes) -> bool:
+    return data.startswith(_IMAGE_MAGIC) or _is_bmp(data)
+
+
+def _sniff_binary(file_bytes: bytes) -> Optional[str]:
+    """按文件头魔数识别二进制格式"""
+    if file_bytes.startswith(b"%PDF"):
+        return "pdf"
+    if _is_image(file_bytes):
+        return "image"
+    if file_bytes.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+                names = set(zf.namelist())
+        except zipfile.BadZipFile:
+            return None
+        if "word/document.xml" in names:
+            return "docx"
+        if "xl/workbook.xml" in names:
+            return "xlsx"
+    return None
+
+
+def _sniff_text(file_bytes: bytes) -> Optional[str]:
+    """对无扩展名的文本内容做嗅探"""
+    head = file_bytes[:512].lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith((b"{", b"[")):
+        return "json"
+    if head.startswith(b"<"):
+        return "xml"
+    if b"\x00" in head:
+        return None
+    return "txt"
+
+
+def _decode_text(file_bytes: bytes) -> tuple[str, Optional[str]]:
+    """按常见编码依次尝试解码，返回 (文本, 实际使用的编码)"""
+    for encoding in ["utf-8-sig", "gbk", "gb2312", "latin-1"]:
+        try:
+            text = file_bytes.decode(encoding)
         except UnicodeDecodeError:
             continue
-    return ""
+        if encoding == "utf-8-sig":
+            encoding = "utf-8-sig" if file_bytes.startswith(b"\xef\xbb\xbf") else "utf-8"
+        return text, encoding
+    return "", None
 
 
-def _parse_pdf(file_bytes: bytes) -> str:
-    """解析 pdf 文件"""
-    try:
-        import pdfplumber
-        import io
-        
+def _format_cell(value: Any) -> str:
+    """单元格值转为紧凑文本：整数值浮点去掉小数位，日期取 ISO 格式"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+def _trim_row(cells: list[str]) -> list[str]:
+    """去掉行尾空单元格"""
+    while cells and not cells[-1]:
+        cells.pop()
+    return cells
+
+
+def _truncated_note(limit: int) -> str:
+    return f"……（超出 {limit} 行，已截断）"
+
+
+@register_parser("txt", ".txt", ".md", ".log")
+def _parse_txt(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """解析 txt 文件"""
+    text, doc.encoding = _decode_text(file_bytes)
+    doc.add_page(text)
+
+
+@register_parser("pdf", ".pdf")
+def _parse_pdf(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """
+    解析 pdf 文件，每个 PDF 页对应一页。
+
+    没有文本层的页面（扫描件）在启用 OCR 时渲染为图片并提交识别，
+    渲染与识别流水线并行，结果按页序回填。
+    """
+    pdfplumber = _optional_import("pdfplumber")
+    if pdfplumber is not None:
         text_parts = []
+        pending = []  # (页序号, 识别任务)
         with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            for page in pdf.pages:
+            for i, page in enumerate(pdf.pages):
                 page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-        return "\n".join(text_parts)
-    except ImportError:
-        pass
-    
-    try:
-        import PyPDF2
-        import io
-        
-        text_parts = []
+                text_parts.append(page_text or "")
+                if options.get("enable_ocr") and not (page_text or "").strip():
+                    image = _render_pdf_page(page)
+                    if image:
+                        pending.append((i, ocr.submit_image(image)))
+        for i, future in pending:
+            text_parts[i] = future.result()
+        for page_text in text_parts:
+            doc.add_page(page_text)
+        return
+
+    PyPDF2 = _optional_import("PyPDF2")
+    if PyPDF2 is not None:
         reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
         for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-        return "\n".join(text_parts)
-    except ImportError:
+            doc.add_page(page.extract_text() or "")
+
+
+def _render_pdf_page(page) -> bytes:
+    """将 pdfplumber 页面渲染为 PNG，渲染失败返回空字节串"""
+    try:
+        buf = io.BytesIO()
+        page.to_image(resolution=ocr.OCR_DPI).original.save(buf, format="PNG")
+        return buf.getvalue()
+    except Exception as e:
+        log.warning("pdf.render_failed", page=page.page_number, error=f"{type(e).__name__}: {e}")
+        return b""
+
+
+@register_parser("image", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+def _parse_image(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """解析图片（扫描件照片等），仅在启用 OCR 时有内容"""
+    doc.add_page(ocr.ocr_image(file_bytes) if options.get("enable_ocr") else "")
+
+
+@register_parser("docx", ".docx")
+def _parse_docx(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """
+    解析 docx 文件。
+
+    直接流式解析 word/document.xml（iterparse），不构建 python-docx 对象模型；
+    段落与表格按文档顺序输出，页眉/页脚（常含签署栏）分别置于正文前后。
+    表格每行输出为一行，单元格以 " | " 分隔。
+    启用 extract_images 与 OCR 时，word/media 下的图片识别结果附在末尾。
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+            names = zf.namelist()
+            headers = sorted(n for n in names if _DOCX_HEADER_RE.match(n))
+            footers = sorted(n for n in names if _DOCX_FOOTER_RE.match(n))
+
+            text_parts = []
+            seen = set()
+            for part in headers + ["word/document.xml"] + footers:
+                if part not in names:
+                    continue
+                with zf.open(part) as fp:
+                    lines = _iter_docx_lines(fp, doc.tables)
+                    if part == "word/document.xml":
+                        text_parts.extend(lines)
+                        continue
+                    # 多节文档的页眉页脚通常重复，只保留一次
+                    block = "\n".join(lines)
+                    if block and block not in seen:
+                        seen.add(block)
+                        text_parts.append(block)
+
+            if options.get("extract_images") and options.get("enable_ocr"):
+                media = sorted(n for n in names if n.startswith("word/media/"))
+                images = [data for data in (zf.read(n) for n in media) if _is_image(data)]
+                for text in ocr.ocr_images(images):
+                    if text:
+                        text_parts.append(f"【图片识别文字】\n{text}")
+        doc.add_page("\n".join(text_parts))
+    except (zipfile.BadZipFile, ET.ParseError, KeyError):
         pass
-    
-    return ""
 
 
-def _parse_docx(file_bytes: bytes) -> str:
-    """解析 docx 文件"""
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_DOCX_HEADER_RE = re.compile(r"^word/header\d*\.xml$")
+_DOCX_FOOTER_RE = re.compile(r"^word/footer\d*\.xml$")
+
+
+def _release(elem: ET.Element, open_elems: list[ET.Element]) -> None:
+    """
+    释放已处理完的元素：清空其内容并从父元素中移除。
+    iterparse 构建的树中父元素仍引用已清空的子元素，只 clear 不能使大文档的内存保持有界。
+    """
+    elem.clear()
+    if open_elems:
+        parent = open_elems[-1]
+        # 刚结束的元素总是父元素当前的最后一个子元素
+        if len(parent) and parent[-1] is elem:
+            del parent[-1]
+        else:
+            parent.remove(elem)
+
+
+def _iter_docx_lines(fp, tables_out: list[list[list[str]]]) -> list[str]:
+    """
+    流式遍历 WordprocessingML，按文档顺序返回文本行。
+
+    - 段落：每个非空段落一行
+    - 表格：每个非空行一行，单元格内多段落以空格合并；嵌套表格并入所在单元格
+    - mc:Fallback 为兼容性重复内容，跳过
+    顶层表格的非空行同时追加到 tables_out。
+    """
+    lines: list[str] = []
+    para_stack: list[list[str]] = []   # 段落文本缓冲（文本框内可嵌套段落）
+    tables: list[list[list[str]]] = []  # 表格栈：表 -> 行 -> 单元格文本
+    cells: list[list[str]] = []         # 单元格栈：单元格内的段落文本
+    skip_depth = 0
+    open_elems: list[ET.Element] = []   # 已开始未结束的元素（祖先链），用于释放已处理的子元素
+
+    for event, elem in ET.iterparse(fp, events=("start", "end")):
+        if event == "start":
+            open_elems.append(elem)
+        else:
+            open_elems.pop()
+        tag = elem.tag
+        if tag == _MC_FALLBACK:
+            skip_depth += 1 if event == "start" else -1
+            if event == "end":
+                _release(elem, open_elems)
+            continue
+        if skip_depth:
+            continue
+
+        if event == "start":
+            if tag == _W + "p":
+                para_stack.append([])
+            elif tag == _W + "tbl":
+                tables.append([])
+            elif tag == _W + "tr" and tables:
+                tables[-1].append([])
+            elif tag == _W + "tc":
+                cells.append([])
+            continue
+
+        if tag == _W + "t":
+            if para_stack and elem.text:
+                para_stack[-1].append(elem.text)
+        elif tag == _W + "tab":
+            if para_stack:
+                para_stack[-1].append("\t")
+        elif tag in (_W + "br", _W + "cr"):
+            if para_stack:
+                para_stack[-1].append("\n")
+        elif tag == _W + "p":
+            text = "".join(para_stack.pop()).strip() if para_stack else ""
+            if text:
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    lines.append(text)
+            _release(elem, open_elems)
+        elif tag == _W + "tc":
+            cell = cells.pop() if cells else []
+            if tables and tables[-1]:
+                tables[-1][-1].append(" ".join(" ".join(cell).split()))
+            _release(elem, open_elems)
+        elif tag == _W + "tbl":
+            rows = tables.pop() if tables else []
+            rows = [row for row in rows if any(row)]
+            rendered = [" | ".join(row) for row in rows]
+            if cells:
+                # 嵌套表格：合并到外层单元格
+                cells[-1].append("; ".join(rendered))
+            else:
+                lines.extend(rendered)
+                if rows:
+                    tables_out.append(rows)
+            _release(elem, open_elems)
+
+    return lines
+
+
+@register_parser("xlsx", ".xlsx", ".xlsm")
+def _parse_xlsx(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """
+    解析 xlsx 文件，每个工作表对应一页、一张表格。
+
+    使用 openpyxl 只读模式逐行迭代，不加载整个工作簿；每个工作表输出标题行，
+    每个非空行输出为一行，单元格以 " | " 分隔，总行数受 MAX_TABLE_ROWS 限制。
+    """
+    openpyxl = _optional_import("openpyxl")
+    if openpyxl is None:
+        return
+
     try:
-        import docx
-        import io
-        
-        doc = docx.Document(io.BytesIO(file_bytes))
-        text_parts = []
-        for para in doc.paragraphs:
-            if para.text:
-                text_parts.append(para.text)
-        return "\n".join(text_parts)
-    except ImportError:
-        return ""
+        wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
     except Exception:
-        return ""
+        return
+
+    rows_left = MAX_TABLE_ROWS
+    try:
+        for ws in wb.worksheets:
+            if rows_left <= 0:
+                doc.add_page(_truncated_note(MAX_TABLE_ROWS))
+                break
+            text_parts = [f"## 工作表：{ws.title}"]
+            rows = []
+            for row in ws.iter_rows(values_only=True):
+                cells = _trim_row([_format_cell(v) for v in row])
+                if not cells:
+                    continue
+                if rows_left <= 0:
+                    text_parts.append(_truncated_note(MAX_TABLE_ROWS))
+                    break
+                rows.append(cells)
+                text_parts.append(" | ".join(cells))
+                rows_left -= 1
+            doc.add_page("\n".join(text_parts))
+            doc.add_table(rows)
+    finally:
+        wb.close()
+
+
+@register_parser("csv", ".csv", ".tsv")
+def _parse_csv(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """解析 csv 文件，自动识别分隔符，逐行输出并受 MAX_TABLE_ROWS 限制"""
+    text, doc.encoding = _decode_text(file_bytes)
+    if not text:
+        return
+
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+
+    text_parts = []
+    rows = []
+    for row in csv.reader(io.StringIO(text), dialect):
+        cells = _trim_row([" ".join(c.split()) for c in row])
+        if not cells:
+            continue
+        if len(rows) >= MAX_TABLE_ROWS:
+            text_parts.append(_truncated_note(MAX_TABLE_ROWS))
+            break
+        rows.append(cells)
+        text_parts.append(" | ".join(cells))
+    doc.add_page("\n".join(text_parts))
+    doc.add_table(rows)
+
+
+@register_parser("json", ".json")
+def _parse_json(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """
+    解析 json 文件。
+
+    记录数组（对象列表）输出为表头 + 数据行（同时记为表格）；其他结构展开为 "路径: 值" 行。
+    """
+    text, doc.encoding = _decode_text(file_bytes)
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        return
+
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        columns: list[str] = []
+        for item in data[:MAX_TABLE_ROWS]:
+            for key in item:
+                if key not in columns:
+                    columns.append(key)
+        rows = [list(columns)]
+        for item in data[:MAX_TABLE_ROWS]:
+            rows.append(_trim_row([_format_json_value(item.get(c)) for c in columns]))
+        text_parts = [" | ".join(row) for row in rows]
+        if len(data) > MAX_TABLE_ROWS:
+            text_parts.append(_truncated_note(MAX_TABLE_ROWS))
+        doc.add_page("\n".join(text_parts))
+        doc.add_table(rows)
+        return
+
+    text_parts = []
+    for path, value in _iter_json_leaves(data, ""):
+        if len(text_parts) >= MAX_TABLE_ROWS:
+            text_parts.append(_truncated_note(MAX_TABLE_ROWS))
+            break
+        text_parts.append(f"{path}: {value}" if path else value)
+    doc.add_page("\n".join(text_parts))
+
+
+def _format_json_value(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _format_cell(value)
+
+
+def _iter_json_leaves(value: Any, path: str):
+    """深度优先遍历 JSON，逐个产出 (路径, 叶子值文本)"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _iter_json_leaves(child, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            yield from _iter_json_leaves(child, f"{path}[{i}]")
+    else:
+        yield path, _format_json_value(value)
+
+
+@register_parser("xml", ".xml")
+def _parse_xml(file_bytes: bytes, doc: ParsedDocument, options: dict) -> None:
+    """
+    解析 xml 文件。
+
+    iterparse 流式遍历，每个含文本或属性的元素输出一行 "路径: 文本"，
+    命名空间前缀省略，行数受 MAX_TABLE_ROWS 限制。
+    """
+    text_parts = []
+    path: list[str] = []
+    open_elems: list[ET.Element] = []
+    try:
+        for event, elem in ET.iterparse(io.BytesIO(file_bytes), events=("start", "end")):
+            if event == "start":
+                path.append(elem.tag.rsplit("}", 1)[-1])
+                open_elems.append(elem)
+                continue
+            open_elems.pop()
+            text = " ".join((elem.text or "").split())
+            attrs = " ".join(f"@{k.rsplit('}', 1)[-1]}={v}" for k, v in elem.attrib.items())
+            value = " ".join(p for p in (attrs, text) if p)
+            if value:
+                if len(text_parts) >= MAX_TABLE_ROWS:
+                    text_parts.append(_truncated_note(MAX_TABLE_ROWS))
+                    break
+                text_parts.append(f"{'/'.join(path)}: {value}")
+            path.pop()
+            _release(elem, open_elems)
+    except ET.ParseError:
+        pass
+    doc.add_page("\n".join(text_parts))
@@ -0,0 +1,69 @@
+"""
+知识树快照 - 缓存 knowledge.json 的解析结果，文件变化（mtime/大小）时自动重新加载
+
+快照带内容摘要 version，供按知识版本构建的索引、缓存判断是否需要重建。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Optional
+
+
+class KnowledgeSnapshot:
+    """某一版本的知识树"""
+
+    __slots__ = ("path", "data", "version", "_stat_key")
+
+    def __init__(self, path: str, data: dict[str, Any], version: str, stat_key: tuple):
+        self.path = path
+        self.data = data
+        self.version = version
+        self._stat_key = stat_key
+
+
+_snapshots: dict[str, KnowledgeSnapshot] = {}
+_lock = threading.Lock()
+
+
+def _stat_key(path: str) -> tuple:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load(path: str) -> KnowledgeSnapshot:
+    """
+    获取知识树快照，文件未变化时直接返回缓存。
+
+    Raises:
+        OSError / json.JSONDecodeError: 文件不存在或内容不是合法 JSON
+    """
+    key = _stat_key(path)
+    snapshot = _snapshots.get(path)
+    if snapshot is not None and snapshot._stat_key == key:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is not None and snapshot._stat_key == key:
+            return snapshot
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw.decode("utf-8-sig"))
+        snapshot = KnowledgeSnapshot(path, data, hashlib.sha256(raw).hexdigest(), key)
+        _snapshots[path] = snapshot
+        return snapshot
+
+
+def save(path: str, text: str) -> None:
+    """写入知识树文件并使缓存失效"""
+    with _lock:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        _snapshots.pop(path, None)
+
+
+def peek(path: str) -> Optional[KnowledgeSnapshot]:
+    """返回已缓存的快照（不触发加载）"""
+    return _snapshots.get(path)
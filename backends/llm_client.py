@@ -1,21 +1,122 @@
 """
 LLM 客户端 - 调用大模型 API
-与前端 ChatInterface 一致，使用 FastGPT 风格接口（appId、Authorization 可配置）
+默认与前端 ChatInterface 一致，使用 FastGPT 风格接口（appId、Authorization 可配置）；
+LLM_BACKEND=ollama 时直接调用 Ollama 原生 /api/chat，省去经 FastGPT 转发的一跳：
+  - keep_alive 固定模型常驻时间，避免审核间隔中模型被卸载、下次调用重新加载
+  - json_mode 的调用请求 format=json，约束模型只输出 JSON
+  - 每次调用的 token 数与加载/提示词处理/生成耗时写入 /metrics，并可通过 usage 参数返回
+Ollama 会将同时到达的请求合并批处理（服务端 OLLAMA_NUM_PARALLEL），宜与 LLM_MAX_CONCURRENCY 保持一致。
 
 配置见 llm_config.py，环境变量可覆盖：
+  LLM_BACKEND     - fastgpt（默认）/ ollama
   LLM_API_BASE    - API 基础 URL
   LLM_APP_ID      - FastGPT appId
   LLM_AUTH_TOKEN  - Authorization Bearer Token
+  LLM_GENERATION_APP_ID / LLM_GENERATION_AUTH_TOKEN / LLM_GENERATION_MODEL /
+  LLM_GENERATION_TEMPERATURE / LLM_GENERATION_MAX_TOKENS - 生成类调用（call_generation）的应用与采样设置
+  OLLAMA_API_BASE - Ollama 服务地址，默认 http://localhost:11434
+  OLLAMA_MODEL    - Ollama 模型名，默认 qwen3-vl:2b
+  OLLAMA_KEEP_ALIVE - 模型常驻时间，默认 -1（常驻）；也可为 "30m" 等时长
+  LLM_POOL_SIZE   - 共享连接池的最大连接数，默认 20（仅在 open_pool 之后生效）
+  LLM_CACHE_TTL   - 文件审核等确定性调用的回复在 shared_cache 中的保存秒数，默认 0（不缓存）
 """
 
 import json
+import os
 import re
+import threading
 import uuid
+from contextlib import nullcontext
 from typing import Optional
 
 import httpx
 
-from llm_config import AUDIT_APP_ID, AUDIT_AUTH_TOKEN, LLM_API_BASE
+import metrics
+import shared_cache
+from llm_config import (
+    AUDIT_APP_ID,
+    AUDIT_AUTH_TOKEN,
+    GENERATION_APP_FALLBACK,
+    GENERATION_APP_ID,
+    GENERATION_AUTH_TOKEN,
+    GENERATION_MAX_TOKENS,
+    GENERATION_MODEL,
+    GENERATION_TEMPERATURE,
+    LLM_API_BASE,
+    LLM_BACKEND,
+    OLLAMA_API_BASE,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MODEL,
+)
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "0"))
+
+# 进程级共享连接池：由服务启动时 open_pool 打开，未打开时每次调用使用独立 Client
+_pool: Optional[httpx.Client] = None
+_pool_lock = threading.Lock()
+
+
+def _new_client(**kwargs) -> httpx.Client:
+    return httpx.Client(timeout=120.0, proxy=None, trust_env=False, **kwargs)
+
+
+def open_pool() -> httpx.Client:
+    """打开共享连接池（幂等），复用 TCP/TLS 连接"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_client(
+                limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+            )
+        return _pool
+
+
+def close_pool() -> None:
+    """关闭共享连接池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _keep_alive() -> int | str:
+    """OLLAMA_KEEP_ALIVE 为整数时按秒数传递，否则按时长字符串（如 "30m"）传递"""
+    try:
+        return int(OLLAMA_KEEP_ALIVE)
+    except ValueError:
+        return OLLAMA_KEEP_ALIVE
+
+
+def warm_up(api_base: Optional[str] = None) -> bool:
+    """
+    打开共享连接池并预先建立到 LLM 服务的连接，返回服务是否可达。
+    FastGPT 只发送一个轻量 GET 请求，任何 HTTP 状态码都视为可达；
+    Ollama 发送空消息的 /api/chat 请求，使模型预先加载并按 keep_alive 常驻。
+    未配置生成应用、生成类调用沿用审核应用时记录警告。
+    """
+    if LLM_BACKEND != "ollama" and GENERATION_APP_FALLBACK:
+        log.warning(
+            "llm.generation_app_fallback", appId=GENERATION_APP_ID, hint="未配置 LLM_GENERATION_APP_ID，生成类调用使用审核应用"
+        )
+    client = open_pool()
+    try:
+        if LLM_BACKEND == "ollama":
+            resp = client.post(
+                (api_base or OLLAMA_API_BASE).rstrip("/") + "/api/chat",
+                json={"model": OLLAMA_MODEL, "messages": [], "keep_alive": _keep_alive()},
+            )
+            resp.raise_for_status()
+        else:
+            client.get((api_base or LLM_API_BASE).rstrip("/") + "/", timeout=5.0)
+        return True
+    except httpx.HTTPError as e:
+        log.warning("llm.warm_up_failed", error=f"{type(e).__name__}: {e}")
+        return False
 
 
 def call_llm(
@@ -25,16 +126,29 @@ def call_llm(
     app_id: Optional[str] = None,
     auth_token: Optional[str] = None,
     chat_id: Optional[str] = None,
+    cache_ttl: Optional[float] = None,
+    json_mode: bool = False,
+    usage: Optional[dict] = None,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
 ) -> str:
     """
-    调用大模型 API（FastGPT 风格，与 ChatInterface 一致），返回完整回复文本。
+    调用大模型 API（按 LLM_BACKEND 选择 FastGPT 或 Ollama），返回完整回复文本。
 
     Args:
         messages: 消息列表 [{"role": "user"|"system"|"assistant", "content": "..."}]
-        api_base: API 基础 URL，默认 LLM_API_BASE
-        app_id: FastGPT appId，默认 LLM_APP_ID，其他接口可传不同值
+        api_base: API 基础 URL，默认 LLM_API_BASE（Ollama 为 OLLAMA_API_BASE）
+        app_id: FastGPT appId，不传时为 LLM_APP_ID（审核应用），其他接口可传不同值（Ollama 忽略）
         auth_token: Authorization Bearer Token，默认 LLM_AUTH_TOKEN
         chat_id: 会话 ID，不传则自动生成
+        cache_ttl: 大于 0 时相同 (api_base, appId, messages) 的回复在 shared_cache 中保存该秒数，
+                   各 worker 共用
+        json_mode: 回复须为 JSON（Ollama 请求 format=json；FastGPT 由提示词约束）
+        usage: 不为 None 时写入本次调用的 token 数与耗时（仅 Ollama 提供；缓存命中时不写入）
+        model: 模型名（Ollama 默认 OLLAMA_MODEL；FastGPT 以 OpenAI 兼容字段传递）
+        temperature: 采样温度，不传时使用应用/模型的默认值
+        max_tokens: 最大生成 token 数（Ollama 为 num_predict），不传或 0 表示不限制
 
     Returns:
         模型回复的文本内容
@@ -42,12 +156,23 @@ def call_llm(
     Raises:
         ValueError: 当 API 调用失败时
     """
-    base = api_base or LLM_API_BASE
-    aid = app_id or AUDIT_APP_ID
-    token = auth_token or AUDIT_AUTH_TOKEN
+    ollama = LLM_BACKEND == "ollama"
+    base = api_base or (OLLAMA_API_BASE if ollama else LLM_API_BASE)
+    aid = (model or OLLAMA_MODEL) if ollama else AUDIT_APP_ID if app_id is None else app_id
+    if not aid:
+        raise ValueError("未配置 FastGPT appId")
+    token = auth_token or ("" if ollama else AUDIT_AUTH_TOKEN)
     cid = chat_id or f"audit-{uuid.uuid4().hex[:16]}"
+    sampling = {k: v for k, v in (("temperature", temperature), ("max_tokens", max_tokens)) if v}
 
-    url = f"{base.rstrip('/')}/v2/chat/completions"
+    cache_key = None
+    if cache_ttl and cache_ttl > 0:
+        cache_key = shared_cache.make_key(base, aid, messages, *([model, sampling] if model or sampling else []))
+    if cache_key is not None:
+        cached = shared_cache.get("llm", cache_key)
+        if isinstance(cached, str):
+            log.info("call_llm.cache_hit", chatId=cid)
+            return cached
 
     headers = {
         "Content-Type": "application/json",
@@ -55,18 +180,44 @@ def call_llm(
     if token:
         headers["Authorization"] = f"Bearer {token}"
 
-    payload = {
-        "appId": aid,
-        "chatId": cid,
-        "stream": False,
-        "detail": False,
-        "messages": messages,
-    }
+    if ollama:
+        url = f"{base.rstrip('/')}/api/chat"
+        payload = {
+            "model": aid,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": _keep_alive(),
+        }
+        if json_mode:
+            payload["format"] = "json"
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        if options:
+            payload["options"] = options
+    else:
+        url = f"{base.rstrip('/')}/v2/chat/completions"
+        payload = {
+            "appId": aid,
+            "chatId": cid,
+            "stream": False,
+            "detail": False,
+            "messages": messages,
+        }
+        if model:
+            payload["model"] = model
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
 
     try:
-        with httpx.Client(timeout=120.0, proxy=None, trust_env=False) as client:
+        pool = _pool
+        with (nullcontext(pool) if pool is not None else _new_client()) as client, metrics.span("llm_call"):
             resp = client.post(url, json=payload, headers=headers)
-            print(f"[call_llm] status: {resp.status_code}")
+            log.info("call_llm.response", status=resp.status_code, chatId=cid)
             resp.raise_for_status()
             data = resp.json()
     except httpx.HTTPStatusError as e:
@@ -74,15 +225,78 @@ def call_llm(
     except Exception as e:
         raise ValueError(f"LLM API 调用异常: {e}") from e
 
-    choice = data.get("choices")
-    if not choice:
-        raise ValueError("LLM 返回格式异常: 无 choices")
-
-    content = choice[0].get("message", {}).get("content", "")
+    if ollama:
+        content = (data.get("message") or {}).get("content", "")
+        _record_ollama_usage(data, cid, usage)
+    else:
+        choice = data.get("choices")
+        if not choice:
+            raise ValueError("LLM 返回格式异常: 无 choices")
+        content = choice[0].get("message", {}).get("content", "")
     if not content:
         raise ValueError("LLM 返回内容为空")
 
-    return content.strip()
+    content = content.strip()
+    if cache_key is not None:
+        shared_cache.set("llm", cache_key, content, ttl=cache_ttl)
+    return content
+
+
+def generation_config_error() -> Optional[str]:
+    """生成类调用无法发起时的配置错误（供接口在开始生成前一次性拒绝），配置可用时返回 None"""
+    if LLM_BACKEND != "ollama" and not GENERATION_APP_ID:
+        return "未配置 FastGPT appId：请设置 LLM_GENERATION_APP_ID 或 LLM_APP_ID"
+    return None
+
+
+def call_generation(
+    messages: list[dict],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """
+    生成类调用（工作流对话节点、文档分章节生成）：使用生成应用 LLM_GENERATION_APP_ID
+    （未配置时为审核应用），未传的模型与采样参数取 LLM_GENERATION_* 默认值
+    """
+    return call_llm(
+        messages,
+        app_id=GENERATION_APP_ID,
+        auth_token=GENERATION_AUTH_TOKEN,
+        chat_id=f"generate-{uuid.uuid4().hex[:16]}",
+        model=model or GENERATION_MODEL or None,
+        temperature=GENERATION_TEMPERATURE if temperature is None else temperature,
+        max_tokens=max_tokens or GENERATION_MAX_TOKENS or None,
+    )
+
+
+# Ollama 回复中的耗时字段（纳秒）-> (指标阶段名, usage 中的键)
+_OLLAMA_DURATIONS = {
+    "load_duration": ("llm_load", "loadMs"),
+    "prompt_eval_duration": ("llm_prompt_eval", "promptEvalMs"),
+    "eval_duration": ("llm_eval", "evalMs"),
+    "total_duration": (None, "totalMs"),
+}
+
+
+def _record_ollama_usage(data: dict, chat_id: str, usage: Optional[dict]) -> None:
+    """记录 Ollama 回复中的 token 数与各阶段耗时"""
+    info = {
+        "promptTokens": data.get("prompt_eval_count") or 0,
+        "completionTokens": data.get("eval_count") or 0,
+    }
+    metrics.LLM_TOKENS.observe(info["promptTokens"], kind="prompt")
+    metrics.LLM_TOKENS.observe(info["completionTokens"], kind="completion")
+    for field, (stage, key) in _OLLAMA_DURATIONS.items():
+        ns = data.get(field)
+        if ns:
+            if stage:
+                metrics.record(stage, ns / 1e9)
+            info[key] = round(ns / 1e6, 2)
+    log.info("call_llm.usage", chatId=chat_id, **info)
+    if usage is not None:
+        usage.update(info)
 
 
 def extract_json_from_text(text: str) -> dict:
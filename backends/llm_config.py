@@ -5,6 +5,9 @@ LLM 调用配置 - appId、Authorization 等预留，各接口可覆盖不同值
 
 import os
 
+# 调用后端：fastgpt 经 FastGPT 应用转发；ollama 直接调用 Ollama 原生 /api/chat
+LLM_BACKEND = os.getenv("LLM_BACKEND", "fastgpt").lower()
+
 # 基础 API 地址（FastGPT 等服务）
 LLM_API_BASE = os.getenv("LLM_API_BASE", "http://192.168.45.105:3000/api")
 
@@ -12,6 +15,22 @@ LLM_API_BASE = os.getenv("LLM_API_BASE", "http://192.168.45.105:3000/api")
 AUDIT_APP_ID = os.getenv("LLM_APP_ID", "6983f33f9dda4ab3681ee1dc")
 AUDIT_AUTH_TOKEN = os.getenv("LLM_AUTH_TOKEN", "fastgpt-j2JZgSp22RXUswC8SudmQGp8IYEhdm45gkr9zXL7S2KBoK0qrxL1dpVR")
 
+# Ollama 直连（LLM_BACKEND=ollama）：服务地址、模型名与模型常驻时间
+# keep_alive 为 -1 表示模型常驻内存、审核之间不卸载；也可为 "30m" 等时长
+OLLAMA_API_BASE = os.getenv("OLLAMA_API_BASE", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen3-vl:2b")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+
+# 生成类接口（工作流对话节点、文档分章节生成）：应配置单独的 FastGPT 应用，不与审核应用混用
+# 未配置 LLM_GENERATION_APP_ID 时沿用审核应用，服务启动预热时记录警告（llm_client.warm_up）
+GENERATION_APP_FALLBACK = not os.getenv("LLM_GENERATION_APP_ID")
+GENERATION_APP_ID = os.getenv("LLM_GENERATION_APP_ID") or AUDIT_APP_ID
+GENERATION_AUTH_TOKEN = os.getenv("LLM_GENERATION_AUTH_TOKEN", AUDIT_AUTH_TOKEN)
+# 生成类调用的默认模型与采样参数（工作流节点自带的设置优先）；模型为空时 Ollama 使用 OLLAMA_MODEL
+GENERATION_MODEL = os.getenv("LLM_GENERATION_MODEL", "")
+GENERATION_TEMPERATURE = float(os.getenv("LLM_GENERATION_TEMPERATURE", "0.7"))
+GENERATION_MAX_TOKENS = int(os.getenv("LLM_GENERATION_MAX_TOKENS", "0"))  # 0 表示不限制
+
 # 聊天等其它接口可在此扩展，例如：
 # CHAT_APP_ID = os.getenv("LLM_CHAT_APP_ID", "...")
 # CHAT_AUTH_TOKEN = os.getenv("LLM_CHAT_AUTH_TOKEN", "...")
@@ -0,0 +1,237 @@
+"""
+大模型调用调度 - 限制同时进行的大模型调用数，按优先级分配调用名额
+
+优先级：interactive（用户在页面上等待的审核）> sub_workflow（子工作流/本地工作流节点）> batch（批量审核）。
+  - 老化：排队每满 LLM_AGING_SECONDS 秒提升一级，批量任务不会被持续到达的交互请求饿死
+  - 会话公平：同一级别中优先分配给当前占用名额最少的会话，单个会话提交大批任务不会独占名额；
+    未提供 sessionId 的请求各自单独计数，匿名请求之间不会共用一个会话而互相压后
+  - 排队位置/预计等待：入队时按当前队列与最近调用耗时估算，调用方可写入响应
+
+异步调用方使用 await run(...)：排队不占用线程，获得名额后在调度器自己的线程池（大小等于名额数）
+中执行调用；已在工作线程中的同步调用方使用 call(...)，在当前线程中等待并执行。
+run 不使用事件循环的默认线程池：默认线程池可能已被等待名额的 call() 占满，此时持有名额的
+run 若也需要默认线程池中的线程就永远无法执行，名额无法归还。
+
+环境变量：
+  LLM_MAX_CONCURRENCY  - 同时进行的大模型调用数，默认 4
+  LLM_AGING_SECONDS    - 排队多少秒提升一个优先级，默认 30
+"""
+
+import asyncio
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional
+
+import metrics
+from structured_log import get_logger
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_AGING_SECONDS = float(os.getenv("LLM_AGING_SECONDS", "30"))
+
+INTERACTIVE = "interactive"
+SUB_WORKFLOW = "sub_workflow"
+BATCH = "batch"
+PRIORITIES = {INTERACTIVE: 0, SUB_WORKFLOW: 1, BATCH: 2}
+
+log = get_logger(__name__)
+
+
+def normalize_priority(priority: Optional[str], default: str = INTERACTIVE) -> str:
+    """未知或缺省的优先级按 default 处理"""
+    return priority if priority in PRIORITIES else default
+
+
+class Ticket:
+    """一次排队：wake 在获得名额时被调用（可能在其他线程中）"""
+
+    __slots__ = ("priority", "session_id", "seq", "enqueued_at", "granted_at", "position", "eta_ms", "wake")
+
+    def __init__(self, priority: str, session_id: Hashable, seq: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.session_id = session_id
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.position = 0
+        self.eta_ms: Optional[int] = None
+        self.wake = wake
+
+    def level(self, now: float) -> int:
+        """老化后的优先级（数值越小越优先）"""
+        aged = int((now - self.enqueued_at) // LLM_AGING_SECONDS) if LLM_AGING_SECONDS > 0 else 0
+        return max(0, PRIORITIES[self.priority] - aged)
+
+    def info(self) -> dict[str, Any]:
+        """写入响应的排队信息"""
+        wait = (self.granted_at or time.monotonic()) - self.enqueued_at
+        return {
+            "priority": self.priority,
+            "position": self.position,
+            "etaMs": self.eta_ms,
+            "waitMs": round(wait * 1000, 2),
+        }
+
+
+class LLMScheduler:
+    """线程安全的优先级调度器"""
+
+    def __init__(self, capacity: int = LLM_MAX_CONCURRENCY):
+        self.capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        self._waiting: list[Ticket] = []
+        self._running = 0
+        self._running_by_session: Counter = Counter()
+        self._durations: deque = deque(maxlen=50)
+        self._seq = itertools.count()
+        # 同时执行的 run 调用不超过名额数，该线程池总有空闲线程
+        self._executor = ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix="llm-call")
+
+    def _key(self, ticket: Ticket, now: float) -> tuple[int, int, int]:
+        return ticket.level(now), self._running_by_session[ticket.session_id], ticket.seq
+
+    def _enqueue(self, priority: str, session_id: str, wake: Callable[[], None]) -> Ticket:
+        with self._lock:
+            seq = next(self._seq)
+            # 未提供会话时按本次请求单独计数，所有匿名请求不共用 "" 会话
+            ticket = Ticket(priority, session_id or (None, seq), seq, wake)
+            now = ticket.enqueued_at
+            if self._running < self.capacity and not self._waiting:
+                self._grant_locked(ticket)
+                return ticket
+            key = self._key(ticket, now)
+            ticket.position = 1 + sum(1 for t in self._waiting if self._key(t, now) < key)
+            avg = sum(self._durations) / len(self._durations) if self._durations else None
+            if avg is not None:
+                # 前面的请求与本请求按名额数分批完成
+                ticket.eta_ms = int(-(-ticket.position // self.capacity) * avg * 1000)
+            self._waiting.append(ticket)
+            self._dispatch_locked()
+        return ticket
+
+    def _grant_locked(self, ticket: Ticket) -> None:
+        self._running += 1
+        self._running_by_session[ticket.session_id] += 1
+        ticket.granted_at = time.monotonic()
+        ticket.wake()
+
+    def _dispatch_locked(self) -> None:
+        now = time.monotonic()
+        while self._running < self.capacity and self._waiting:
+            ticket = min(self._waiting, key=lambda t: self._key(t, now))
+            self._waiting.remove(ticket)
+            self._grant_locked(ticket)
+
+    def _release(self, ticket: Ticket, duration: Optional[float]) -> None:
+        with self._lock:
+            self._running -= 1
+            self._running_by_session[ticket.session_id] -= 1
+            if self._running_by_session[ticket.session_id] <= 0:
+                del self._running_by_session[ticket.session_id]
+            if duration is not None:
+                self._durations.append(duration)
+            self._dispatch_locked()
+
+    def _cancel(self, ticket: Ticket) -> None:
+        """放弃排队（如请求被取消）；已获得名额时归还"""
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                return
+        if ticket.granted_at is not None:
+            self._release(ticket, None)
+
+    @staticmethod
+    def _record_wait(ticket: Ticket) -> None:
+        wait = ticket.granted_at - ticket.enqueued_at
+        metrics.record("llm_queue_wait", wait)
+        metrics.LLM_QUEUE_WAIT.observe(wait, priority=ticket.priority)
+
+    def _execute(self, ticket: Ticket, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self._release(ticket, None)
+            raise
+        self._release(ticket, time.perf_counter() - start)
+        return result
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        priority: str = INTERACTIVE,
+        session_id: str = "",
+        queue_info: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """排队获得名额后在线程池中执行 func(*args, **kwargs)；queue_info 不为 None 时写入排队信息"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket = self._enqueue(normalize_priority(priority), session_id, wake)
+        try:
+            await granted
+        except BaseException:
+            self._cancel(ticket)
+            raise
+        self._record_wait(ticket)
+        if queue_info is not None:
+            queue_info.update(ticket.info())
+        # 与 asyncio.to_thread 一样把当前上下文（如 metrics.collect_timings）带入工作线程
+        call = functools.partial(contextvars.copy_context().run, self._execute, ticket, func, args, kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def call(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        priority: str = INTERACTIVE,
+        session_id: str = "",
+        queue_info: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """同步版本：在当前线程中等待名额并执行"""
+        granted = threading.Event()
+        ticket = self._enqueue(normalize_priority(priority), session_id, granted.set)
+        granted.wait()
+        self._record_wait(ticket)
+        if queue_info is not None:
+            queue_info.update(ticket.info())
+        return self._execute(ticket, func, args, kwargs)
+
+    def status(self) -> dict[str, Any]:
+        """当前运行数与各优先级排队数"""
+        with self._lock:
+            waiting = Counter(t.priority for t in self._waiting)
+            avg = sum(self._durations) / len(self._durations) if self._durations else None
+            return {
+                "capacity": self.capacity,
+                "running": self._running,
+                "waiting": {p: waiting.get(p, 0) for p in PRIORITIES},
+                "avgCallMs": round(avg * 1000, 2) if avg is not None else None,
+            }
+
+
+_scheduler = LLMScheduler()
+
+
+async def run(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return await _scheduler.run(func, *args, **kwargs)
+
+
+def call(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return _scheduler.call(func, *args, **kwargs)
+
+
+def status() -> dict[str, Any]:
+    return _scheduler.status()
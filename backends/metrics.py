@@ -0,0 +1,132 @@
+"""
+性能指标 - 分阶段耗时统计与 Prometheus 文本格式导出
+
+用法：
+    with collect_timings() as timings:      # 请求入口，收集本请求各阶段耗时
+        with span("parse", format="pdf"):   # 任意位置记录一个阶段
+            ...
+    timings  -> {"parse": 12.3, ...}        # 毫秒，可放入响应 metadata
+
+所有阶段同时写入进程内直方图，由 /metrics 以 Prometheus 文本格式导出。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# 秒为单位的默认桶，覆盖毫秒级解析到分钟级 LLM 调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """线程安全的累积直方图，标签名固定，缺省标签值为空字符串"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], list] = {}  # 标签值 -> [各桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(s[0]), s[1], s[2]) for key, s in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            base = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(base, bound)} {c}")
+            lines.append(f"{self.name}_bucket{_labels(base, '+Inf')} {count}")
+            label_str = _labels(base)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+def _labels(base: list[str], le: object = None) -> str:
+    pairs = base + ([f'le="{le}"'] if le is not None else [])
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_DURATION = Histogram(
+    "audit_stage_duration_seconds",
+    "Duration of audit pipeline stages",
+    ("stage", "format"),
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration by route",
+    ("method", "path", "status"),
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls wait for a scheduler slot by priority",
+    ("priority",),
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens",
+    "Tokens per LLM call by kind (prompt / completion)",
+    ("kind",),
+    buckets=(64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+
+_HISTOGRAMS = (STAGE_DURATION, REQUEST_DURATION, LLM_QUEUE_WAIT, LLM_TOKENS)
+
+_timings: ContextVar[Optional[dict[str, float]]] = ContextVar("audit_timings", default=None)
+
+
+def record(stage: str, seconds: float, **labels: str) -> None:
+    """记录一个阶段耗时（秒）；若当前处于 collect_timings 中，同时累加到本请求的 timings（毫秒）"""
+    STAGE_DURATION.observe(seconds, stage=stage, **labels)
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+
+
+@contextmanager
+def span(stage: str, **labels: str) -> Iterator[None]:
+    """计时上下文：退出时调用 record"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def collect_timings() -> Iterator[dict[str, float]]:
+    """在当前上下文中收集各阶段耗时（毫秒），asyncio.to_thread 等复制上下文的调用同样生效"""
+    timings: dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def render_prometheus() -> str:
+    """导出全部指标（Prometheus 文本格式 0.0.4）"""
+    lines: list[str] = []
+    for histogram in _HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
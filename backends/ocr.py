@@ -0,0 +1,134 @@
+"""
+OCR 模块 - 调用本地 Tesseract 识别扫描件与图片中的文字
+
+只在页面没有文本层时由 file_parser 调用；多页并行识别，识别结果按图片内容哈希缓存
+（进程内 LRU + shared_cache），同一份扫描件重复上传不再重复识别。
+
+环境变量：
+  TESSERACT_CMD     - tesseract 可执行文件，默认 "tesseract"
+  OCR_LANG          - 识别语言，默认 "chi_sim+eng"
+  OCR_WORKERS       - 并行识别的页数，默认 CPU 核数
+  OCR_DPI           - PDF 页面渲染分辨率，默认 300
+  OCR_TIMEOUT       - 单页识别超时秒数，默认 120
+  OCR_CACHE_SIZE    - 缓存的识别结果条数，默认 512
+  OCR_DEFAULT       - 未显式指定 enableOcr 时是否启用 OCR，默认 1
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+import shared_cache
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+OCR_LANG = os.getenv("OCR_LANG", "chi_sim+eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "120"))
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "512"))
+OCR_DEFAULT = os.getenv("OCR_DEFAULT", "1").lower() in ("1", "true", "yes")
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def ocr_enabled(enable_ocr: Optional[bool]) -> bool:
+    """根据请求参数与默认配置判断是否执行 OCR（tesseract 不可用时恒为 False）"""
+    wanted = OCR_DEFAULT if enable_ocr is None else enable_ocr
+    return bool(wanted) and is_available()
+
+
+@lru_cache(maxsize=1)
+def is_available() -> bool:
+    """本机是否安装了 tesseract"""
+    return shutil.which(TESSERACT_CMD) is not None
+
+
+def ocr_image(image_bytes: bytes) -> str:
+    """
+    识别单张图片中的文字。
+
+    Args:
+        image_bytes: 图片二进制内容（png/jpg/tiff 等 tesseract 支持的格式）
+
+    Returns:
+        识别出的文本，识别失败返回空字符串
+    """
+    key = hashlib.sha256(image_bytes).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    # 共享缓存键包含识别命令与语言，切换 tesseract 或语言包后不会命中旧结果
+    shared_key = shared_cache.make_key(key, TESSERACT_CMD, OCR_LANG)
+    text = shared_cache.get("ocr", shared_key)
+    if text is None:
+        text = _run_tesseract(image_bytes)
+        if text is None:
+            return ""
+        shared_cache.set("ocr", shared_key, text)
+
+    with _cache_lock:
+        _cache[key] = text
+        _cache.move_to_end(key)
+        while len(_cache) > OCR_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return text
+
+
+def ocr_images(images: list[bytes]) -> list[str]:
+    """
+    并行识别多张图片（如扫描 PDF 的各页），结果顺序与输入一致。
+    """
+    if not images:
+        return []
+    if len(images) == 1:
+        return [ocr_image(images[0])]
+    return list(_get_executor().map(ocr_image, images))
+
+
+def submit_image(image_bytes: bytes) -> Future:
+    """提交单张图片到识别线程池，调用方可边渲染边识别"""
+    return _get_executor().submit(ocr_image, image_bytes)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """识别工作在 tesseract 子进程中完成，线程池只负责调度"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, OCR_WORKERS), thread_name_prefix="ocr")
+        return _executor
+
+
+def _run_tesseract(image_bytes: bytes) -> Optional[str]:
+    """执行 tesseract，失败返回 None（不写入缓存）"""
+    # 并行度由线程池控制，限制每个 tesseract 进程只用单线程，避免 CPU 超额订阅
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+    try:
+        proc = subprocess.run(
+            [TESSERACT_CMD, "stdin", "stdout", "-l", OCR_LANG],
+            input=image_bytes,
+            capture_output=True,
+            timeout=OCR_TIMEOUT,
+            env=env,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log.warning("ocr.tesseract_error", error=f"{type(e).__name__}: {e}")
+        return None
+    if proc.returncode != 0:
+        log.warning("ocr.tesseract_failed", returncode=proc.returncode, stderr=proc.stderr.decode("utf-8", "replace"))
+        return None
+    return proc.stdout.decode("utf-8", "replace").strip()
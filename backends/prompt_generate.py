@@ -1,6 +1,112 @@
 import json
+import os
 import re
-from typing import Dict, Any, List
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+import domain_index
+import shared_cache
+
+# 请求路径上检查标准文件是否变化（stat 全部标准文件）的最短间隔（秒），间隔内沿用上次的摘要
+STANDARD_FILES_CHECK_INTERVAL = float(os.getenv("PROMPT_STANDARD_CHECK_INTERVAL", "5"))
+
+# 标准文件缓存：路径 -> ((mtime_ns, size), 全文, 按 "## " 章节切分结果)，文件变化时自动重新读取
+_file_cache: Dict[str, Tuple[Tuple[int, int], str, List[str]]] = {}
+_file_cache_lock = threading.Lock()
+
+
+def _read_standard_file(file_path: str) -> Tuple[str, List[str]]:
+    """
+    读取标准文件并按章节切分，结果按文件 mtime/大小缓存。
+
+    Raises:
+        OSError / UnicodeDecodeError: 文件不存在或无法读取
+    """
+    st = os.stat(file_path)
+    key = (st.st_mtime_ns, st.st_size)
+    entry = _file_cache.get(file_path)
+    if entry is not None and entry[0] == key:
+        return entry[1], entry[2]
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    sections = re.split(r'(?=^## )', content, flags=re.MULTILINE)
+    with _file_cache_lock:
+        _file_cache[file_path] = (key, content, sections)
+    return content, sections
+
+
+def _standard_paths(json_data: Dict[str, Any]) -> List[str]:
+    """知识树引用的全部标准文件路径（去重，保持顺序）"""
+    paths = [json_data.get('file_path')]
+    stack = list(json_data.get("process_domains", []))
+    while stack:
+        domain = stack.pop()
+        paths.append(domain.get('file_path'))
+        stack.extend(domain.get("related_domains") or [])
+    return list(dict.fromkeys(p for p in paths if p))
+
+
+def standard_files_stamp(json_data: Dict[str, Any]) -> str:
+    """知识树引用的标准文件的 mtime/大小摘要；文件被修改、替换或删除时随之变化"""
+    stamps = []
+    for path in _standard_paths(json_data):
+        try:
+            st = os.stat(path)
+            stamps.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamps.append([path, None, None])
+    return shared_cache.make_key(stamps)
+
+
+# 最近一次计算的标准文件摘要：(知识树版本, 计算时间, 摘要)
+_stamp_cache: Tuple[str, float, str] | None = None
+
+
+def _current_stamp(json_data: Dict[str, Any], version: str) -> str:
+    """同一知识树版本在 STANDARD_FILES_CHECK_INTERVAL 内复用上次的标准文件摘要"""
+    global _stamp_cache
+    now = time.monotonic()
+    entry = _stamp_cache
+    if entry is not None and entry[0] == version and now - entry[1] < STANDARD_FILES_CHECK_INTERVAL:
+        return entry[2]
+    stamp = standard_files_stamp(json_data)
+    _stamp_cache = (version, now, stamp)
+    return stamp
+
+
+def warm_up(json_data: Dict[str, Any]) -> int:
+    """
+    预读知识树引用的全部标准文件，返回成功加载的文件数；读取失败的文件留待请求时按原逻辑报错
+    """
+    loaded = 0
+    for path in _standard_paths(json_data):
+        try:
+            _read_standard_file(path)
+            loaded += 1
+        except Exception:
+            pass
+    return loaded
+
+
+# 提示词中随请求变化的部分，参考文件清单之后直接拼接
+_REQUIREMENTS_TEMPLATE = """
+
+## 生成要求
+
+1. **文件结构**：按照以下文件结构组织内容：{structure}
+2. **层次关系**：体现从总体要求到具体细化的逻辑关系  
+3. **技术要求**：严格遵循参考文件的技术规范
+4. **可操作性**：提供具体的实施指南和检查要点
+5. **组织背景**：按照以下组织背景调整文件内容的表述：{background}
+6. **术语替换**：按照以下规则替换术语：{replace}
+
+请基于以上参考文件生成专业、实用的程序文件。"""
+
+
+def format_requirements(background: str, structure: str, replace: str) -> str:
+    return _REQUIREMENTS_TEMPLATE.format(background=background, structure=structure, replace=replace)
+
 
 class ProcessGroupPromptGenerator:
     """
@@ -8,14 +114,16 @@ class ProcessGroupPromptGenerator:
     输入过程组名称，直接输出对应的提示词
     """
     
-    def __init__(self, json_data: Dict[str, Any]):
+    def __init__(self, json_data: Dict[str, Any], version: str | None = None):
         """
         初始化生成器
         
         Args:
             json_data: 包含过程域映射的JSON数据
+            version: 知识树版本；传入时复用该版本已构建的过程域索引
         """
         self.json_data = json_data
+        self.version = version
         self.main_file = json_data.get("file", "GJB9001C")
         self.main_file_path = json_data.get('file_path')
     
@@ -30,10 +138,7 @@ class ProcessGroupPromptGenerator:
             纯文本内容字符串
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            return content
+            return _read_standard_file(file_path)[0]
             
         except FileNotFoundError:
             return f"错误：文件 {file_path} 未找到"
@@ -50,10 +155,12 @@ class ProcessGroupPromptGenerator:
         Returns:
             按章节分组的文本内容字典
         """
-        plain_text = self.extract_plain_text(file_path)
-        
-        # 按章节分割内容
-        sections = re.split(r'(?=^## )', plain_text, flags=re.MULTILINE)
+        # 按章节分割内容（正常读取时直接使用缓存的切分结果）
+        try:
+            sections = _read_standard_file(file_path)[1]
+        except Exception:
+            plain_text = self.extract_plain_text(file_path)
+            sections = re.split(r'(?=^## )', plain_text, flags=re.MULTILINE)
         
         structured_content = []
         #current_section = "文档开头"
@@ -94,15 +201,11 @@ class ProcessGroupPromptGenerator:
         Returns:
             生成的提示词字符串
         """
-        # 查找目标过程组
-        target_group = None
-        for group in self.json_data.get("process_domains", []):
-            if str(process_group_name) in group.get("name"):
-                target_group = group
-                break
-        
-        if not target_group:
-            return f"错误：未找到名为 '{process_group_name}' 的过程组"
+        # 查找目标过程组（精确匹配优先，部分/近似名称不唯一时返回候选）
+        target, candidates = domain_index.get_index(self.json_data, self.version).resolve_group(str(process_group_name))
+        if target is None:
+            return domain_index.not_found_message(str(process_group_name), candidates)
+        target_group = target.data
         
         # 收集参考文件
         reference_files = self._collect_reference_files(target_group)
@@ -142,19 +245,22 @@ class ProcessGroupPromptGenerator:
                     "type": "细化要求",
                     "level": level,
                     "file_name": domain["file"],
-                    "domain_name": domain["name"],
+                    "domain_name": domain.get("name", ""),
                     "file_path": domain['file_path'],
-                    "description": f"层级{level}细化要求：{domain['name']}"
+                    "description": f"层级{level}细化要求：{domain.get('name', '')}"
                 })
             
             # 递归处理子过程域
             if domain.get("related_domains"):
                 self._collect_domain_files(domain["related_domains"], files, level + 1)
     
-    def _build_prompt_template(self, process_group: Dict[str, Any], reference_files: List[Dict], backgrond:str, structure:str, replace:str) -> str:
+    def build_reference_block(self, process_group: Dict[str, Any]) -> str:
         """
-        构建提示词模板
+        构建提示词中与用户输入无关的部分（参考文件清单），同一知识树版本下结果不变
         """
+        return self._build_reference_block(process_group, self._collect_reference_files(process_group))
+
+    def _build_reference_block(self, process_group: Dict[str, Any], reference_files: List[Dict]) -> str:
         # 分离总体文件和细化文件
         main_files = [f for f in reference_files if f["type"] == "总体要求"]
         detail_files = [f for f in reference_files if f["type"] == "细化要求"]
@@ -162,7 +268,7 @@ class ProcessGroupPromptGenerator:
         # 按层级排序细化文件
         detail_files.sort(key=lambda x: x["level"])
         
-        prompt = f"""请根据以下参考文件，为过程组【{process_group['name']}】生成控制文件。
+        return f"""请根据以下参考文件，为过程组【{process_group['name']}】生成控制文件。
 
 ## 参考文件清单
 
@@ -170,20 +276,13 @@ class ProcessGroupPromptGenerator:
 {self._format_file_list(main_files)}
 
 ### 细化要求文件（文件内容在<DetailContent></DetailContent>标签中）
-{self._format_hierarchical_files(detail_files)}
-
-## 生成要求
-
-1. **文件结构**：按照以下文件结构组织内容：{structure}
-2. **层次关系**：体现从总体要求到具体细化的逻辑关系  
-3. **技术要求**：严格遵循参考文件的技术规范
-4. **可操作性**：提供具体的实施指南和检查要点
-5. **组织背景**：按照以下组织背景调整文件内容的表述：{backgrond}
-6. **术语替换**：按照以下规则替换术语：{replace}
-
-请基于以上参考文件生成专业、实用的程序文件。"""
+{self._format_hierarchical_files(detail_files)}"""
 
-        return prompt
+    def _build_prompt_template(self, process_group: Dict[str, Any], reference_files: List[Dict], backgrond:str, structure:str, replace:str) -> str:
+        """
+        构建提示词模板
+        """
+        return self._build_reference_block(process_group, reference_files) + format_requirements(backgrond, structure, replace)
     
     def _format_file_list(self, files: List[Dict]) -> str:
         """格式化文件列表"""
@@ -245,19 +344,72 @@ def main():
     # test = generator.extract_structured_text("C:\\Users\\29884\\Desktop\\北航课题\\GJB 9001C-2017相关国家军用标准\\GJB9001\\GJB9001C.md")
     # print(test)
 
+# 预计算的参考文件清单：((知识树版本, 标准文件摘要), 过程域索引, {过程组节点 ID: 参考文件清单或 None})
+# 清单内含标准文件全文，知识树版本或任一标准文件（mtime/大小）变化时重新生成；
+# 标准文件的变化最迟在 STANDARD_FILES_CHECK_INTERVAL 后生效
+_reference_blocks: Tuple[Tuple[str, str], domain_index.DomainIndex, Dict[int, Any]] | None = None
+_reference_lock = threading.Lock()
+
+
+def precompute(json_data: Dict[str, Any], version: str) -> int:
+    """
+    为知识树中每个过程组预先生成参考文件清单（经 shared_cache 在 worker 间共享），返回过程组数。
+    单个过程组生成失败时记为 None，请求该过程组时按原逻辑重新生成并抛出错误。
+    """
+    global _reference_blocks, _stamp_cache
+    stamp = standard_files_stamp(json_data)
+    _stamp_cache = (version, time.monotonic(), stamp)
+    index = domain_index.get_index(json_data, version)
+    generator = ProcessGroupPromptGenerator(json_data, version)
+    blocks = {}
+    for node_id in index.groups:
+        group = index.nodes[node_id].data
+        try:
+            # 其他 worker 已为同一知识树版本与标准文件生成过的清单直接复用
+            blocks[node_id] = shared_cache.get_or_set(
+                "prompt", shared_cache.make_key(version, stamp, node_id), lambda: generator.build_reference_block(group)
+            )
+        except Exception:
+            blocks[node_id] = None
+    _reference_blocks = ((version, stamp), index, blocks)
+    return len(blocks)
+
+
+def _blocks_for(json_data: Dict[str, Any], version: str) -> Tuple[domain_index.DomainIndex, Dict[int, Any]]:
+    key = (version, _current_stamp(json_data, version))
+    entry = _reference_blocks
+    if entry is None or entry[0] != key:
+        with _reference_lock:
+            entry = _reference_blocks
+            if entry is None or entry[0] != key:
+                precompute(json_data, version)
+                entry = _reference_blocks
+    return entry[1], entry[2]
+
+
 # 直接使用函数
-def generate_prompt_from_json(json_data: Dict[str, Any], process_group_name: str, background:str, structure:str, replace:str) -> str:
+def generate_prompt_from_json(json_data: Dict[str, Any], process_group_name: str, background:str, structure:str, replace:str, version: str | None = None) -> str:
     """
     一键生成提示词的便捷函数
     
     Args:
         json_data: JSON数据
         process_group_name: 过程组名称
+        version: 知识树版本（knowledge_store 快照摘要）；传入时使用预计算的参考文件清单，
+                 只拼接用户输入部分
         
     Returns:
         生成的提示词
     """
-    generator = ProcessGroupPromptGenerator(json_data)
+    if version is not None:
+        index, blocks = _blocks_for(json_data, version)
+        group, candidates = index.resolve_group(str(process_group_name))
+        if group is None:
+            return domain_index.not_found_message(str(process_group_name), candidates)
+        block = blocks.get(group.id)
+        if block is not None:
+            return block + format_requirements(background, structure, replace)
+    generator = ProcessGroupPromptGenerator(json_data, version)
     return generator.generate_prompt(process_group_name, background, structure,replace)
 
 if __name__ == "__main__":
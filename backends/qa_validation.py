@@ -0,0 +1,224 @@
+"""
+问答校验 - 本地规则优先，仅对模糊回答调用大模型，并把短时间内到达的回答合并为一次调用
+
+本地判定：
+  1. 规范化（NFKC、小写、去除空白与标点）后完全一致 -> 通过
+  2. 与参考答案的字符 bigram 相似度（Dice 系数）>= QA_PASS_SIMILARITY -> 通过
+  3. 相似度 < QA_FAIL_SIMILARITY -> 不通过
+  4. 介于两者之间：开启 useAiValidation 时交给大模型，否则按 QA_MIN_SIMILARITY 判定
+未配置参考答案时，开启 useAiValidation 交给大模型，否则只校验回答非空。
+
+大模型调用经 MicroBatcher 合并：QA_BATCH_WINDOW_MS 内到达的回答（最多 QA_BATCH_MAX 个）
+合并为一次调用；调用失败时按本地相似度降级判定。
+
+环境变量：
+  QA_PASS_SIMILARITY   - 直接通过的相似度下限，默认 0.85
+  QA_FAIL_SIMILARITY   - 直接不通过的相似度上限，默认 0.2
+  QA_MIN_SIMILARITY    - 不使用大模型时的通过阈值，默认 0.6
+  QA_BATCH_WINDOW_MS   - 合并窗口（毫秒），默认 50
+  QA_BATCH_MAX         - 单次调用最多合并的回答数，默认 20
+"""
+
+import asyncio
+import os
+import unicodedata
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional
+
+import llm_client
+import llm_scheduler
+import metrics
+from audit_prompt import build_qa_validation_prompt
+from structured_log import get_logger
+
+QA_PASS_SIMILARITY = float(os.getenv("QA_PASS_SIMILARITY", "0.85"))
+QA_FAIL_SIMILARITY = float(os.getenv("QA_FAIL_SIMILARITY", "0.2"))
+QA_MIN_SIMILARITY = float(os.getenv("QA_MIN_SIMILARITY", "0.6"))
+QA_BATCH_WINDOW_MS = int(os.getenv("QA_BATCH_WINDOW_MS", "50"))
+QA_BATCH_MAX = int(os.getenv("QA_BATCH_MAX", "20"))
+
+log = get_logger(__name__)
+
+
+def normalize(text: str) -> str:
+    """NFKC 规范化、转小写，去除空白、标点与符号"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PSZC")
+
+
+def _ngrams(text: str, n: int) -> Counter:
+    if len(text) < n:
+        return Counter([text]) if text else Counter()
+    return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def similarity(a: str, b: str, n: int = 2) -> float:
+    """规范化后字符 n-gram 的 Dice 系数，取值 0~1"""
+    grams_a, grams_b = _ngrams(normalize(a), n), _ngrams(normalize(b), n)
+    total = sum(grams_a.values()) + sum(grams_b.values())
+    if total == 0:
+        return 1.0
+    return 2 * sum((grams_a & grams_b).values()) / total
+
+
+def _result(is_valid: bool, score: float, feedback: str, method: str, sim: Optional[float] = None) -> dict[str, Any]:
+    result = {"isValid": is_valid, "score": int(round(score)), "feedback": feedback, "method": method}
+    if sim is not None:
+        result["similarity"] = round(sim, 4)
+    return result
+
+
+def local_validate(answer: str, expected: Optional[str], use_ai: bool = False) -> Optional[dict[str, Any]]:
+    """
+    本地校验回答，返回校验结果；需要交给大模型判定时返回 None。
+    """
+    if not normalize(answer):
+        return _result(False, 0, "回答为空", "non_empty")
+    if not expected or not normalize(expected):
+        if use_ai:
+            return None
+        return _result(True, 100, "未配置参考答案，仅校验回答非空", "non_empty")
+
+    if normalize(answer) == normalize(expected):
+        return _result(True, 100, "回答与参考答案一致", "exact", 1.0)
+
+    sim = similarity(answer, expected)
+    if sim >= QA_PASS_SIMILARITY:
+        return _result(True, sim * 100, "回答与参考答案高度相似", "similarity", sim)
+    if sim < QA_FAIL_SIMILARITY:
+        return _result(False, sim * 100, "回答与参考答案差异较大", "similarity", sim)
+    if use_ai:
+        return None
+    return _fallback(sim)
+
+
+def _fallback(sim: float) -> dict[str, Any]:
+    """不使用（或无法使用）大模型时按相似度阈值判定"""
+    if sim >= QA_MIN_SIMILARITY:
+        return _result(True, sim * 100, "回答与参考答案基本一致", "similarity", sim)
+    return _result(False, sim * 100, "回答与参考答案不一致", "similarity", sim)
+
+
+class MicroBatcher:
+    """
+    异步微批处理器：窗口期内提交的条目合并后调用一次 batch_fn。
+
+    batch_fn(items) 在线程池中执行，需返回与 items 等长的结果列表；
+    抛出异常时该批所有条目的 submit 均抛出同一异常。
+    """
+
+    def __init__(self, batch_fn: Callable[[list], list], window_ms: int = QA_BATCH_WINDOW_MS, max_size: int = QA_BATCH_MAX):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def submit(self, item: Any) -> Awaitable[Any]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环变化（如测试中每个请求新建循环）时丢弃旧循环的状态
+            self._loop, self._pending, self._timer = loop, [], None
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = await asyncio.to_thread(self.batch_fn, items)
+            if len(results) != len(items):
+                raise ValueError(f"批处理结果数量不匹配：{len(results)} != {len(items)}")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _validate_batch_with_llm(items: list[dict[str, Any]]) -> list[Optional[dict[str, Any]]]:
+    """一次大模型调用校验一批回答；单条结果缺失时对应位置为 None"""
+    numbered = [{**item, "id": i + 1} for i, item in enumerate(items)]
+    messages = build_qa_validation_prompt(numbered)
+    with metrics.span("qa_llm_batch"):
+        response_text = llm_scheduler.call(
+            llm_client.call_llm, messages, json_mode=True, priority=llm_scheduler.INTERACTIVE
+        )
+    parsed = llm_client.extract_json_from_text(response_text)
+    log.info("qa_validation.llm_batch", size=len(items))
+
+    by_id = {}
+    for entry in parsed.get("results") or []:
+        if isinstance(entry, dict) and "id" in entry:
+            try:
+                by_id[int(entry["id"])] = entry
+            except (TypeError, ValueError):
+                continue
+
+    results = []
+    for item in numbered:
+        entry = by_id.get(item["id"])
+        if entry is None:
+            results.append(None)
+            continue
+        is_valid = entry.get("isValid", False)
+        if isinstance(is_valid, str):
+            is_valid = is_valid.lower() in ("true", "1", "yes", "通过")
+        try:
+            score = float(entry.get("score", 100 if is_valid else 0))
+        except (TypeError, ValueError):
+            score = 100 if is_valid else 0
+        results.append(_result(bool(is_valid), max(0.0, min(100.0, score)), str(entry.get("feedback", "")), "llm"))
+    return results
+
+
+_batcher = MicroBatcher(_validate_batch_with_llm)
+
+
+async def validate_answer(
+    answer: str,
+    *,
+    question: str = "",
+    expected: Optional[str] = None,
+    use_ai: bool = False,
+    criteria: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    校验问答回答，返回 {isValid, score, feedback, method, similarity?}。
+    本地无法判定且开启 use_ai 时经微批处理器调用大模型，失败时按相似度降级。
+    """
+    result = local_validate(answer, expected, use_ai)
+    if result is not None:
+        return result
+
+    item = {"question": question, "expectedAnswer": expected or "", "answer": answer, "criteria": criteria or ""}
+    try:
+        result = await _batcher.submit(item)
+    except Exception as e:
+        log.warning("qa_validation.llm_failed", error=f"{type(e).__name__}: {e}")
+        result = None
+    if result is not None:
+        return result
+
+    if expected:
+        degraded = _fallback(similarity(answer, expected))
+    else:
+        degraded = _result(True, 100, "未配置参考答案，仅校验回答非空", "non_empty")
+    degraded["method"] = "local_fallback"
+    return degraded
@@ -0,0 +1,78 @@
+"""
+响应序列化 - orjson 加速的 JSON 响应类与审核步骤统一结果封装
+
+审核步骤接口直接返回 step_response() 构造的 Response 对象，FastAPI 不再对返回值做
+jsonable_encoder 遍历与校验；未安装 orjson 时回退到标准库 json。
+"""
+
+import json
+import time
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """orjson / json 无法直接序列化的对象"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节串（中文不转义）"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 渲染的 JSONResponse，作为应用默认响应类"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def step_response(
+    data: Any,
+    *,
+    message: str,
+    duration_ms: int,
+    success: bool = True,
+    code: Optional[int] = None,
+    inner_message: Optional[str] = None,
+) -> FastJSONResponse:
+    """
+    构造审核步骤的统一返回结构：
+    {success, code, message, data: {success, message, data, duration}, timestamp}
+
+    Args:
+        data: 步骤结果数据
+        message: 外层提示信息
+        duration_ms: 处理耗时（毫秒）
+        success: 是否成功/通过
+        code: 业务码，默认成功 200、失败 400
+        inner_message: 内层提示信息，默认与 message 相同
+    """
+    return FastJSONResponse({
+        "success": success,
+        "code": code if code is not None else (200 if success else 400),
+        "message": message,
+        "data": {
+            "success": success,
+            "message": inner_message if inner_message is not None else message,
+            "data": data,
+            "duration": duration_ms,
+        },
+        "timestamp": int(time.time() * 1000),
+    })
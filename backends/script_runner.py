@@ -0,0 +1,705 @@
+"""
+脚本检查执行器 - 预启动工作进程池 + 每个任务 fork 受限子进程
+
+工作进程在服务启动时预先拉起并常驻（python -m script_runner --worker），请求只需把任务
+写入空闲进程的标准输入；工作进程为每个任务 fork 一个子进程执行脚本，子进程：
+  - 设置 CPU 时间、地址空间、写文件大小等 rlimit
+  - 尽量进入独立的 user+net+mount 命名空间：无网络，服务目录（SCRIPT_HIDDEN_PATHS）与 /proc
+    以空的只读 tmpfs 覆盖；python 脚本另加审计钩子禁止创建 socket、启动子进程、读取标准库与
+    工作目录以外的文件
+  - 环境变量从零构建，只含请求传入的 env 与最小 PATH（服务端的凭据等不会泄露给脚本），
+    在一次性的临时工作目录中运行
+  - 标准输入/输出重定向，不会干扰与工作进程之间的通信
+无法创建命名空间时 javascript 拒绝执行（审计钩子只作用于 python）。
+工作进程负责墙钟超时（超时直接 SIGKILL 子进程），服务端再留一段宽限时间兜底，
+超时仍无响应的工作进程会被终止并替换。
+
+支持的语言：
+  python     - 在子进程内 exec；可读取变量 inputData / env，把结论写入变量 result
+  javascript - 子进程内调用 node 执行，约定同 python（需安装 node）
+  sql        - 在内存 SQLite 中执行，inputData 按表导入；约定最后一条查询返回违规记录，
+               0 行即通过
+
+结论约定（python / javascript 的 result）：
+  未设置或 None -> 执行无异常即通过；bool -> 即结论；
+  dict -> 取 passed 字段，checks/checkDetails 字段（[{name, passed, ...}]）并入检查明细
+
+不支持 fork 的平台（Windows）上工作进程直接执行任务、无 rlimit，执行后即退出并由进程池补充；
+此时 javascript 同样拒绝执行。
+
+环境变量：
+  SCRIPT_WORKERS         - 工作进程数，默认 2
+  SCRIPT_TIMEOUT_MS      - 默认超时（毫秒），默认 5000
+  SCRIPT_MAX_TIMEOUT_MS  - 请求可设置的最大超时（毫秒），默认 60000
+  SCRIPT_MEMORY_MB       - 默认内存上限（MB），默认 256
+  SCRIPT_MAX_MEMORY_MB   - 请求可设置的最大内存上限（MB），默认 1024
+  SCRIPT_MAX_OUTPUT      - stdout/stderr 各保留的最大字符数，默认 65536
+  SCRIPT_MAX_ROWS        - sql 结果最多返回的行数，默认 1000
+  NODE_CMD               - node 可执行文件，默认 node
+  SCRIPT_HIDDEN_PATHS    - 对脚本隐藏的目录（os.pathsep 分隔），默认为项目根目录；backends 目录总是隐藏
+"""
+
+import json
+import math
+import os
+import queue
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+SCRIPT_WORKERS = int(os.getenv("SCRIPT_WORKERS", "2"))
+SCRIPT_TIMEOUT_MS = int(os.getenv("SCRIPT_TIMEOUT_MS", "5000"))
+SCRIPT_MAX_TIMEOUT_MS = int(os.getenv("SCRIPT_MAX_TIMEOUT_MS", "60000"))
+SCRIPT_MEMORY_MB = int(os.getenv("SCRIPT_MEMORY_MB", "256"))
+SCRIPT_MAX_MEMORY_MB = int(os.getenv("SCRIPT_MAX_MEMORY_MB", "1024"))
+SCRIPT_MAX_OUTPUT = int(os.getenv("SCRIPT_MAX_OUTPUT", "65536"))
+SCRIPT_MAX_ROWS = int(os.getenv("SCRIPT_MAX_ROWS", "1000"))
+NODE_CMD = os.getenv("NODE_CMD", "node")
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_HIDDEN_PATHS = [
+    p for p in os.getenv("SCRIPT_HIDDEN_PATHS", os.path.dirname(_APP_DIR)).split(os.pathsep) if p
+]
+# 脚本与 node 可见的 PATH
+_SANDBOX_PATH = "/usr/local/bin:/usr/bin:/bin"
+
+LANGUAGES = ("python", "javascript", "sql")
+
+_CAN_FORK = hasattr(os, "fork")
+# 服务端在任务超时之外额外等待的时间（进程调度、node 启动等）
+_GRACE_SECONDS = 5.0
+# 等待空闲工作进程的最长时间
+_QUEUE_WAIT_SECONDS = 30.0
+
+
+# ==================== 服务端：工作进程池 ====================
+
+class _Worker:
+    """一个常驻工作进程，按行收发 JSON"""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "script_runner", "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=_APP_DIR,
+            env=_worker_env(),
+        )
+        self._lines: queue.Queue = queue.Queue()
+        threading.Thread(target=self._read_lines, daemon=True).start()
+
+    def _read_lines(self) -> None:
+        for line in self.proc.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def request(self, job: dict, timeout: float) -> Optional[dict]:
+        """发送任务并等待结果；超时或进程退出返回 None"""
+        try:
+            self.proc.stdin.write(json.dumps(job, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            self.proc.stdin.flush()
+            line = self._lines.get(timeout=timeout)
+        except (OSError, queue.Empty):
+            return None
+        return json.loads(line) if line else None
+
+    def kill(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+
+
+def _worker_env() -> dict[str, str]:
+    """
+    工作进程的环境变量：只传递执行器自身的配置。工作进程及其 fork 的脚本子进程都看不到
+    服务端环境（/proc/<pid>/environ 保留的是进程启动时的环境，启动后再清理为时已晚）。
+    """
+    env = {k: v for k, v in os.environ.items() if k.startswith("SCRIPT_")}
+    env.update(
+        PATH=_SANDBOX_PATH,
+        LANG="C.UTF-8",
+        NODE_CMD=shutil.which(NODE_CMD) or NODE_CMD,
+        SCRIPT_HIDDEN_PATHS=os.pathsep.join(SCRIPT_HIDDEN_PATHS),
+    )
+    if sys.platform == "win32":
+        env["SYSTEMROOT"] = os.environ.get("SYSTEMROOT", "")
+    return env
+
+
+class WorkerPool:
+    """固定大小的工作进程池，异常或一次性工作进程在后台补充"""
+
+    def __init__(self, size: int = SCRIPT_WORKERS):
+        self.size = max(1, size)
+        self._idle: queue.Queue = queue.Queue()
+        self._started = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for _ in range(self.size):
+                self._idle.put(_Worker())
+
+    def run(self, job: dict, timeout: float) -> Optional[dict]:
+        """在空闲工作进程上执行任务；无空闲进程时排队等待"""
+        self.start()
+        try:
+            worker = self._idle.get(timeout=_QUEUE_WAIT_SECONDS)
+        except queue.Empty:
+            raise RuntimeError("脚本执行队列繁忙，请稍后重试")
+
+        result = worker.request(job, timeout)
+        if self._closed:
+            worker.kill()
+        elif result is None or not _CAN_FORK:
+            threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+        else:
+            self._idle.put(worker)
+        return result
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.kill()
+        if not self._closed:
+            self._idle.put(_Worker())
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool
+
+
+def start_pool() -> int:
+    """预先拉起工作进程（服务启动预热），返回进程数"""
+    pool = get_pool()
+    pool.start()
+    return pool.size
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def run_script(
+    language: str,
+    code: str,
+    *,
+    input_data: Any = None,
+    env: Optional[dict[str, str]] = None,
+    timeout_ms: Optional[int] = None,
+    memory_mb: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    在沙箱中执行脚本。
+
+    Args:
+        language: python | javascript | sql
+        code: 脚本内容
+        input_data: 脚本输入数据（python/javascript 的 inputData 变量，sql 的导入表）
+        env: 环境变量（python/javascript 可通过 env 变量或进程环境读取）
+        timeout_ms: 墙钟超时（毫秒），默认 SCRIPT_TIMEOUT_MS，上限 SCRIPT_MAX_TIMEOUT_MS
+        memory_mb: 内存上限（MB），默认 SCRIPT_MEMORY_MB，上限 SCRIPT_MAX_MEMORY_MB
+
+    Returns:
+        {passed, result, stdout, stderr, error, timedOut, executionTime, checkDetails, sandbox}
+
+    Raises:
+        ValueError: 不支持的语言
+        RuntimeError: 执行队列繁忙
+    """
+    language = (language or "").lower()
+    if language not in LANGUAGES:
+        raise ValueError(f"不支持的脚本语言: {language}，可选 {', '.join(LANGUAGES)}")
+
+    timeout_ms = min(timeout_ms or SCRIPT_TIMEOUT_MS, SCRIPT_MAX_TIMEOUT_MS)
+    job = {
+        "language": language,
+        "code": code,
+        "inputData": input_data,
+        "env": {str(k): str(v) for k, v in (env or {}).items()},
+        "timeoutMs": timeout_ms,
+        "memoryMb": min(memory_mb or SCRIPT_MEMORY_MB, SCRIPT_MAX_MEMORY_MB),
+    }
+    start = time.perf_counter()
+    outcome = get_pool().run(job, timeout_ms / 1000 + _GRACE_SECONDS)
+    if outcome is None:
+        outcome = _failure("执行超时，工作进程已重启", timed_out=True)
+        outcome["executionTime"] = int((time.perf_counter() - start) * 1000)
+    return outcome
+
+
+# ==================== 工作进程 ====================
+
+def _failure(error: str, *, timed_out: bool = False, syntax_ok: bool = True) -> dict[str, Any]:
+    details = [{"name": "语法检查", "passed": syntax_ok}]
+    if syntax_ok:
+        details.append({"name": "执行", "passed": False, "message": error})
+    return {
+        "passed": False,
+        "result": None,
+        "stdout": "",
+        "stderr": "",
+        "error": error,
+        "timedOut": timed_out,
+        "checkDetails": details,
+    }
+
+
+def _verdict(result: Any) -> tuple[bool, list[dict]]:
+    """按结论约定把脚本 result 转为 (是否通过, 逻辑检查明细)"""
+    if isinstance(result, dict) and "passed" in result:
+        checks = result.get("checkDetails") or result.get("checks") or []
+        checks = [c for c in checks if isinstance(c, dict)]
+        return bool(result["passed"]) and all(c.get("passed", True) for c in checks), checks
+    if isinstance(result, bool):
+        return result, [{"name": "逻辑验证", "passed": result}]
+    return True, [{"name": "逻辑验证", "passed": True}]
+
+
+# python 脚本内禁止的审计事件（网络、子进程、加载动态库）
+_DENIED_EVENTS = frozenset({
+    "socket.__new__", "socket.connect", "socket.bind", "socket.getaddrinfo",
+    "subprocess.Popen", "os.system", "os.exec", "os.posix_spawn", "os.spawn", "os.fork", "os.forkpty",
+    "ctypes.dlopen",
+})
+
+
+_FS_EVENTS = frozenset({"open", "os.listdir", "os.scandir"})
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+
+
+def _under(path: str, roots: list[str]) -> bool:
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+def _is_hidden(path: str) -> bool:
+    return _under(path, [_APP_DIR, *SCRIPT_HIDDEN_PATHS])
+
+
+def _make_deny_hook(workdir: str) -> Callable[[str, tuple], None]:
+    """
+    python 脚本的审计钩子：禁止网络、子进程等操作；文件只允许读取 Python 安装目录（标准库、
+    已安装的包）与写入工作目录，服务目录即使位于可读目录之下也不可访问
+    """
+    workdir = os.path.realpath(workdir)
+    read_roots = [
+        os.path.realpath(p) for p in {sys.base_prefix, sys.prefix, *sys.path} if p and os.path.isabs(p)
+    ]
+    read_roots = [p for p in read_roots if not _is_hidden(p) and p != os.sep] + [workdir, os.devnull]
+
+    def hook(event: str, args: tuple) -> None:
+        if event in _DENIED_EVENTS:
+            raise PermissionError(f"脚本沙箱禁止该操作: {event}")
+        if event not in _FS_EVENTS:
+            return
+        target = args[0] if args else None
+        if target is None or isinstance(target, int):
+            return  # 已打开的文件描述符
+        path = os.path.realpath(os.fsdecode(target))
+        writing = event == "open" and len(args) > 2 and isinstance(args[2], int) and args[2] & _WRITE_FLAGS
+        allowed = _under(path, [workdir]) if writing else _under(path, read_roots) and not _is_hidden(path)
+        if not allowed:
+            raise PermissionError(f"脚本沙箱禁止访问该路径: {path}")
+
+    return hook
+
+
+def _sandbox_env(job: dict) -> dict[str, str]:
+    """脚本子进程的环境变量：从零构建，只含请求传入的 env 与最小 PATH"""
+    return {"PATH": _SANDBOX_PATH, "LANG": "C.UTF-8", "HOME": os.getcwd(), **job["env"]}
+
+
+def _exec_python(job: dict) -> dict[str, Any]:
+    try:
+        compiled = compile(job["code"], "<script>", "exec")
+    except SyntaxError as e:
+        return _failure(f"SyntaxError: {e}", syntax_ok=False)
+
+    namespace = {"__name__": "__script__", "inputData": job["inputData"], "env": job["env"], "result": None}
+    sys.path[:] = [p for p in sys.path if p and not _is_hidden(os.path.realpath(p))]
+    sys.addaudithook(_make_deny_hook(os.getcwd()))
+    try:
+        exec(compiled, namespace)
+    except BaseException as e:
+        return _failure(f"{type(e).__name__}: {e}")
+    return _success(namespace.get("result"))
+
+
+def _success(result: Any) -> dict[str, Any]:
+    passed, checks = _verdict(result)
+    return {
+        "passed": passed,
+        "result": result,
+        "stdout": "",
+        "stderr": "",
+        "error": None,
+        "timedOut": False,
+        "checkDetails": [{"name": "语法检查", "passed": True}, {"name": "执行", "passed": True}, *checks],
+    }
+
+
+# node 包装脚本：从标准输入读取任务，最后一行输出带标记的结果 JSON
+_RESULT_MARK = "\x1e__SCRIPT_RESULT__"
+_NODE_WRAPPER = r"""
+const job = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const out = {};
+let fn = null;
+try {
+  fn = new Function('inputData', 'env', job.code + '\n;return typeof result === "undefined" ? null : result;');
+} catch (e) {
+  out.syntaxError = String(e);
+}
+(async () => {
+  if (fn) {
+    try {
+      let r = fn(job.inputData, job.env);
+      if (r && typeof r.then === 'function') r = await r;
+      out.result = r === undefined ? null : r;
+    } catch (e) {
+      out.error = String((e && e.stack) || e);
+    }
+  }
+  process.stdout.write('\n' + MARK + JSON.stringify(out) + '\n');
+})();
+""".replace("MARK", json.dumps(_RESULT_MARK))
+
+
+def _exec_javascript(job: dict) -> dict[str, Any]:
+    sandbox = job.get("sandbox") or {}
+    if sandbox.get("network") != "netns" or sandbox.get("filesystem") != "mountns":
+        # 审计钩子只作用于 python，无法隔离时不能执行 node
+        return _failure("当前环境无法创建网络与文件系统隔离，拒绝执行 javascript")
+    try:
+        proc = subprocess.run(
+            [NODE_CMD, f"--max-old-space-size={job['memoryMb']}", "-e", _NODE_WRAPPER],
+            input=json.dumps({"code": job["code"], "inputData": job["inputData"], "env": job["env"]}),
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            env=_sandbox_env(job),
+            cwd=os.getcwd(),
+            timeout=job["timeoutMs"] / 1000,
+        )
+    except FileNotFoundError:
+        return _failure(f"未找到 node 运行时（NODE_CMD={NODE_CMD}）")
+    except subprocess.TimeoutExpired:
+        return _failure("执行超时", timed_out=True)
+
+    # 结果行之后仍可能有异步回调的输出，并回 stdout
+    stdout, _, marked = proc.stdout.rpartition(_RESULT_MARK)
+    marked, _, trailing = marked.partition("\n")
+    stdout = stdout.rstrip("\n") + ("\n" + trailing if trailing.strip() else "")
+    try:
+        out = json.loads(marked)
+    except json.JSONDecodeError:
+        outcome = _failure(f"node 异常退出，退出码 {proc.returncode}")
+    else:
+        if "syntaxError" in out:
+            outcome = _failure(out["syntaxError"], syntax_ok=False)
+        elif "error" in out:
+            outcome = _failure(out["error"])
+        else:
+            outcome = _success(out.get("result"))
+    outcome["stdout"] = stdout if marked else proc.stdout
+    outcome["stderr"] = proc.stderr
+    return outcome
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_value(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _load_table(conn: sqlite3.Connection, name: str, rows: list) -> None:
+    records = [r if isinstance(r, dict) else {"value": r} for r in rows]
+    columns = list(dict.fromkeys(k for r in records for k in r)) or ["value"]
+    conn.execute(f"CREATE TABLE {_quote(name)} ({', '.join(_quote(c) for c in columns)})")
+    placeholders = ", ".join("?" * len(columns))
+    conn.executemany(
+        f"INSERT INTO {_quote(name)} VALUES ({placeholders})",
+        ([_sql_value(r.get(c)) for c in columns] for r in records),
+    )
+
+
+def _load_input(conn: sqlite3.Connection, input_data: Any) -> None:
+    """
+    导入 inputData：
+      list            -> 表 input
+      dict            -> 值为 list 的键各自成表，其余键合并为单行表 input
+    """
+    if isinstance(input_data, list):
+        _load_table(conn, "input", input_data)
+    elif isinstance(input_data, dict):
+        scalars = {}
+        for key, value in input_data.items():
+            if isinstance(value, list):
+                _load_table(conn, key, value)
+            else:
+                scalars[key] = value
+        if scalars:
+            _load_table(conn, "input", [scalars])
+    elif input_data is not None:
+        _load_table(conn, "input", [input_data])
+
+
+def _split_sql(script: str) -> list[str]:
+    """按语句完整性切分 SQL 脚本（字符串、注释中的分号不会误切）"""
+    statements, buf = [], ""
+    for part in script.split(";"):
+        buf += part + ";"
+        if sqlite3.complete_statement(buf):
+            if buf.strip(" \t\r\n;"):
+                statements.append(buf)
+            buf = ""
+    if buf.strip(" \t\r\n;"):
+        statements.append(buf)
+    return statements
+
+
+def _sql_authorizer(action: int, *args) -> int:
+    # 禁止 ATTACH 外部数据库文件
+    return sqlite3.SQLITE_DENY if action == sqlite3.SQLITE_ATTACH else sqlite3.SQLITE_OK
+
+
+def _exec_sql(job: dict) -> dict[str, Any]:
+    conn = sqlite3.connect(":memory:")
+    try:
+        try:
+            _load_input(conn, job["inputData"])
+        except sqlite3.Error as e:
+            return _failure(f"inputData 导入失败: {e}")
+        conn.set_authorizer(_sql_authorizer)
+
+        statements = _split_sql(job["code"])
+        for stmt in statements:
+            if not sqlite3.complete_statement(stmt):
+                return _failure("SQL 语句不完整", syntax_ok=False)
+        columns, rows, row_count = None, [], 0
+        for stmt in statements:
+            try:
+                cursor = conn.execute(stmt)
+            except sqlite3.Error as e:
+                return _failure(f"{type(e).__name__}: {e}")
+            if cursor.description:
+                columns = [d[0] for d in cursor.description]
+                fetched = cursor.fetchall()
+                row_count = len(fetched)
+                rows = [list(r) for r in fetched[:SCRIPT_MAX_ROWS]]
+    finally:
+        conn.close()
+
+    if columns is None:
+        return _success(None)
+    passed = row_count == 0
+    outcome = _success({"columns": columns, "rows": rows, "rowCount": row_count})
+    outcome["passed"] = passed
+    outcome["checkDetails"][-1] = {"name": "逻辑验证", "passed": passed, "violations": row_count}
+    return outcome
+
+
+_EXECUTORS = {"python": _exec_python, "javascript": _exec_javascript, "sql": _exec_sql}
+
+# Linux unshare / mount 标志
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_MS_RDONLY = 0x1
+_MS_REC = 0x4000
+_MS_PRIVATE = 0x40000
+
+
+def _isolate() -> dict[str, str]:
+    """
+    尝试进入独立的 user+net+mount 命名空间：网络只有未启用的回环网卡；服务目录与 /proc
+    （可读取服务进程的环境变量与命令行）以空的只读 tmpfs 覆盖。返回采用的隔离方式。
+    """
+    isolation = {"network": "audit_hook", "filesystem": "audit_hook"}
+    if not sys.platform.startswith("linux"):
+        return isolation
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET | _CLONE_NEWNS) != 0:
+            return isolation
+        isolation["network"] = "netns"
+        if libc.mount(b"none", b"/", None, _MS_REC | _MS_PRIVATE, None) != 0:
+            return isolation
+        targets = [_APP_DIR, *SCRIPT_HIDDEN_PATHS, "/proc"]
+        stdlib = os.path.realpath(sys.base_prefix)
+        for target in dict.fromkeys(os.path.realpath(t) for t in targets):
+            if target != _APP_DIR and _under(stdlib, [target]):
+                continue  # 隐藏后 python 无法再导入标准库
+            if os.path.isdir(target) and libc.mount(
+                b"tmpfs", os.fsencode(target), b"tmpfs", _MS_RDONLY, b"size=4k"
+            ) != 0:
+                return isolation
+        isolation["filesystem"] = "mountns"
+    except Exception:
+        pass
+    return isolation
+
+
+def _apply_limits(job: dict) -> dict[str, Any]:
+    """在子进程内设置资源限制与网络、文件系统隔离，返回沙箱说明"""
+    import resource
+
+    cpu_seconds = math.ceil(job["timeoutMs"] / 1000) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (16 * 1024 * 1024, 16 * 1024 * 1024))
+    # V8 预留大量虚拟地址空间，node 改用 --max-old-space-size 限制堆大小
+    if job["language"] != "javascript":
+        limit = job["memoryMb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return {**_isolate(), "cpuSeconds": cpu_seconds, "memoryMb": job["memoryMb"]}
+
+
+def _read_output(fp) -> str:
+    fp.seek(0)
+    text = fp.read(SCRIPT_MAX_OUTPUT * 4 + 4).decode("utf-8", errors="replace")
+    return text if len(text) <= SCRIPT_MAX_OUTPUT else text[:SCRIPT_MAX_OUTPUT] + "…(输出已截断)"
+
+
+def _run_forked(job: dict) -> dict[str, Any]:
+    """fork 子进程执行任务，墙钟超时后 SIGKILL"""
+    import select
+    import signal
+
+    read_fd, write_fd = os.pipe()
+    workdir = tempfile.mkdtemp(prefix="script-")
+    with tempfile.TemporaryFile() as out_fp, tempfile.TemporaryFile() as err_fp:
+        pid = os.fork()
+        if pid == 0:  # 子进程
+            code = 0
+            try:
+                os.close(read_fd)
+                devnull = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(devnull, 0)
+                os.dup2(out_fp.fileno(), 1)
+                os.dup2(err_fp.fileno(), 2)
+                os.chdir(workdir)
+                os.environ.clear()
+                os.environ.update(_sandbox_env(job))
+                sandbox = job["sandbox"] = _apply_limits(job)
+                outcome = _EXECUTORS[job["language"]](job)
+                outcome["sandbox"] = sandbox
+                sys.stdout.flush()
+                sys.stderr.flush()
+                data = json.dumps(outcome, ensure_ascii=False, default=str).encode("utf-8")
+                while data:
+                    data = data[os.write(write_fd, data):]
+            except BaseException:
+                code = 1
+            os._exit(code)
+
+        os.close(write_fd)
+        chunks = []
+        deadline = time.monotonic() + job["timeoutMs"] / 1000
+        timed_out = False
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                os.kill(pid, signal.SIGKILL)
+                break
+            ready, _, _ = select.select([read_fd], [], [], remaining)
+            if ready:
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        os.close(read_fd)
+        _, status = os.waitpid(pid, 0)
+
+        if timed_out:
+            outcome = _failure(f"执行超时（{job['timeoutMs']}ms）", timed_out=True)
+        elif chunks:
+            outcome = json.loads(b"".join(chunks))
+        elif os.WIFSIGNALED(status) and os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL):
+            outcome = _failure("CPU 时间超出限制", timed_out=True)
+        else:
+            outcome = _failure("脚本进程异常退出（可能超出内存限制）")
+
+        captured_out, captured_err = _read_output(out_fp), _read_output(err_fp)
+    shutil.rmtree(workdir, ignore_errors=True)
+    # python/sql 的输出来自重定向的文件描述符，javascript 的输出由 node 子进程单独捕获
+    outcome["stdout"] = outcome.get("stdout") or captured_out
+    outcome["stderr"] = outcome.get("stderr") or captured_err
+    return outcome
+
+
+def _run_inline(job: dict) -> dict[str, Any]:
+    """不支持 fork 时直接在工作进程内执行（无 rlimit，超时由服务端终止工作进程）"""
+    import contextlib
+    import io
+
+    out, err = io.StringIO(), io.StringIO()
+    os.chdir(tempfile.mkdtemp(prefix="script-"))
+    os.environ.clear()
+    os.environ.update(_sandbox_env(job))
+    job["sandbox"] = {"network": "audit_hook", "filesystem": "audit_hook"}
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        outcome = _EXECUTORS[job["language"]](job)
+    outcome["stdout"] = outcome.get("stdout") or out.getvalue()[:SCRIPT_MAX_OUTPUT]
+    outcome["stderr"] = outcome.get("stderr") or err.getvalue()[:SCRIPT_MAX_OUTPUT]
+    outcome["sandbox"] = job["sandbox"]
+    return outcome
+
+
+def _worker_main() -> None:
+    """工作进程主循环：每行一个任务，每行一个结果"""
+    # 协议占用原 stdout，文件描述符 1/2 指向 /dev/null，避免任何输出混入协议
+    proto = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    for line in sys.stdin.buffer:
+        job = json.loads(line)
+        start = time.perf_counter()
+        try:
+            outcome = _run_forked(job) if _CAN_FORK else _run_inline(job)
+        except Exception as e:
+            outcome = _failure(f"执行器异常: {type(e).__name__}: {e}")
+        outcome["executionTime"] = int((time.perf_counter() - start) * 1000)
+        proto.write(json.dumps(outcome, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        proto.flush()
+        if not _CAN_FORK:
+            break
+
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    _worker_main()
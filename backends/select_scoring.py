@@ -0,0 +1,154 @@
+"""
+选择题评分 - 选项配置预编译为位掩码，单选/多选评分只做集合位运算
+
+选项配置按内容（选项 label/value/isCorrect 及选择数量限制）缓存编译结果，同一题目的大量
+作答只编译一次；选项顺序打乱使用确定性种子（默认 sessionId:stepId），同一会话多次请求顺序一致。
+
+未标注任何 isCorrect 的配置视为不评分（问卷类），保持原有行为：选择即有效、得分 100。
+
+环境变量：
+  SELECT_CACHE_SIZE  - 编译结果缓存条数，默认 1024
+"""
+
+import functools
+import os
+import random
+from typing import Any, Iterable, Optional
+
+SELECT_CACHE_SIZE = int(os.getenv("SELECT_CACHE_SIZE", "1024"))
+
+# 选项键：(label, value, isCorrect)
+OptionKey = tuple[str, str, Optional[bool]]
+
+
+class CompiledOptions:
+    """编译后的选项配置"""
+
+    __slots__ = ("labels", "values", "index", "correct_mask", "graded", "min_select", "max_select")
+
+    def __init__(self, options: tuple[OptionKey, ...], min_select: Optional[int], max_select: Optional[int]):
+        self.labels = tuple(o[0] for o in options)
+        self.values = tuple(o[1] for o in options)
+        # 重复 value 以第一个为准
+        self.index: dict[str, int] = {}
+        for i, value in enumerate(self.values):
+            self.index.setdefault(value, i)
+        self.correct_mask = sum(1 << i for i, o in enumerate(options) if o[2])
+        self.graded = any(o[2] is not None for o in options)
+        self.min_select = min_select
+        self.max_select = max_select
+
+    def mask_of(self, values: Iterable[str]) -> tuple[int, int]:
+        """选择值 -> (位掩码, 不在选项中的值个数)；重复选择只计一次"""
+        mask, unknown = 0, 0
+        for value in dict.fromkeys(values):
+            i = self.index.get(value)
+            if i is None:
+                unknown += 1
+            else:
+                mask |= 1 << i
+        return mask, unknown
+
+    def label_of(self, value: str) -> str:
+        i = self.index.get(value)
+        return self.labels[i] if i is not None else ""
+
+
+@functools.lru_cache(maxsize=SELECT_CACHE_SIZE)
+def _compile(options: tuple[OptionKey, ...], min_select: Optional[int], max_select: Optional[int]) -> CompiledOptions:
+    return CompiledOptions(options, min_select, max_select)
+
+
+def compile_options(
+    options: Iterable[OptionKey],
+    min_select: Optional[int] = None,
+    max_select: Optional[int] = None,
+) -> CompiledOptions:
+    """编译选项配置（按内容缓存）"""
+    return _compile(tuple(options), min_select, max_select)
+
+
+@functools.lru_cache(maxsize=SELECT_CACHE_SIZE)
+def _shuffled(count: int, seed: str) -> tuple[int, ...]:
+    order = list(range(count))
+    random.Random(seed).shuffle(order)
+    return tuple(order)
+
+
+def display_options(compiled: CompiledOptions, seed: Optional[str]) -> list[dict[str, str]]:
+    """
+    返回展示给作答者的选项（不含 isCorrect）；seed 不为 None 时按种子确定性打乱。
+    """
+    order = _shuffled(len(compiled.values), seed) if seed is not None else range(len(compiled.values))
+    return [{"label": compiled.labels[i], "value": compiled.values[i]} for i in order]
+
+
+def grade_single(compiled: CompiledOptions, selected: str) -> dict[str, Any]:
+    """单选评分：isCorrect 为 None 表示该题不评分"""
+    known = selected in compiled.index
+    is_correct = None
+    if compiled.graded:
+        is_correct = known and bool(compiled.correct_mask >> compiled.index[selected] & 1)
+    return {
+        "selectedValue": selected,
+        "selectedLabel": compiled.label_of(selected),
+        "isCorrect": is_correct,
+        "isValid": known,
+    }
+
+
+def grade_multi(compiled: CompiledOptions, selected: list[str]) -> dict[str, Any]:
+    """
+    多选评分。
+
+    得分 = max(0, 选对数 - 选错数) / 正确选项数 * 100；不在选项中的值按选错计。
+    选择数量超出 minSelect/maxSelect 时 isValid 为 False 并给出 constraintError。
+    """
+    mask, unknown = compiled.mask_of(selected)
+    selected_count = mask.bit_count() + unknown
+    labels = [compiled.label_of(v) for v in selected]
+
+    constraint_error = None
+    if compiled.min_select is not None and selected_count < compiled.min_select:
+        constraint_error = f"至少选择 {compiled.min_select} 项"
+    elif compiled.max_select is not None and selected_count > compiled.max_select:
+        constraint_error = f"最多选择 {compiled.max_select} 项"
+
+    if not compiled.graded:
+        return {
+            "selectedValues": selected,
+            "selectedLabels": labels,
+            "score": 100,
+            "isFullyCorrect": None,
+            "isValid": constraint_error is None and unknown == 0,
+            "constraintError": constraint_error,
+            "scoreDetails": {"correctCount": selected_count, "incorrectCount": 0, "missedCount": 0},
+        }
+
+    correct = (mask & compiled.correct_mask).bit_count()
+    incorrect = (mask & ~compiled.correct_mask).bit_count() + unknown
+    missed = (compiled.correct_mask & ~mask).bit_count()
+    total_correct = compiled.correct_mask.bit_count()
+    if total_correct:
+        score = round(max(0, correct - incorrect) / total_correct * 100)
+    else:
+        score = 100 if selected_count == 0 else 0
+
+    return {
+        "selectedValues": selected,
+        "selectedLabels": labels,
+        "score": score,
+        "isFullyCorrect": incorrect == 0 and missed == 0,
+        "isValid": constraint_error is None and unknown == 0,
+        "constraintError": constraint_error,
+        "scoreDetails": {"correctCount": correct, "incorrectCount": incorrect, "missedCount": missed},
+    }
+
+
+def summarize(results: list[dict[str, Any]], key: str) -> dict[str, Any]:
+    """批量评分汇总：key 为 isCorrect（单选）或 isFullyCorrect（多选）"""
+    graded = [r for r in results if r.get(key) is not None]
+    summary = {"count": len(results), "correctCount": sum(1 for r in graded if r[key])}
+    if results and "score" in results[0]:
+        summary["averageScore"] = round(sum(r["score"] for r in results) / len(results), 2)
+    return summary
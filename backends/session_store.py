@@ -0,0 +1,414 @@
+"""
+会话存储 - 按 sessionId 保存审核流程各步骤结果与解析出的文档，后续步骤按 ID 引用
+
+读写都在内存中完成；变更标记为脏数据，由后台线程定期批量写入 SQLite（write-behind），
+进程重启或内存淘汰后按需从 SQLite 读回。会话超过 TTL 未更新即过期，内存与数据库中一并清除。
+多个 worker 进程可能各自持有同一会话的副本：写入时在事务内与数据库中的记录按步骤合并
+（同一步骤取较晚完成的结果），读取会话时同样合并数据库中其他进程写入的步骤。
+文档全文按 sha256 摘要存放（与 document_store 的文本引用一致），只持久化被会话引用的文档。
+
+环境变量：
+  SESSION_DB_PATH         - SQLite 文件路径，默认 backends/data/sessions.db；置空则只保存在内存
+  SESSION_TTL_SECONDS     - 会话过期时间（秒），默认 14400（4 小时）
+  SESSION_MAX_COUNT       - 内存中保留的会话数上限，超出淘汰最久未访问且已落盘的会话，默认 10000
+  SESSION_FLUSH_INTERVAL  - 后台写入间隔（秒），默认 1
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import document_store
+from responses import dumps
+from structured_log import get_logger
+
+SESSION_DB_PATH = os.getenv(
+    "SESSION_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sessions.db")
+)
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "14400"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "1"))
+
+log = get_logger(__name__)
+
+_sessions: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+_dirty: set[str] = set()
+_dirty_docs: set[str] = set()
+_lock = threading.RLock()
+
+_conn: Optional[sqlite3.Connection] = None
+_db_lock = threading.Lock()
+_wake = threading.Event()
+_writer: Optional[threading.Thread] = None
+_last_sweep = 0.0
+
+
+# ==================== 会话与步骤结果 ====================
+
+def _now() -> float:
+    return time.time()
+
+
+def _expired(session: dict[str, Any], now: float) -> bool:
+    return session["updatedAt"] / 1000 + SESSION_TTL_SECONDS < now
+
+
+def _touch(session_id: str, workflow_id: str = "", *, load: bool = True) -> dict[str, Any]:
+    """
+    取得（必要时创建）会话并标记为脏，调用方需持有 _lock。
+    load=False 时内存中没有的会话直接新建、不读数据库：写入时会与数据库中的记录合并。
+    """
+    session = _get_locked(session_id) if load else _get_memory_locked(session_id)
+    now_ms = int(_now() * 1000)
+    if session is None:
+        session = {
+            "sessionId": session_id,
+            "workflowId": workflow_id,
+            "createdAt": now_ms,
+            "updatedAt": now_ms,
+            "steps": {},
+            "documents": {},
+        }
+        _sessions[session_id] = session
+        _evict_locked()
+    session["updatedAt"] = now_ms
+    if workflow_id and not session["workflowId"]:
+        session["workflowId"] = workflow_id
+    _dirty.add(session_id)
+    _ensure_writer()
+    return session
+
+
+def _get_memory_locked(session_id: str) -> Optional[dict[str, Any]]:
+    session = _sessions.get(session_id)
+    if session is None:
+        return None
+    if _expired(session, _now()):
+        _drop_locked(session_id)
+        return None
+    _sessions.move_to_end(session_id)
+    return session
+
+
+def _get_locked(session_id: str) -> Optional[dict[str, Any]]:
+    session = _sessions.get(session_id)
+    if session is None:
+        session = _load_session(session_id)
+        if session is None:
+            return None
+        _sessions[session_id] = session
+        _evict_locked()
+    if _expired(session, _now()):
+        _drop_locked(session_id)
+        return None
+    _sessions.move_to_end(session_id)
+    return session
+
+
+def _drop_locked(session_id: str) -> None:
+    _sessions.pop(session_id, None)
+    _dirty.add(session_id)  # 写入线程发现会话已不在内存中即删除数据库记录
+
+
+def _evict_locked() -> None:
+    """超出数量上限时淘汰最久未访问且已落盘的会话"""
+    if len(_sessions) <= SESSION_MAX_COUNT or not SESSION_DB_PATH:
+        return
+    for session_id in list(_sessions):
+        if len(_sessions) <= SESSION_MAX_COUNT:
+            break
+        if session_id not in _dirty:
+            del _sessions[session_id]
+
+
+def record_step(
+    session_id: str,
+    workflow_id: str,
+    step_id: str,
+    step_type: str,
+    data: Any,
+    *,
+    success: bool,
+    message: str = "",
+) -> None:
+    """保存步骤结果；同一步骤重复提交时覆盖"""
+    if not session_id or not step_id:
+        return
+    # 保存副本：调用方在记录之后仍可能修改 data
+    data = json.loads(dumps(data))
+    with _lock:
+        _set_step_locked(_touch(session_id, workflow_id), step_id, step_type, data, success, message)
+
+
+def record_steps(
+    workflow_id: str,
+    step_id: str,
+    step_type: str,
+    results: list[tuple[str, Any, bool]],
+    *,
+    message: str = "",
+) -> None:
+    """
+    批量保存同一步骤在多个会话中的结果 [(sessionId, data, success)]（批量评分）。
+    所有结果一次复制、在同一次加锁中写入；内存中没有的会话不逐个读数据库，写入时再与数据库合并。
+    """
+    results = [r for r in results if r[0]]
+    if not step_id or not results:
+        return
+    copies = json.loads(dumps([data for _, data, _ in results]))
+    with _lock:
+        for (session_id, _, success), data in zip(results, copies):
+            session = _touch(session_id, workflow_id, load=False)
+            _set_step_locked(session, step_id, step_type, data, success, message)
+
+
+def _set_step_locked(
+    session: dict[str, Any], step_id: str, step_type: str, data: Any, success: bool, message: str
+) -> None:
+    session["steps"][step_id] = {
+        "stepId": step_id,
+        "stepType": step_type,
+        "success": success,
+        "message": message,
+        "data": data,
+        "completedAt": session["updatedAt"],
+    }
+
+
+def add_document(session_id: str, workflow_id: str, digest: str, info: dict[str, Any]) -> None:
+    """登记会话中解析出的文档（全文需已存入 document_store），文档随会话持久化"""
+    if not session_id:
+        return
+    with _lock:
+        session = _touch(session_id, workflow_id)
+        session["documents"][digest] = {"digest": digest, **info}
+        _dirty_docs.add(digest)
+
+
+def get_session(session_id: str) -> Optional[dict[str, Any]]:
+    """会话快照（步骤结果与文档列表），不存在或已过期返回 None"""
+    with _lock:
+        session = _get_locked(session_id)
+        if session is not None:
+            _refresh_locked(session)
+        return json.loads(dumps(session)) if session is not None else None
+
+
+def get_step(session_id: str, step_id: str) -> Optional[dict[str, Any]]:
+    with _lock:
+        session = _get_locked(session_id)
+        if session is None:
+            return None
+        if step_id not in session["steps"]:
+            _refresh_locked(session)  # 可能由其他 worker 处理
+        step = session["steps"].get(step_id)
+        return json.loads(dumps(step)) if step is not None else None
+
+
+def _merge(session: dict[str, Any], stored: dict[str, Any]) -> bool:
+    """把数据库中的会话记录合并进 session（同一步骤取较晚完成的结果），返回 session 是否有变化"""
+    changed = False
+    for step_id, step in stored.get("steps", {}).items():
+        current = session["steps"].get(step_id)
+        if current is None or step.get("completedAt", 0) > current.get("completedAt", 0):
+            session["steps"][step_id] = step
+            changed = True
+    for digest, info in stored.get("documents", {}).items():
+        if digest not in session["documents"]:
+            session["documents"][digest] = info
+            changed = True
+    if stored.get("updatedAt", 0) > session["updatedAt"]:
+        session["updatedAt"] = stored["updatedAt"]
+        changed = True
+    session["createdAt"] = min(session["createdAt"], stored.get("createdAt", session["createdAt"]))
+    if not session["workflowId"]:
+        session["workflowId"] = stored.get("workflowId", "")
+    return changed
+
+
+def _refresh_locked(session: dict[str, Any]) -> None:
+    """合并其他进程写入数据库的步骤，调用方需持有 _lock"""
+    stored = _load_session(session["sessionId"])
+    if stored is not None:
+        _merge(session, stored)
+
+
+def delete_session(session_id: str) -> bool:
+    with _lock:
+        existed = _get_locked(session_id) is not None
+        _drop_locked(session_id)
+    _wake.set()
+    return existed
+
+
+# ==================== 文档全文 ====================
+
+def get_document_text(digest: str) -> Optional[str]:
+    """按摘要取文档全文：先查 document_store，再查 SQLite（读回后放回 document_store）"""
+    data = document_store.get_bytes(digest)
+    if data is not None:
+        return data.decode("utf-8")
+    conn = _db()
+    if conn is None:
+        return None
+    with _db_lock:
+        row = conn.execute("SELECT text FROM documents WHERE digest = ?", (digest,)).fetchone()
+    if row is None:
+        return None
+    text = row[0].decode("utf-8")
+    document_store.put_text(text)
+    return text
+
+
+# ==================== SQLite write-behind ====================
+
+def _db() -> Optional[sqlite3.Connection]:
+    global _conn
+    if not SESSION_DB_PATH:
+        return None
+    if _conn is None:
+        with _db_lock:
+            if _conn is None:
+                if SESSION_DB_PATH != ":memory:":
+                    os.makedirs(os.path.dirname(SESSION_DB_PATH) or ".", exist_ok=True)
+                conn = sqlite3.connect(SESSION_DB_PATH, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "id TEXT PRIMARY KEY, workflow_id TEXT, data BLOB, expires_at REAL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS documents ("
+                    "digest TEXT PRIMARY KEY, text BLOB, expires_at REAL)"
+                )
+                conn.commit()
+                _conn = conn
+    return _conn
+
+
+def _load_session(session_id: str) -> Optional[dict[str, Any]]:
+    conn = _db()
+    if conn is None:
+        return None
+    with _db_lock:
+        row = conn.execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (session_id, _now())
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def flush() -> None:
+    """把脏数据写入 SQLite 并清理过期记录（写入线程定期调用，关闭时同步调用）"""
+    now = _now()
+    with _lock:
+        dirty = list(_dirty)
+        _dirty.clear()
+        doc_digests = list(_dirty_docs)
+        _dirty_docs.clear()
+        upserts, deletes = [], []
+        for session_id in dirty:
+            session = _sessions.get(session_id)
+            if session is None:
+                deletes.append((session_id,))
+            else:
+                upserts.append(json.loads(dumps(session)))
+        for session_id in [sid for sid, s in _sessions.items() if _expired(s, now)]:
+            del _sessions[session_id]
+    # 数据库尚未打开且无待写入内容时不创建数据库文件
+    sweep = now - _last_sweep >= 60 and _conn is not None
+    if not (upserts or deletes or doc_digests or sweep):
+        return
+    try:
+        conn = _db()
+        if conn is None:
+            return
+        refreshed = _write(conn, now, upserts, deletes, doc_digests, sweep)
+    except BaseException:
+        # 写入失败时恢复脏标记，下次重试；仍为脏的会话不会被数量上限淘汰
+        with _lock:
+            _dirty.update(dirty)
+            _dirty_docs.update(doc_digests)
+        raise
+
+    # 合并到的其他进程的步骤放回内存（_db_lock 已释放，避免与 _lock 交叉加锁）
+    with _lock:
+        for stored in refreshed:
+            session = _sessions.get(stored["sessionId"])
+            if session is not None:
+                _merge(session, stored)
+
+
+def _write(
+    conn: sqlite3.Connection,
+    now: float,
+    upserts: list[dict[str, Any]],
+    deletes: list[tuple[str]],
+    doc_digests: list[str],
+    sweep: bool,
+) -> list[dict[str, Any]]:
+    """在一个写事务中写入会话与文档，返回合并了数据库中其他进程步骤的会话"""
+    global _last_sweep
+    docs = []
+    for digest in doc_digests:
+        data = document_store.get_bytes(digest)
+        if data is not None:
+            docs.append((digest, data, now + SESSION_TTL_SECONDS))
+    refreshed = []
+    with _db_lock:
+        # 读取-合并-写入在同一个写事务中完成，其他进程的写入不会被整行覆盖
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for session in upserts:
+                row = conn.execute(
+                    "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (session["sessionId"], now)
+                ).fetchone()
+                if row is not None and _merge(session, json.loads(row[0])):
+                    refreshed.append(session)
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                    (
+                        session["sessionId"],
+                        session["workflowId"],
+                        dumps(session),
+                        session["updatedAt"] / 1000 + SESSION_TTL_SECONDS,
+                    ),
+                )
+            conn.executemany("DELETE FROM sessions WHERE id = ?", deletes)
+            conn.executemany(
+                "INSERT INTO documents VALUES (?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET expires_at = excluded.expires_at",
+                docs,
+            )
+            if sweep:
+                conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+                conn.execute("DELETE FROM documents WHERE expires_at <= ?", (now,))
+                _last_sweep = now
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return refreshed
+
+
+def _writer_loop() -> None:
+    while True:
+        _wake.wait(SESSION_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            log.warning("session_store.flush_failed", error=f"{type(e).__name__}: {e}")
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer is None:
+        _writer = threading.Thread(target=_writer_loop, name="session-store-writer", daemon=True)
+        _writer.start()
+        atexit.register(flush)
@@ -0,0 +1,198 @@
+"""
+共享缓存 - 多个 uvicorn worker 进程共用的本地磁盘缓存（SQLite WAL）
+
+进程内缓存（OCR 结果、解析结果、提示词参考清单、大模型回复等）在多 worker 部署下各自冷启动、
+重复占用内存；本模块提供按命名空间划分的统一 get/set 接口，一个 worker 算出的结果其他 worker
+直接命中。进程内 LRU 仍作为第一级缓存，本模块作为第二级。
+
+值以 JSON 存储；条目可设置过期时间；总大小超过 SHARED_CACHE_MAX_MB 时按最近访问时间淘汰。
+缓存不可用（磁盘错误、数据库被锁超时等）时一律按未命中处理，不影响请求本身。
+
+环境变量：
+  SHARED_CACHE_PATH    - SQLite 文件路径，默认 backends/data/shared_cache.db；置空则禁用
+  SHARED_CACHE_MAX_MB  - 缓存总大小上限（MB），默认 512
+  SHARED_CACHE_TTL     - 默认过期时间（秒），默认 86400；0 表示不过期
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from responses import dumps
+from structured_log import get_logger
+
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "shared_cache.db")
+)
+SHARED_CACHE_MAX_MB = float(os.getenv("SHARED_CACHE_MAX_MB", "512"))
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", "86400"))
+
+log = get_logger(__name__)
+
+# 访问时间的更新粒度（秒）：命中时只有距上次记录超过该值才写回，避免读操作都变成写操作
+_TOUCH_INTERVAL = 60
+# 累计写入超过上限的该比例后检查一次总大小
+_EVICT_CHECK_RATIO = 0.02
+
+_local = threading.local()
+_written = 0
+_written_lock = threading.Lock()
+
+
+def make_key(*parts: Any) -> str:
+    """由任意可 JSON 序列化的部分生成定长缓存键"""
+    return hashlib.sha256(dumps(list(parts))).hexdigest()
+
+
+def _db() -> Optional[sqlite3.Connection]:
+    """当前线程的连接（SQLite 连接不跨线程共享）；路径变化时重新连接"""
+    if not SHARED_CACHE_PATH:
+        return None
+    cached = getattr(_local, "conn", None)
+    if cached is not None and cached[0] == SHARED_CACHE_PATH:
+        return cached[1]
+    if SHARED_CACHE_PATH != ":memory:":
+        os.makedirs(os.path.dirname(SHARED_CACHE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(SHARED_CACHE_PATH, timeout=5.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, "
+        "expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (ns, key))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+    _local.conn = (SHARED_CACHE_PATH, conn)
+    return conn
+
+
+def get(namespace: str, key: str) -> Optional[Any]:
+    """取缓存值；不存在、已过期或缓存不可用时返回 None"""
+    try:
+        conn = _db()
+        if conn is None:
+            return None
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE ns = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        if now - row[2] >= _TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE ns = ? AND key = ?", (now, namespace, key))
+        return json.loads(row[0])
+    except (sqlite3.Error, OSError, ValueError) as e:
+        log.warning("shared_cache.get_failed", namespace=namespace, error=f"{type(e).__name__}: {e}")
+        return None
+
+
+def set(namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+    """
+    写入缓存值（覆盖同键旧值），返回是否写入成功。
+    ttl 为过期秒数，默认 SHARED_CACHE_TTL，0 表示不过期。
+    """
+    global _written
+    try:
+        conn = _db()
+        if conn is None:
+            return False
+        data = dumps(value)
+        now = time.time()
+        ttl = SHARED_CACHE_TTL if ttl is None else ttl
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, data, len(data), now + ttl if ttl > 0 else None, now),
+        )
+    except (sqlite3.Error, OSError, TypeError) as e:
+        log.warning("shared_cache.set_failed", namespace=namespace, error=f"{type(e).__name__}: {e}")
+        return False
+
+    limit = SHARED_CACHE_MAX_MB * 1024 * 1024
+    with _written_lock:
+        _written += len(data)
+        check = _written >= limit * _EVICT_CHECK_RATIO
+        if check:
+            _written = 0
+    if check:
+        evict()
+    return True
+
+
+def get_or_set(namespace: str, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+    """命中则返回缓存值，否则计算并写入（compute 抛出异常时不写入）；None 值不缓存"""
+    value = get(namespace, key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            set(namespace, key, value, ttl)
+    return value
+
+
+def delete(namespace: str, key: str) -> None:
+    try:
+        conn = _db()
+        if conn is not None:
+            conn.execute("DELETE FROM entries WHERE ns = ? AND key = ?", (namespace, key))
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared_cache.delete_failed", namespace=namespace, error=f"{type(e).__name__}: {e}")
+
+
+def clear(namespace: Optional[str] = None) -> bool:
+    """清空指定命名空间（不传则清空全部），返回是否成功"""
+    try:
+        conn = _db()
+        if conn is None:
+            return False
+        if namespace is None:
+            conn.execute("DELETE FROM entries")
+        else:
+            conn.execute("DELETE FROM entries WHERE ns = ?", (namespace,))
+        return True
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared_cache.clear_failed", namespace=namespace, error=f"{type(e).__name__}: {e}")
+        return False
+
+
+def evict() -> int:
+    """删除过期条目；总大小超过上限时按最近访问时间淘汰到上限的 90%，返回删除条数"""
+    try:
+        conn = _db()
+        if conn is None:
+            return 0
+        removed = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        limit = SHARED_CACHE_MAX_MB * 1024 * 1024
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > limit:
+            excess = total - limit * 0.9
+            rows = conn.execute("SELECT ns, key, size FROM entries ORDER BY accessed_at").fetchall()
+            victims = []
+            for ns, key, size in rows:
+                if excess <= 0:
+                    break
+                victims.append((ns, key))
+                excess -= size
+            conn.executemany("DELETE FROM entries WHERE ns = ? AND key = ?", victims)
+            removed += len(victims)
+        if removed:
+            log.info("shared_cache.evicted", removed=removed)
+        return removed
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared_cache.evict_failed", error=f"{type(e).__name__}: {e}")
+        return 0
+
+
+def stats() -> dict[str, Any]:
+    """各命名空间的条目数与字节数；缓存不可用时返回 error 说明"""
+    try:
+        conn = _db()
+        if conn is None:
+            return {"enabled": False}
+        rows = conn.execute("SELECT ns, COUNT(*), SUM(size) FROM entries GROUP BY ns").fetchall()
+    except (sqlite3.Error, OSError) as e:
+        log.warning("shared_cache.stats_failed", error=f"{type(e).__name__}: {e}")
+        return {"enabled": True, "error": f"{type(e).__name__}: {e}"}
+    return {"enabled": True, "namespaces": {ns: {"count": count, "bytes": size} for ns, count, size in rows}}
@@ -0,0 +1,50 @@
+"""
+请求合并（single-flight）- 相同键的并发请求共用一次进行中的计算
+
+前端重试或多人同时打开同一记录时，相同的解析与大模型审核会并发执行多次；经 SingleFlight
+包装后，同一键在计算完成前到达的请求都等待第一次计算的结果（成功或异常），完成后键即释放，
+之后的请求重新计算（结果复用由各层缓存负责）。
+
+计算以独立任务运行：发起者被取消（如客户端断开）不影响其他等待者。
+只在同一事件循环内合并；进程间的重复由 shared_cache 消除。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+
+class SingleFlight:
+    """按键合并进行中的异步计算"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        执行 factory() 或等待进行中的同键计算，返回 (结果, 是否复用了其他请求的计算)。
+        """
+        loop = asyncio.get_running_loop()
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is loop and not future.done():
+            log.info("singleflight.coalesced", name=self.name)
+            return await asyncio.shield(future), True
+
+        future = asyncio.ensure_future(factory())
+        self._calls[key] = future
+
+        def done(f: asyncio.Future) -> None:
+            if self._calls.get(key) is f:
+                del self._calls[key]
+            if not f.cancelled():
+                f.exception()  # 所有等待者都已离开时避免 "exception was never retrieved" 警告
+
+        future.add_done_callback(done)
+        return await asyncio.shield(future), False
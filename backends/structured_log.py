@@ -0,0 +1,177 @@
+"""
+结构化日志 - 请求路径内只做入队，格式化与写出由后台线程完成
+
+    log = get_logger(__name__)
+    log.info("file_parse.start", stepId=step_id, fileSize=size)
+
+每条日志输出为一行 JSON（LOG_FORMAT=text 时为 key=value），字段值超长自动截断；
+dict/list 字段序列化为紧凑 JSON，text 模式下含空白或 "=" 的值加引号，两种格式均可按行解析；
+DEBUG/INFO 日志可按比例采样，WARNING 及以上始终输出；队列满时丢弃新日志而不阻塞请求。
+
+环境变量：
+  LOG_LEVEL            - 日志级别，默认 INFO
+  LOG_FORMAT           - json | text，默认 json
+  LOG_FIELD_MAX_CHARS  - 单个字段最大字符数，默认 500
+  LOG_SAMPLE_RATE      - DEBUG/INFO 日志采样率（0~1），默认 1
+  LOG_QUEUE_SIZE       - 日志队列长度上限，默认 10000
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_FIELD_MAX_CHARS = int(os.getenv("LOG_FIELD_MAX_CHARS", "500"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_ROOT_NAME = "backends"
+_setup_lock = threading.Lock()
+_listener: logging.handlers.QueueListener | None = None
+dropped_count = 0
+
+
+class StructuredLogger:
+    """按事件名 + 关键字字段记录日志；级别未开启时不做任何字段处理"""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields: Any) -> None:
+        """记录 ERROR 级别日志并附带当前异常堆栈"""
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def _log(self, level: int, event: str, fields: dict[str, Any], exc_info: bool = False) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and LOG_SAMPLE_RATE < 1 and random.random() >= LOG_SAMPLE_RATE:
+            return
+        self._logger.log(
+            level,
+            event,
+            exc_info=exc_info,
+            extra={"fields": {k: truncate(v) for k, v in fields.items()}},
+        )
+
+
+def truncate(value: Any, limit: int | None = None) -> Any:
+    """
+    字段值截断：基本类型原样保留，dict/list 转为 JSON 文本，字符串及其他对象转为文本，
+    文本不超过 limit 个字符
+    """
+    limit = LOG_FIELD_MAX_CHARS if limit is None else limit
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        text = value
+    elif isinstance(value, (dict, list, tuple)):
+        try:
+            text = json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+        except ValueError:  # 循环引用
+            text = str(value)
+    else:
+        text = str(value)
+    if len(text) > limit:
+        return f"{text[:limit]}…(+{len(text) - limit} chars)"
+    return text
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """获取模块日志器，首次调用时启动后台写出线程"""
+    _ensure_setup()
+    short = name.rsplit(".", 1)[-1]
+    return StructuredLogger(logging.getLogger(f"{_ROOT_NAME}.{short}"))
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """入队不阻塞、不在调用线程格式化；队列满时丢弃并计数"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 异常堆栈需在调用线程内固化，其余格式化交给后台线程
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global dropped_count
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_count += 1
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        ts = time.strftime("%H:%M:%S", time.localtime(record.created))
+        parts = [f"{ts} {record.levelname:<7} [{record.name}] {record.getMessage()}"]
+        parts.extend(f"{k}={_text_value(v)}" for k, v in getattr(record, "fields", {}).items())
+        line = " ".join(parts)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _text_value(value: Any) -> Any:
+    """text 模式的字段值：含空白、引号或 "=" 的文本以 JSON 字符串形式加引号，保证按空格可切分"""
+    if isinstance(value, str) and (not value or any(c.isspace() or c in '"=' for c in value)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _ensure_setup() -> None:
+    global _listener
+    if _listener is not None:
+        return
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(_TextFormatter() if LOG_FORMAT == "text" else _JsonFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root = logging.getLogger(_ROOT_NAME)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_NonBlockingQueueHandler(log_queue))
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
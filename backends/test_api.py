@@ -0,0 +1,424 @@
+"""
+测试审核步骤 API
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import responses
+import script_runner
+
+
+@pytest.fixture
+def client():
+    return TestClient(api.app)
+
+
+class TestFileParseResponseMode:
+    """测试 file-parse 响应模式与文本引用"""
+
+    def test_default_full_mode(self, client):
+        resp = client.post("/api/steps/file-parse", data={"stepId": "s1", "textContent": "检验记录"})
+        assert resp.json()["data"]["data"]["textContent"] == "检验记录"
+
+    def test_reference_mode_and_range(self, client):
+        text = "返修检验记录" * 100
+        resp = client.post(
+            "/api/steps/file-parse",
+            data={"stepId": "s1", "textContent": text, "responseMode": "reference"},
+        )
+        data = resp.json()["data"]["data"]
+        assert "textContent" not in data
+        assert data["textRef"]["length"] == len(text)
+
+        url = data["textRef"]["url"]
+        assert client.get(url).text == text
+        part = client.get(url, headers={"Range": "bytes=0-5"})
+        assert part.status_code == 206
+        assert part.headers["content-range"] == f"bytes 0-5/{len(text.encode())}"
+        assert part.content.decode() == "返修"
+        assert client.get(url, headers={"Range": "bytes=999999-"}).status_code == 416
+
+    def test_summary_mode_preview(self, client, monkeypatch):
+        monkeypatch.setattr(api, "SUMMARY_PREVIEW_CHARS", 4)
+        resp = client.post(
+            "/api/steps/file-parse",
+            data={"stepId": "s1", "textContent": "返修检验记录", "responseMode": "summary"},
+        )
+        data = resp.json()["data"]["data"]
+        assert data["textContent"] == "返修检验"
+        assert data["textTruncated"] is True
+
+    def test_upload_and_text_hashed_once(self, client, monkeypatch):
+        """上传文件与解析出的全文各只计算一次 sha256（合并键/解析缓存键、会话文档/文本引用共用）"""
+        upload = "编号,结论\nFX-7,合格\n".encode()
+        text = "编号 | 结论\nFX-7 | 合格"
+        hashed = []
+        real_sha256 = hashlib.sha256
+
+        def spy(data=b"", *args, **kwargs):
+            hashed.append(bytes(data))
+            return real_sha256(data, *args, **kwargs)
+
+        monkeypatch.setattr(hashlib, "sha256", spy)
+        resp = client.post(
+            "/api/steps/file-parse",
+            data={"stepId": "s1", "workflowId": "w1", "sessionId": "sess-h", "responseMode": "reference"},
+            files={"file": ("data.csv", upload)},
+        )
+        data = resp.json()["data"]["data"]
+        assert data["textRef"]["digest"] == data["metadata"]["documentRef"]
+        assert hashed.count(upload) == 1 and hashed.count(text.encode()) == 1
+
+    def test_unknown_document(self, client):
+        assert client.get("/api/documents/unknown/text").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-9", (0, 9)),
+        ("bytes=5-", (5, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=90-200", (90, 99)),
+        ("bytes=100-", None),
+        ("bytes=-0", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert api._parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=-10", "bytes=0-", "bytes=0-0"])
+def test_parse_range_empty_document(header):
+    assert api._parse_range(header, 0) is None
+
+
+class TestMetrics:
+    """测试分阶段耗时与指标导出"""
+
+    def test_timings_in_metadata_and_metrics_endpoint(self, client, monkeypatch):
+        monkeypatch.setattr("llm_client.call_llm", lambda messages, **kw: '{"passed": true}')
+        resp = client.post(
+            "/api/steps/file-parse",
+            data={"stepId": "s1", "parseRules": "检查签字", "priority": "batch"},
+            files={"file": ("record.txt", "审核：张三".encode())},
+        )
+        metadata = resp.json()["data"]["data"]["metadata"]
+        timings = metadata["timings"]
+        for stage in ("upload_read", "parse", "prompt_build", "llm_queue_wait", "json_extract", "total"):
+            assert stage in timings
+        assert metadata["llmQueue"]["priority"] == "batch" and metadata["llmQueue"]["position"] == 0
+
+        text = client.get("/metrics").text
+        assert 'audit_stage_duration_seconds_count{stage="parse",format="txt"}' in text
+        assert 'http_request_duration_seconds_count{method="POST",path="/api/steps/file-parse",status="200"}' in text
+        assert 'llm_queue_wait_seconds_count{priority="batch"}' in text
+
+
+class TestCoalescing:
+    """测试相同的并发审核请求合并执行"""
+
+    def test_identical_requests_share_parse_and_llm_call(self, monkeypatch):
+        import httpx
+        import file_parser
+
+        calls = {"parse": 0, "llm": 0}
+        original_txt = file_parser._PARSERS["txt"]
+
+        def slow_parse(*args):
+            calls["parse"] += 1
+            time.sleep(0.1)
+            original_txt(*args)
+
+        def slow_llm(messages, **kw):
+            calls["llm"] += 1
+            time.sleep(0.1)
+            return '{"passed": false, "reason": "缺少签字"}'
+
+        monkeypatch.setitem(file_parser._PARSERS, "txt", slow_parse)
+        monkeypatch.setattr("llm_client.call_llm", slow_llm)
+
+        async def main():
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                return await asyncio.gather(*[
+                    ac.post("/api/steps/file-parse",
+                            data={"stepId": f"s{i}", "sessionId": f"u{i}", "parseRules": "检查签字"},
+                            files={"file": ("record.txt", "检验员：".encode())})
+                    for i in range(3)
+                ])
+
+        responses_ = asyncio.run(main())
+        assert calls == {"parse": 1, "llm": 1}
+        bodies = [r.json() for r in responses_]
+        assert all(b["data"]["data"]["auditResult"]["reason"] == "缺少签字" for b in bodies)
+        assert sum("coalesced" in b["data"]["data"]["metadata"] for b in bodies) == 2
+
+
+class TestRulePrecheck:
+    """测试 parseRules 本地规则预检"""
+
+    def _audit(self, client, rules, text):
+        return client.post("/api/steps/file-parse", data={"stepId": "s1", "parseRules": rules, "textContent": text}).json()
+
+    def test_hard_failure_skips_llm(self, client, monkeypatch):
+        monkeypatch.setattr("llm_client.call_llm", lambda *a, **kw: pytest.fail("不应调用大模型"))
+        body = self._audit(client, "@signed 审核 批准\n1. 返修过程是否符合工艺", "审核：张三 批准：")
+        result = body["data"]["data"]["auditResult"]
+        assert body["success"] is False and result["reason"] == "未签署：批准"
+
+        body = self._audit(client, "@signed 审核", "审核：张三")
+        assert body["success"] is True and body["data"]["data"]["auditResult"]["ruleFindings"][0]["passed"]
+
+    def test_findings_passed_to_llm(self, client, monkeypatch):
+        prompts = []
+
+        def fake_llm(messages, **kw):
+            prompts.append(messages[1]["content"])
+            return '{"passed": true}'
+
+        monkeypatch.setattr("llm_client.call_llm", fake_llm)
+        body = self._audit(client, "@soft signed 批准\n1. 返修过程是否符合工艺", "审核：张三 批准：无")
+        assert body["success"] is True
+        assert "[不通过] soft signed 批准：未签署：批准" in prompts[0]
+        assert "@soft" not in prompts[0]
+
+    def test_uncertain_findings_passed_to_llm(self, client, monkeypatch):
+        prompts = []
+
+        def fake_llm(messages, **kw):
+            prompts.append(messages[1]["content"])
+            return '{"passed": true}'
+
+        monkeypatch.setattr("llm_client.call_llm", fake_llm)
+        body = self._audit(client, "@signed 审核", "审核：        张三")
+        assert body["success"] is True
+        assert "[待确认] signed 审核：无法确定是否签署：审核" in prompts[0]
+        assert body["data"]["data"]["auditResult"]["ruleFindings"][0]["uncertain"] is True
+
+
+class TestSplitAudit:
+    """测试解析规则逐条并发审核"""
+
+    RULES = "检查要求：\n1. 返修原因明确\n2. 审批完整"
+
+    def test_per_rule_details(self, client, monkeypatch):
+        prompts = []
+
+        def fake_llm(messages, **kw):
+            prompts.append(messages[1]["content"])
+            if "2. 审批完整" in messages[1]["content"]:
+                return '{"passed": false, "reason": "缺少批准签字"}'
+            return '{"passed": true}'
+
+        monkeypatch.setattr("llm_client.call_llm", fake_llm)
+        body = client.post(
+            "/api/steps/file-parse",
+            data={"stepId": "s1", "parseRules": self.RULES, "textContent": "返修记录", "splitRules": "true"},
+        ).json()
+        result = body["data"]["data"]["auditResult"]
+        assert body["success"] is False
+        assert result["details"] == [
+            {"rule": "1. 返修原因明确", "passed": True, "reason": ""},
+            {"rule": "2. 审批完整", "passed": False, "reason": "缺少批准签字"},
+        ]
+        assert result["reason"] == "2. 审批完整：缺少批准签字"
+        assert body["data"]["data"]["metadata"]["llmQueue"]["subAudits"] == 2
+        # 各条提示词只有末尾的规则不同，且都带有共同前言
+        prefix = prompts[0].split("## 本次只检查以下一条解析规则")[0]
+        assert all(p.startswith(prefix) and "检查要求：" in p for p in prompts) and len(prompts) == 2
+
+    def test_error_without_failure_degrades(self, client, monkeypatch):
+        def fake_llm(messages, **kw):
+            if "2. 审批完整" in messages[1]["content"]:
+                raise RuntimeError("timeout")
+            return '{"passed": true}'
+
+        monkeypatch.setattr("llm_client.call_llm", fake_llm)
+        body = client.post(
+            "/api/steps/file-parse",
+            data={"stepId": "s1", "parseRules": self.RULES, "textContent": "返修记录", "splitRules": "true"},
+        ).json()
+        assert "auditResult" not in body["data"]["data"]
+
+
+class TestStepResponse:
+    """测试统一结果封装与序列化"""
+
+    def test_envelope_shape(self):
+        resp = responses.step_response({"a": 1}, message="审核未通过", duration_ms=5, success=False)
+        body = json.loads(resp.body)
+        assert body["code"] == 400
+        assert body["data"] == {"success": False, "message": "审核未通过", "data": {"a": 1}, "duration": 5}
+
+    def test_stdlib_fallback_matches_orjson(self, monkeypatch):
+        content = {"文本": "返修", "n": 1, "items": [True, None]}
+        fast = responses.dumps(content)
+        monkeypatch.setattr(responses, "orjson", None)
+        assert json.loads(responses.dumps(content)) == json.loads(fast)
+        assert "返修".encode() in responses.dumps(content)
+
+    def test_step_endpoint_uses_envelope(self, client):
+        resp = client.post(
+            "/api/steps/sub-workflow",
+            json={"stepId": "s", "workflowId": "w", "sessionId": "x", "subWorkflowId": "sub"},
+        )
+        body = resp.json()
+        assert body["success"] is True
+        assert body["data"]["data"]["status"] == "completed"
+
+
+class TestStartup:
+    """测试启动预热与健康检查"""
+
+    def test_ready_after_warmup(self, monkeypatch, tmp_path):
+        knowledge = tmp_path / "knowledge.json"
+        knowledge.write_text(json.dumps({"file": "GJB9001C", "process_domains": []}), encoding="utf-8")
+        monkeypatch.setattr(api, "KNOWLEDGE_PATH", str(knowledge))
+        monkeypatch.setattr("llm_client.warm_up", lambda: True)
+
+        with TestClient(api.app) as client:
+            assert client.get("/health/live").status_code == 200
+            for _ in range(100):
+                resp = client.get("/health/ready")
+                if resp.status_code == 200:
+                    break
+                time.sleep(0.05)
+            assert resp.status_code == 200
+            steps = resp.json()["steps"]
+            assert steps["knowledge"]["ok"] and steps["parsers"]["ok"]
+
+    def test_knowledge_snapshot_reloads_after_write(self, client, monkeypatch, tmp_path):
+        knowledge = tmp_path / "knowledge.json"
+        knowledge.write_text(json.dumps({"process_domains": []}), encoding="utf-8")
+        monkeypatch.setattr(api, "KNOWLEDGE_PATH", str(knowledge))
+        assert client.get("/knowledge/get").json()["knowledge"] == {"process_domains": []}
+
+        new = {"process_domains": [{"name": "不合格品控制"}]}
+        query = {"query": json.dumps(new, ensure_ascii=False), "background": "", "structure": "", "replace": ""}
+        client.post("/knowledge/generate", json=query)
+        assert client.get("/knowledge/get").json()["knowledge"] == new
+
+    def test_parser_libraries_not_imported_eagerly(self):
+        code = "import sys, api; print(any(m in sys.modules for m in ('pdfplumber', 'openpyxl', 'PyPDF2')))"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__))
+        assert out.stdout.strip() == "False"
+
+
+class TestDocumentGenerate:
+    """测试按章节并发生成程序文件"""
+
+    @pytest.fixture
+    def knowledge(self, monkeypatch, tmp_path):
+        main = tmp_path / "main.md"
+        main.write_text("## 8.7 不合格输出的控制\n应识别和控制不合格输出。\n", encoding="utf-8")
+        data = {"file": "GJB9001C", "file_path": str(main),
+                "process_domains": [{"name": "不合格品控制", "charpter": "8.7", "related_domains": []}]}
+        path = tmp_path / "knowledge.json"
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        monkeypatch.setattr(api, "KNOWLEDGE_PATH", str(path))
+
+    def test_streams_sections_as_they_finish(self, client, knowledge, monkeypatch):
+        prompts, apps = [], set()
+
+        def fake_llm(messages, **kw):
+            prompts.append(messages[0]["content"])
+            apps.add(kw.get("app_id"))
+            title = messages[1]["content"].split("【")[1].split("】")[0]
+            time.sleep(0.2 if title == "目的" else 0)
+            return f"## {title}"
+
+        monkeypatch.setattr("llm_client.call_llm", fake_llm)
+        monkeypatch.setattr("llm_client.GENERATION_APP_ID", "gen-app")
+        body = {"query": "不合格品控制", "structure": "** 目的\n** 范围\n*** 适用产品\n** 职责"}
+        with client.stream("POST", "/document/generate", json=body) as resp:
+            assert resp.headers["content-type"].startswith("application/x-ndjson")
+            events = [json.loads(line) for line in resp.iter_lines() if line]
+
+        assert events[0] == {"type": "start", "processGroup": "不合格品控制", "sections": ["目的", "范围", "职责"]}
+        sections = [e for e in events if e["type"] == "section"]
+        assert sections[-1]["title"] == "目的"  # 最慢的章节最后推送
+        assert events[-1]["document"] == "## 目的\n\n## 范围\n\n## 职责"
+        assert len(set(prompts)) == 1 and "应识别和控制不合格输出" in prompts[0]
+        assert apps == {"gen-app"}  # 生成应用，而不是审核应用
+
+    def test_missing_generation_app_rejected_once(self, client, knowledge, monkeypatch):
+        monkeypatch.setattr("llm_client.call_llm", lambda *a, **kw: pytest.fail("不应调用大模型"))
+        monkeypatch.setattr("llm_client.GENERATION_APP_ID", "")
+        resp = client.post("/document/generate", json={"query": "不合格品控制", "structure": "** 目的\n** 范围"})
+        assert resp.status_code == 503 and "LLM_GENERATION_APP_ID" in resp.json()["message"]
+
+    def test_failed_section_and_unknown_group(self, client, knowledge, monkeypatch):
+        def fake_llm(messages, **kw):
+            if "【范围】" in messages[1]["content"]:
+                raise ValueError("LLM 返回内容为空")
+            return "ok"
+
+        monkeypatch.setattr("llm_client.call_llm", fake_llm)
+        resp = client.post("/document/generate", json={"query": "不合格品控制", "structure": "1. 目的\n2. 范围"})
+        events = [json.loads(line) for line in resp.text.splitlines()]
+        assert {"type": "section_error", "index": 1, "title": "范围", "error": "LLM 返回内容为空"} in events
+        assert events[-1]["failed"] == [1] and events[-1]["document"] == "ok"
+
+        assert client.post("/document/generate", json={"query": "设计开发"}).status_code == 404
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="沙箱依赖 fork/rlimit")
+class TestScriptCheck:
+    """测试脚本检查沙箱执行"""
+
+    def _check(self, client, language, content, **params):
+        resp = client.post("/api/steps/script-check", json={
+            "stepId": "s1", "workflowId": "w1", "sessionId": "x",
+            "script": {"language": language, "content": content},
+            "executionParams": params,
+        })
+        return resp.json()
+
+    def test_python_result_and_stdout(self, client):
+        body = self._check(client, "python", "print(len(inputData))\nresult = {'passed': inputData[0]['qty'] > 0}", inputData=[{"qty": 3}])
+        assert body["success"] is True
+        assert body["data"]["data"]["stdout"] == "1\n"
+
+    def test_python_timeout_and_network_blocked(self, client):
+        body = self._check(client, "python", "while True: pass", timeout=300)
+        assert body["success"] is False and body["data"]["data"]["timedOut"] is True
+
+        body = self._check(client, "python", "import socket\nsocket.socket()")
+        assert body["success"] is False
+        assert "PermissionError" in body["data"]["data"]["error"]
+
+    def test_server_env_and_files_hidden(self, client, monkeypatch):
+        monkeypatch.setenv("LLM_AUTH_TOKEN", "secret")
+        body = self._check(client, "python", "import os\nresult = {'passed': True, 'env': dict(os.environ)}", env={"LIMIT": "5"})
+        assert set(body["data"]["data"]["result"]["env"]) == {"PATH", "LANG", "HOME", "LIMIT"}
+
+        body = self._check(client, "python", f"open({os.path.abspath('llm_config.py')!r}).read()")
+        assert body["success"] is False and "PermissionError" in body["data"]["data"]["error"]
+
+    def test_javascript_refused_without_isolation(self):
+        job = {"language": "javascript", "code": "result = true", "inputData": None, "env": {},
+               "timeoutMs": 1000, "memoryMb": 64, "sandbox": {"network": "audit_hook", "filesystem": "audit_hook"}}
+        outcome = script_runner._exec_javascript(job)
+        assert outcome["passed"] is False and "拒绝执行 javascript" in outcome["error"]
+
+    def test_sql_returns_violations(self, client):
+        rows = {"records": [{"id": 1, "qty": 5}, {"id": 2, "qty": -1}]}
+        body = self._check(client, "sql", "SELECT id FROM records WHERE qty < 0;", inputData=rows)
+        data = body["data"]["data"]
+        assert data["passed"] is False
+        assert data["result"]["rows"] == [[2]]
+
+    def test_unknown_language(self, client):
+        assert self._check(client, "ruby", "puts 1")["success"] is False
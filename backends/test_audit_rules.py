@@ -0,0 +1,90 @@
+"""
+测试审核规则预检
+"""
+
+from audit_rules import compile_rules, hard_failures, split_numbered
+from file_parser import parse_file
+from test_file_parser import _make_docx, _para, _table
+
+RECORD = """返修记录
+产品名称：阀门  返修原因：密封失效
+返修工艺编号：FX-0012
+返修日期：2024年3月5日 检验日期：2024-03-08
+审核：张三 批准：/
+检验员：
+"""
+
+
+class TestAuditRules:
+
+    def test_compile_splits_local_and_llm_rules(self):
+        rules = compile_rules("1. 返修内容是否完整\n@required 产品名称\n@unknown 字段\n2. 结论是否明确")
+        assert [c.rule for c in rules.checks] == ["@required 产品名称"]
+        assert rules.remaining == "1. 返修内容是否完整\nunknown 字段\n2. 结论是否明确"
+        assert compile_rules("@required 产品名称") is compile_rules("@required 产品名称")
+
+    def test_field_rules(self):
+        rules = compile_rules(
+            "@required 产品名称, 返修原因\n@signed 审核 批准\n@soft signed 检验员\n"
+            "@pattern 返修工艺编号 FX-\\d{4}\n@date_order 返修日期 < 检验日期"
+        )
+        findings = rules.evaluate(RECORD)
+        assert [f["passed"] for f in findings] == [True, False, False, True, True]
+        assert findings[1]["message"] == "未签署：批准"
+        assert [f["rule"] for f in hard_failures(findings)] == ["@signed 审核 批准"]
+
+    def test_text_rules_and_date_order(self):
+        rules = compile_rules("@contains 返修记录\n@regex FX-\\d+\n@forbid 待补充\n@date_order 检验日期 <= 返修日期")
+        findings = rules.evaluate(RECORD + "备注：待补充")
+        assert [f["passed"] for f in findings] == [True, True, False, False]
+        assert "日期顺序错误" in findings[3]["message"]
+        assert compile_rules("@date_order 返修日期 < 批准").evaluate(RECORD)[0]["message"] == "批准 缺少有效日期"
+
+
+class TestTableFields:
+    """docx 表格解析结果（单元格以 " | " 分隔）中的字段"""
+
+    def _evaluate(self, rules: str, body: str) -> list[dict]:
+        return compile_rules(rules).evaluate(parse_file(_make_docx(body), "record.docx"))
+
+    def test_label_and_value_in_adjacent_cells(self):
+        body = _table([["产品名称", "XX组件"], ["审核", "张三", "批准：", "李四"]])
+        findings = self._evaluate("@required 产品名称\n@signed 审核 批准", body)
+        assert [f["passed"] for f in findings] == [True, True]
+
+    def test_empty_cells_not_signed(self):
+        findings = self._evaluate("@signed 审核 批准", _table([["审核：", "", "批准：", ""]]))
+        assert findings[0]["passed"] is False and not findings[0]["uncertain"]
+        assert findings[0]["message"] == "未签署：审核、批准"
+        assert self._evaluate("@signed 审核", _table([["审核：", "批准：王五"]]))[0]["message"] == "未签署：审核"
+
+    def test_blank_value_before_next_label(self):
+        findings = self._evaluate("@signed 审核 批准", _para("审核：  批准："))
+        assert findings[0]["message"] == "未签署：审核、批准"
+
+    def test_label_with_note(self):
+        body = _table([["军检（如需要）：", "王五"]]) + _para("返修日期(计划)：2024-03-05 检验日期：2024-03-08")
+        findings = self._evaluate("@signed 军检\n@date_order 返修日期 < 检验日期", body)
+        assert [f["passed"] for f in findings] == [True, True]
+
+    def test_unclear_fields_deferred(self):
+        text = "审核：        张三\n说明：经质量部审核后归档\n"
+        findings = compile_rules("@signed 审核\n@pattern 批准 \\S+\n@required 说明, 日期").evaluate(text + "批准")
+        assert [(f["passed"], f["uncertain"]) for f in findings] == [(False, True), (False, True), (False, False)]
+        assert findings[0]["message"] == "无法确定是否签署：审核"
+        assert findings[2]["message"] == "缺少字段：日期"
+        assert [f["rule"] for f in hard_failures(findings)] == ["@required 说明, 日期"]
+
+
+class TestSplitNumbered:
+    def test_split(self):
+        preface, items = split_numbered("检查要求：\n1. 返修原因明确\n  包括失效模式\n\n2、审批完整\n（3）日期")
+        assert preface == "检查要求："
+        assert items == ["1. 返修原因明确\n包括失效模式", "2、审批完整", "（3）日期"]
+
+    def test_dated_continuation_stays_with_rule(self):
+        _, items = split_numbered("1. 返修工艺须经审批\n2024.01 起执行新版工艺\n3.5 版本以前的记录除外\n2. 检验合格")
+        assert items == ["1. 返修工艺须经审批\n2024.01 起执行新版工艺\n3.5 版本以前的记录除外", "2. 检验合格"]
+
+    def test_single_rule_not_split(self):
+        assert split_numbered("1. 仅一条\n补充说明") == ("", [])
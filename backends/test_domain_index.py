@@ -0,0 +1,48 @@
+"""
+测试过程域索引
+"""
+
+from domain_index import DomainIndex, not_found_message
+
+KNOWLEDGE = {
+    "process_domains": [
+        {"name": "不合格品控制", "related_domains": [
+            {"name": "产品管理", "related_domains": [{"name": "不合格品审理"}]},
+            {"file": "GJB 571A"},
+        ]},
+        {"name": "设计和开发控制"},
+        {"name": "设计和开发输出控制"},
+        {"type": "缺少名称的过程组"},
+    ],
+}
+
+
+class TestDomainIndex:
+
+    def test_exact_and_unique_partial_match(self):
+        index = DomainIndex(KNOWLEDGE)
+        assert index.resolve_group("不合格品控制")[0].name == "不合格品控制"
+        assert index.resolve_group(" 不合格品 ")[0].name == "不合格品控制"
+        # 完全一致优先于包含关系
+        assert index.resolve_group("设计和开发控制")[0].name == "设计和开发控制"
+
+    def test_ambiguous_and_missing(self):
+        index = DomainIndex(KNOWLEDGE)
+        group, candidates = index.resolve_group("设计和开发")
+        assert group is None
+        assert [n.name for n in candidates] == ["设计和开发控制", "设计和开发输出控制"]
+        assert "候选：设计和开发控制、设计和开发输出控制" in not_found_message("设计和开发", candidates)
+        assert index.resolve_group("采购") == (None, [])
+
+    def test_fuzzy_match_and_adjacency(self):
+        index = DomainIndex(KNOWLEDGE)
+        group, _ = index.resolve_group("不合格品的控制")
+        assert group.name == "不合格品控制"
+
+        node, score = index.search("审理")[0]
+        assert node.name == "不合格品审理" and node.level == 2
+        assert [n.name for n in index.ancestors(node)] == ["产品管理", "不合格品控制"]
+        assert [n.name for n in index.children(index.parent(node))] == ["不合格品审理"]
+        root = index.nodes[index.groups[0]]
+        assert len(list(index.descendants(root))) == 3
+        assert len(index.groups) == 4
@@ -2,9 +2,14 @@
 测试文件解析中的LLM接口调用
 """
 
+import os
+
 import pytest
 from unittest.mock import patch, MagicMock
 
+import llm_client
+import llm_config
+import metrics
 from llm_client import call_llm, extract_json_from_text
 from audit_prompt import build_file_audit_prompt
 
@@ -99,6 +104,51 @@ class TestCallLlm:
         with pytest.raises(ValueError, match="返回内容为空"):
             call_llm([{"role": "user", "content": "测试"}])
 
+    def test_call_llm_requires_app_id(self):
+        with pytest.raises(ValueError, match="未配置 FastGPT appId"):
+            call_llm([{"role": "user", "content": "测试"}], app_id="")
+
+    def test_generation_app_falls_back_to_audit_app(self):
+        if os.getenv("LLM_GENERATION_APP_ID"):
+            pytest.skip("已配置生成应用")
+        assert llm_config.GENERATION_APP_FALLBACK and llm_config.GENERATION_APP_ID == llm_config.AUDIT_APP_ID
+        assert llm_client.generation_config_error() is None
+
+    @patch("llm_client.httpx.Client")
+    def test_call_llm_ollama(self, mock_client_class, monkeypatch):
+        monkeypatch.setattr("llm_client.LLM_BACKEND", "ollama")
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "message": {"role": "assistant", "content": '{"passed": true}'},
+            "done": True,
+            "prompt_eval_count": 812,
+            "eval_count": 24,
+            "prompt_eval_duration": 350_000_000,
+            "eval_duration": 1_200_000_000,
+            "total_duration": 1_600_000_000,
+        }
+        mock_client = MagicMock()
+        mock_client.post.return_value = mock_response
+        mock_client.__enter__ = MagicMock(return_value=mock_client)
+        mock_client.__exit__ = MagicMock(return_value=False)
+        mock_client_class.return_value = mock_client
+
+        usage = {}
+        result = call_llm([{"role": "user", "content": "测试"}], json_mode=True, usage=usage)
+        assert result == '{"passed": true}'
+        url = mock_client.post.call_args.args[0]
+        payload = mock_client.post.call_args.kwargs["json"]
+        assert url.endswith("/api/chat")
+        assert payload["format"] == "json" and payload["keep_alive"] == -1 and payload["stream"] is False
+        assert usage == {
+            "promptTokens": 812,
+            "completionTokens": 24,
+            "promptEvalMs": 350.0,
+            "evalMs": 1200.0,
+            "totalMs": 1600.0,
+        }
+        assert 'llm_tokens_count{kind="prompt"}' in metrics.render_prometheus()
+
 
 class TestLlmIntegration:
     """测试 LLM 集成（端到端 Mock 测试）"""
@@ -0,0 +1,242 @@
+"""
+测试文件解析模块
+"""
+
+import io
+import sys
+import zipfile
+
+import pytest
+
+import file_parser
+import ocr
+from file_parser import ParsedDocument, detect_format, parse_document, parse_file
+
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _para(text: str) -> str:
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def _table(rows: list[list[str]]) -> str:
+    body = "".join(
+        "<w:tr>" + "".join(f"<w:tc>{_para(c) if c else '<w:p/>'}</w:tc>" for c in row) + "</w:tr>"
+        for row in rows
+    )
+    return f"<w:tbl>{body}</w:tbl>"
+
+
+def _make_docx(body: str, parts: dict[str, str] | None = None) -> bytes:
+    """构造仅包含必要部件的最小 docx"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr(
+            "word/document.xml",
+            f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W_NS}"><w:body>{body}</w:body></w:document>',
+        )
+        for name, xml in (parts or {}).items():
+            zf.writestr(name, f'<w:hdr xmlns:w="{W_NS}">{xml}</w:hdr>')
+    return buf.getvalue()
+
+
+class TestParseDocx:
+    """测试 docx 流式解析"""
+
+    def test_paragraphs_and_tables_in_order(self):
+        body = _para("返修检验记录单") + _table([["产品名称", "XX组件"], ["审核", "张三"]]) + _para("结论：合格")
+        text = parse_file(_make_docx(body), "record.docx")
+        assert text.splitlines() == ["返修检验记录单", "产品名称 | XX组件", "审核 | 张三", "结论：合格"]
+
+    def test_empty_rows_dropped_and_empty_cells_kept(self):
+        body = _table([["批准", ""], ["", ""]])
+        text = parse_file(_make_docx(body), "record.docx")
+        assert text == "批准 | "
+
+    def test_header_and_footer_included_once(self):
+        parts = {
+            "word/header1.xml": _para("编号：FX-001"),
+            "word/header2.xml": _para("编号：FX-001"),
+            "word/footer1.xml": _para("审核：李四 批准：王五"),
+        }
+        text = parse_file(_make_docx(_para("正文"), parts), "record.docx")
+        assert text.splitlines() == ["编号：FX-001", "正文", "审核：李四 批准：王五"]
+
+    def test_processed_elements_released(self, monkeypatch):
+        """已处理的段落与表格从树中移除，大文档的内存不随篇幅增长"""
+        parsers = []
+        real_iterparse = file_parser.ET.iterparse
+
+        def spy(*args, **kwargs):
+            parsers.append(real_iterparse(*args, **kwargs))
+            return parsers[-1]
+
+        monkeypatch.setattr(file_parser.ET, "iterparse", spy)
+        body = "".join(_para(f"第{i}段") for i in range(200)) + _table([["审核", "张三"]])
+        text = parse_file(_make_docx(body), "record.docx")
+        assert text.splitlines()[-1] == "审核 | 张三"
+        assert len(parsers[0].root[0]) == 0
+
+    def test_invalid_docx_returns_empty(self):
+        assert parse_file(b"not a zip", "broken.docx") == ""
+
+
+class TestParseTxt:
+    """测试 txt 解析"""
+
+    @pytest.mark.parametrize("encoding", ["utf-8", "gbk"])
+    def test_decode(self, encoding):
+        assert parse_file("返修工艺".encode(encoding), "a.txt") == "返修工艺"
+
+
+class TestParserRegistry:
+    """测试格式识别与表格类解析"""
+
+    def test_detect_by_magic_ignores_extension(self):
+        data = _make_docx(_para("正文"))
+        assert detect_format(data, "upload.bin") == "docx"
+        assert detect_format(b"%PDF-1.4\n", "a.txt") == "pdf"
+
+    def test_detect_bmp_requires_valid_header(self):
+        pixels = b"\x00" * 8
+        header = b"BM" + (14 + 40 + len(pixels)).to_bytes(4, "little") + b"\x00" * 4 + (14 + 40).to_bytes(4, "little")
+        bmp = header + (40).to_bytes(4, "little") + b"\x00" * 36 + pixels
+        assert detect_format(bmp, "scan.txt") == "image"
+        assert detect_format(b"BMW 520i,2019\nAudi A4,2020\n", "cars.csv") == "csv"
+        assert detect_format("BM 返修记录\n".encode() * 10, "notes.txt") == "txt"
+
+    def test_detect_explicit_format_wins(self):
+        assert detect_format(b"a,b\n1,2\n", "data.txt", "csv") == "csv"
+
+    def test_detect_text_sniffing(self):
+        assert detect_format(b'  {"a": 1}', "") == "json"
+        assert detect_format(b"<root/>", "") == "xml"
+        assert detect_format(b"plain", "") == "txt"
+
+    def test_parse_xlsx(self):
+        openpyxl = pytest.importorskip("openpyxl")
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "检验数据"
+        ws.append(["序号", "尺寸", "结论"])
+        ws.append([1, 12.0, "合格"])
+        ws.append([None, None, None])
+        ws.append([2, 12.5, None])
+        buf = io.BytesIO()
+        wb.save(buf)
+        text = parse_file(buf.getvalue(), "data.xlsx")
+        assert text.splitlines() == ["## 工作表：检验数据", "序号 | 尺寸 | 结论", "1 | 12 | 合格", "2 | 12.5"]
+
+    def test_parse_csv_row_limit(self, monkeypatch):
+        monkeypatch.setattr(file_parser, "MAX_TABLE_ROWS", 2)
+        text = parse_file("编号;结论\nA;合格\nB;不合格\n".encode("gbk"), "data.csv")
+        lines = text.splitlines()
+        assert lines[:2] == ["编号 | 结论", "A | 合格"]
+        assert "已截断" in lines[2]
+
+    def test_parse_json_records_and_nested(self):
+        records = '[{"编号": "A", "合格": true}, {"编号": "B", "备注": "返修"}]'
+        assert parse_file(records.encode(), "a.json").splitlines() == [
+            "编号 | 合格 | 备注", "A | true", "B |  | 返修",
+        ]
+        nested = '{"record": {"items": [{"name": "尺寸"}]}}'
+        assert parse_file(nested.encode(), "b.json") == "record.items[0].name: 尺寸"
+
+    def test_parser_errors_return_empty_document(self):
+        cases = [
+            (b'"' + b"x" * 200_000 + b'"\n', "big.csv", "csv", "Error"),
+            (b"[" * 100_000 + b"]" * 100_000, "deep.json", "json", "RecursionError"),
+        ]
+        for data, name, fmt, error in cases:
+            doc = parse_document(data, name)
+            assert (doc.format, doc.text, doc.page_count) == (fmt, "", 0)
+            assert error in doc.error and doc.to_metadata()["parseError"] == doc.error
+
+    def test_parse_xml(self):
+        xml = '<record xmlns="urn:x"><item id="1">尺寸</item><sign>张三</sign></record>'
+        assert parse_file(xml.encode(), "a.xml").splitlines() == [
+            "record/item: @id=1 尺寸", "record/sign: 张三",
+        ]
+
+
+BLANK_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 200 200]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+@pytest.fixture
+def fake_tesseract(tmp_path, monkeypatch):
+    """用脚本替代 tesseract：输出固定文字，并记录调用次数"""
+    if sys.platform == "win32":
+        pytest.skip("替身脚本依赖 sh")
+    calls = tmp_path / "calls"
+    script = tmp_path / "tesseract"
+    script.write_text(f"#!/bin/sh\ncat > /dev/null\necho x >> {calls}\necho 扫描件文字\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(ocr, "TESSERACT_CMD", str(script))
+    monkeypatch.setattr(ocr, "_cache", ocr.OrderedDict())
+    ocr.is_available.cache_clear()
+    yield lambda: len(calls.read_text().splitlines()) if calls.exists() else 0
+    ocr.is_available.cache_clear()
+
+
+class TestOcr:
+    """测试 OCR 流程（使用替身 tesseract）"""
+
+    def test_image_ocr_cached_by_content(self, fake_tesseract):
+        image = b"\x89PNG\r\n\x1a\n fake image"
+        assert parse_file(image, "scan.png", enable_ocr=True) == "扫描件文字"
+        assert parse_file(image, "scan.png", enable_ocr=True) == "扫描件文字"
+        assert fake_tesseract() == 1
+
+    def test_image_without_ocr_is_empty(self, fake_tesseract):
+        assert parse_file(b"\x89PNG\r\n\x1a\n", "scan.png", enable_ocr=False) == ""
+        assert fake_tesseract() == 0
+
+    def test_scanned_pdf_page_is_ocred(self, fake_tesseract):
+        pytest.importorskip("pdfplumber")
+        assert parse_file(BLANK_PDF, "scan.pdf", enable_ocr=True) == "扫描件文字"
+
+
+class TestParsedDocument:
+    """测试结构化解析结果"""
+
+    def test_pages_and_ranges(self):
+        doc = ParsedDocument("pdf")
+        for text in ["第一页", "", "第三页", "第四页"]:
+            doc.add_page(text)
+        assert doc.page_count == 4
+        assert doc.text == "第一页\n第三页\n第四页"
+        assert doc.page(1) == ""
+        assert doc.page(2) == "第三页"
+        assert doc.page_range(2, 3) == "第三页"
+        assert doc.page_range(1, 3) == "第一页\n第三页"
+        assert doc.page_range(3, 99) == "第三页\n第四页"
+        assert doc.page_range(5, 6) == ""
+        with pytest.raises(IndexError):
+            doc.page(4)
+
+    def test_add_page_after_text_access(self):
+        doc = ParsedDocument()
+        doc.add_page("a")
+        assert doc.text == "a"
+        doc.add_page("b")
+        assert doc.text == "a\nb"
+        assert doc.page(1) == "b"
+
+    def test_parse_document_metadata(self):
+        doc = parse_document("编号,结论\nA,合格\n".encode("gbk"), "data.csv")
+        meta = doc.to_metadata()
+        assert meta["format"] == "csv"
+        assert meta["encoding"] == "gbk"
+        assert meta["pageCount"] == 1
+        assert doc.tables == [[["编号", "结论"], ["A", "合格"]]]
+
+    def test_docx_tables_collected(self):
+        body = _para("标题") + _table([["审核", "张三"]])
+        doc = parse_document(_make_docx(body), "a.docx")
+        assert doc.tables == [[["审核", "张三"]]]
@@ -0,0 +1,123 @@
+"""
+测试大模型调用优先级调度
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import BATCH, INTERACTIVE, SUB_WORKFLOW, LLMScheduler
+
+
+def _run_all(scheduler, jobs, hold=0.0):
+    """名额被占用时依次提交 jobs [(name, priority, session)]，返回执行顺序与各自的排队信息"""
+    order, infos = [], {}
+    release = threading.Event()
+
+    async def main():
+        blocker = asyncio.ensure_future(scheduler.run(release.wait, priority=BATCH, session_id="x"))
+        await asyncio.sleep(0.01)
+        tasks = []
+        for name, priority, session in jobs:
+            infos[name] = {}
+            tasks.append(asyncio.ensure_future(scheduler.run(
+                order.append, name, priority=priority, session_id=session, queue_info=infos[name],
+            )))
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(hold)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(main())
+    return order, infos
+
+
+class TestLLMScheduler:
+
+    def test_priority_order_and_queue_info(self):
+        order, infos = _run_all(LLMScheduler(1), [
+            ("b1", BATCH, "qa"), ("s1", SUB_WORKFLOW, "wf"), ("i1", INTERACTIVE, "insp"), ("b2", BATCH, "qa"),
+        ])
+        assert order == ["i1", "s1", "b1", "b2"]
+        assert infos["b1"]["position"] == 1 and infos["i1"]["position"] == 1
+        assert infos["b2"]["position"] == 4
+        assert infos["i1"]["priority"] == INTERACTIVE and infos["i1"]["waitMs"] > 0
+
+    def test_aging_prevents_starvation(self, monkeypatch):
+        monkeypatch.setattr(llm_scheduler, "LLM_AGING_SECONDS", 0.02)
+        # 批量任务排队 ≥ 2 个老化周期后与新到的交互请求同级，按到达顺序先执行
+        order, _ = _run_all(LLMScheduler(1), [("b1", BATCH, "qa"), ("i1", INTERACTIVE, "insp")], hold=0.05)
+        assert order == ["b1", "i1"]
+
+    def test_session_fairness_within_priority(self):
+        scheduler = LLMScheduler(2)
+        release = threading.Event()
+        order = []
+
+        async def main():
+            # 会话 qa 已占用一个名额，另一名额空出后应先分配给会话 other
+            hold = asyncio.ensure_future(scheduler.run(release.wait, priority=BATCH, session_id="qa"))
+            short = asyncio.ensure_future(scheduler.run(time.sleep, 0.05, priority=BATCH, session_id="y"))
+            await asyncio.sleep(0.01)
+            tasks = [asyncio.ensure_future(scheduler.run(order.append, n, priority=BATCH, session_id=s))
+                     for n, s in [("qa2", "qa"), ("qa3", "qa"), ("other", "other")]]
+            await short
+            await asyncio.sleep(0.05)
+            release.set()
+            await asyncio.gather(hold, *tasks)
+
+        asyncio.run(main())
+        assert order[0] == "other"
+
+    def test_anonymous_requests_not_grouped(self):
+        scheduler = LLMScheduler(2)
+        release = threading.Event()
+        order = []
+
+        async def main():
+            # 一个匿名请求占用名额时，之后到达的其他匿名请求不因同属 "" 会话而排在命名会话之后
+            hold = asyncio.ensure_future(scheduler.run(release.wait, priority=BATCH))
+            short = asyncio.ensure_future(scheduler.run(time.sleep, 0.05, priority=BATCH, session_id="y"))
+            await asyncio.sleep(0.01)
+            tasks = [asyncio.ensure_future(scheduler.run(order.append, n, priority=BATCH, session_id=s))
+                     for n, s in [("anon", ""), ("named", "other")]]
+            await short
+            await asyncio.sleep(0.05)
+            release.set()
+            await asyncio.gather(hold, *tasks)
+            assert scheduler.status()["running"] == 0 and not scheduler._running_by_session
+
+        asyncio.run(main())
+        assert order == ["anon", "named"]
+
+    def test_sync_call_and_errors_release_slot(self):
+        scheduler = LLMScheduler(1)
+        with pytest.raises(ValueError):
+            scheduler.call(lambda: (_ for _ in ()).throw(ValueError("LLM API 调用异常")))
+        assert scheduler.call(lambda x: x * 2, 21, priority=SUB_WORKFLOW) == 42
+        assert scheduler.status()["running"] == 0 and scheduler.status()["avgCallMs"] is not None
+
+    def test_run_progresses_when_default_executor_is_saturated(self):
+        """默认线程池被等待名额的 call() 占满时，获得名额的 run() 仍能执行并归还名额"""
+        scheduler = LLMScheduler(1)
+        release = threading.Event()
+        holder = threading.Thread(target=scheduler.call, args=(release.wait,), kwargs={"priority": BATCH})
+        holder.start()
+        time.sleep(0.05)
+
+        async def main():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+            first = asyncio.ensure_future(scheduler.run(lambda: "run", priority=INTERACTIVE))
+            await asyncio.sleep(0.01)
+            blocked = [asyncio.to_thread(scheduler.call, lambda: "call", priority=BATCH) for _ in range(2)]
+            waiting = asyncio.ensure_future(asyncio.gather(*blocked))
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.wait_for(asyncio.gather(first, waiting), timeout=5)
+
+        assert asyncio.run(main()) == ["run", ["call", "call"]]
+        holder.join()
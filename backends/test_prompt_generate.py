@@ -0,0 +1,82 @@
+"""
+测试过程组提示词生成与预计算缓存
+"""
+
+import pytest
+
+import prompt_generate
+from prompt_generate import generate_prompt_from_json
+
+
+@pytest.fixture
+def knowledge(tmp_path, monkeypatch):
+    # 各用例的标准文件不同，不沿用上一个用例按版本缓存的摘要
+    monkeypatch.setattr(prompt_generate, "_stamp_cache", None)
+    main = tmp_path / "main.md"
+    main.write_text("## 8.6 产品放行\n放行要求\n## 8.7 不合格输出的控制\n应识别和控制不合格输出。\n", encoding="utf-8")
+    detail = tmp_path / "detail.md"
+    detail.write_text("不合格品审理{编号}规则", encoding="utf-8")
+    return {
+        "file": "GJB9001C",
+        "file_path": str(main),
+        "process_domains": [
+            {"name": "不合格品控制", "charpter": "8.7", "related_domains": [
+                {"name": "产品管理", "file": "GJB 571A", "file_path": str(detail), "related_domains": []},
+            ]},
+            {"name": "设计开发", "charpter": "8.3"},
+        ],
+    }
+
+
+class TestPromptCache:
+    """预计算参考文件清单后只拼接用户输入"""
+
+    ARGS = ("不合格品控制", "航天{单位}", "** 目的\n** 范围", "产品->物资")
+
+    def test_cached_prompt_matches_generator(self, knowledge):
+        expected = generate_prompt_from_json(knowledge, *self.ARGS)
+        assert prompt_generate.precompute(knowledge, "v1") == 2
+        assert generate_prompt_from_json(knowledge, *self.ARGS, version="v1") == expected
+        assert "不合格品审理{编号}规则" in expected and "航天{单位}" in expected
+        assert "放行要求" not in expected
+
+    def test_no_file_reads_until_version_changes(self, knowledge, monkeypatch):
+        prompt_generate.precompute(knowledge, "v1")
+        with monkeypatch.context() as m:
+            m.setattr(prompt_generate, "_read_standard_file", lambda path: pytest.fail("不应读取文件"))
+            assert "不合格输出" in generate_prompt_from_json(knowledge, *self.ARGS, version="v1")
+            assert generate_prompt_from_json(knowledge, "采购", "", "", "", version="v1").startswith("错误：")
+
+        knowledge["process_domains"][0]["name"] = "不合格品审理"
+        prompt = generate_prompt_from_json(knowledge, "不合格品审理", "", "", "", version="v2")
+        assert prompt.startswith("请根据以下参考文件，为过程组【不合格品审理】")
+
+    def test_standard_file_change_invalidates_cache(self, knowledge, monkeypatch):
+        """标准文件修改后，即使知识树版本不变（包括重启后从共享缓存读取）也使用新内容"""
+        monkeypatch.setattr(prompt_generate, "STANDARD_FILES_CHECK_INTERVAL", 0)
+        assert "不合格品审理{编号}规则" in generate_prompt_from_json(knowledge, *self.ARGS, version="v1")
+        detail = knowledge["process_domains"][0]["related_domains"][0]["file_path"]
+        with open(detail, "w", encoding="utf-8") as f:
+            f.write("不合格品审理新规则（修订）")
+        prompt_generate._reference_blocks = None  # 模拟进程重启，只剩共享缓存
+        prompt = generate_prompt_from_json(knowledge, *self.ARGS, version="v1")
+        assert "修订" in prompt and "{编号}" not in prompt
+
+    def test_standard_files_checked_at_most_once_per_interval(self, knowledge, monkeypatch):
+        prompt_generate.precompute(knowledge, "v5")
+        with monkeypatch.context() as m:
+            m.setattr(prompt_generate.os, "stat", lambda path: pytest.fail("间隔内不应 stat 标准文件"))
+            for _ in range(3):
+                generate_prompt_from_json(knowledge, *self.ARGS, version="v5")
+
+    def test_generator_reuses_versioned_index(self, knowledge, monkeypatch):
+        generator = prompt_generate.ProcessGroupPromptGenerator(knowledge, "v4")
+        generator.generate_prompt("不合格品控制")
+        monkeypatch.setattr(prompt_generate.domain_index, "DomainIndex", lambda data: pytest.fail("不应重建索引"))
+        assert generator.generate_prompt("不合格品控制").startswith("请根据以下参考文件")
+
+    def test_invalid_group_raises_like_generator(self, knowledge):
+        del knowledge["process_domains"][1]["charpter"]
+        prompt_generate.precompute(knowledge, "v3")
+        with pytest.raises(KeyError):
+            generate_prompt_from_json(knowledge, "设计开发", "", "", "", version="v3")
@@ -0,0 +1,64 @@
+"""
+测试问答校验：本地判定与大模型微批合并
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import qa_validation
+
+
+class TestLocalValidate:
+    """测试本地校验规则"""
+
+    def test_normalized_exact_match(self):
+        result = qa_validation.local_validate("返修后，需重新检验！", "返修后需重新检验")
+        assert result["isValid"] is True and result["method"] == "exact"
+
+    def test_similarity_bands(self):
+        assert qa_validation.local_validate("返修后需要重新检验", "返修后需重新检验")["isValid"] is True
+        assert qa_validation.local_validate("直接入库", "返修后需重新检验")["isValid"] is False
+
+    def test_ambiguous_deferred_to_llm(self):
+        assert qa_validation.local_validate("返修完成以后要重新进行检验", "返修后需重新检验", use_ai=True) is None
+
+    def test_empty_answer(self):
+        assert qa_validation.local_validate("  ", "返修后需重新检验")["isValid"] is False
+
+
+class TestMicroBatch:
+    """测试模糊回答合并为一次大模型调用"""
+
+    def test_concurrent_answers_share_one_call(self, monkeypatch):
+        calls = []
+
+        def fake_call_llm(messages, **kwargs):
+            calls.append(messages)
+            count = messages[1]["content"].count("### 回答")
+            return json.dumps({"results": [
+                {"id": i + 1, "isValid": True, "score": 90, "feedback": "含义一致"} for i in range(count)
+            ]})
+
+        monkeypatch.setattr("llm_client.call_llm", fake_call_llm)
+
+        async def run():
+            return await asyncio.gather(*(
+                qa_validation.validate_answer(f"返修完成以后要重新进行检验{i}", expected="返修后需重新检验", use_ai=True)
+                for i in range(5)
+            ))
+
+        results = asyncio.run(run())
+        assert len(calls) == 1
+        assert all(r["isValid"] and r["method"] == "llm" for r in results)
+
+    def test_llm_failure_falls_back_to_similarity(self, monkeypatch):
+        def failing_call_llm(messages, **kwargs):
+            raise ValueError("LLM API 调用异常")
+
+        monkeypatch.setattr("llm_client.call_llm", failing_call_llm)
+        result = asyncio.run(
+            qa_validation.validate_answer("返修完成以后要重新进行检验", expected="返修后需重新检验", use_ai=True)
+        )
+        assert result["method"] == "local_fallback"
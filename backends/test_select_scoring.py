@@ -0,0 +1,71 @@
+"""
+测试选择题评分
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import select_scoring
+
+OPTIONS = (("合格", "pass", True), ("不合格", "fail", False), ("让步接收", "concession", True))
+
+
+class TestGrading:
+    """测试单选/多选评分规则"""
+
+    def test_compile_is_cached(self):
+        assert select_scoring.compile_options(OPTIONS) is select_scoring.compile_options(list(OPTIONS))
+
+    def test_single(self):
+        compiled = select_scoring.compile_options(OPTIONS)
+        assert select_scoring.grade_single(compiled, "pass")["isCorrect"] is True
+        assert select_scoring.grade_single(compiled, "fail")["isCorrect"] is False
+        assert select_scoring.grade_single(compiled, "other")["isValid"] is False
+
+    @pytest.mark.parametrize("selected, score, counts", [
+        (["pass", "concession"], 100, (2, 0, 0)),
+        (["pass"], 50, (1, 0, 1)),
+        (["pass", "fail"], 0, (1, 1, 1)),
+        (["pass", "pass", "unknown"], 0, (1, 1, 1)),
+    ])
+    def test_multi(self, selected, score, counts):
+        result = select_scoring.grade_multi(select_scoring.compile_options(OPTIONS), selected)
+        details = result["scoreDetails"]
+        assert result["score"] == score
+        assert (details["correctCount"], details["incorrectCount"], details["missedCount"]) == counts
+
+    def test_select_limits(self):
+        compiled = select_scoring.compile_options(OPTIONS, 1, 2)
+        assert select_scoring.grade_multi(compiled, [])["constraintError"] == "至少选择 1 项"
+        assert select_scoring.grade_multi(compiled, ["pass", "fail", "concession"])["isValid"] is False
+
+    def test_ungraded_keeps_legacy_result(self):
+        compiled = select_scoring.compile_options((("A", "a", None), ("B", "b", None)))
+        result = select_scoring.grade_multi(compiled, ["a"])
+        assert result["score"] == 100 and result["isFullyCorrect"] is None
+
+    def test_shuffle_is_deterministic(self):
+        compiled = select_scoring.compile_options(tuple((str(i), str(i), None) for i in range(10)))
+        first = select_scoring.display_options(compiled, "s1:step")
+        assert first == select_scoring.display_options(compiled, "s1:step")
+        assert sorted(o["value"] for o in first) == [str(i) for i in range(10)]
+
+
+class TestSelectApi:
+    """测试选择题接口"""
+
+    def test_batch_grading(self):
+        client = TestClient(api.app)
+        options = [{"label": l, "value": v, "isCorrect": c} for l, v, c in OPTIONS]
+        resp = client.post("/api/steps/multi-select/batch", json={
+            "stepId": "s1", "workflowId": "w1",
+            "optionsConfig": {"options": options},
+            "submissions": [
+                {"sessionId": "a", "selectedValues": ["pass", "concession"]},
+                {"sessionId": "b", "selectedValues": ["fail"]},
+            ],
+        })
+        data = resp.json()["data"]["data"]
+        assert [r["score"] for r in data["results"]] == [100, 0]
+        assert data["summary"] == {"count": 2, "correctCount": 1, "averageScore": 50.0}
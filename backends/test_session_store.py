@@ -0,0 +1,117 @@
+"""
+测试会话存储与步骤结果引用
+"""
+
+import sqlite3
+from collections import OrderedDict
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import document_store
+import session_store
+
+
+@pytest.fixture
+def store(isolated_session_store):
+    """每个用例使用独立的内存状态与 SQLite 文件（见 conftest）"""
+    return isolated_session_store
+
+
+class TestSessionStore:
+    """测试内存 + SQLite write-behind"""
+
+    def test_reload_from_sqlite_after_eviction(self, store):
+        store.record_step("s1", "w1", "step1", "qa_interaction", {"score": 90}, success=True, message="ok")
+        store.flush()
+        store._sessions.clear()
+        assert store.get_step("s1", "step1")["data"] == {"score": 90}
+
+    def test_document_text_persisted(self, store, monkeypatch):
+        digest = document_store.put_text("返修检验记录")
+        store.add_document("s1", "w1", digest, {"fileName": "a.txt"})
+        store.flush()
+        monkeypatch.setattr(document_store, "get_bytes", lambda d: None)
+        assert store.get_document_text(digest) == "返修检验记录"
+
+    def test_workers_merge_steps(self, store, monkeypatch):
+        """两个 worker 各自持有同一会话的副本，落盘时按步骤合并而不是整行覆盖"""
+        store.record_step("s1", "w1", "step1", "qa_interaction", {"score": 90}, success=True)
+        store.flush()
+        worker_a = store._sessions
+        monkeypatch.setattr(store, "_sessions", OrderedDict())
+        store._sessions["s1"] = {**worker_a["s1"], "steps": {}}  # 另一 worker 在 step1 写入前加载的副本
+        store.record_step("s1", "w1", "step2", "file_parse", {"ok": True}, success=True)
+        store.flush()
+        assert set(store.get_session("s1")["steps"]) == {"step1", "step2"}
+
+        monkeypatch.setattr(store, "_sessions", worker_a)
+        assert store.get_step("s1", "step2")["data"] == {"ok": True}
+
+    def test_recorded_data_is_copied(self, store):
+        result = {"score": 90}
+        store.record_step("s1", "w1", "step1", "single_select", result, success=True)
+        result["sessionId"] = "s1"
+        assert store.get_step("s1", "step1")["data"] == {"score": 90}
+
+    def test_record_steps_batch_merges_on_flush(self, store, monkeypatch):
+        """批量评分不逐个读数据库，落盘时再与数据库中的记录合并"""
+        store.record_step("s1", "w1", "step1", "qa_interaction", {"score": 90}, success=True)
+        store.flush()
+        store._sessions.clear()
+        with monkeypatch.context() as m:
+            m.setattr(store, "_load_session", lambda sid: pytest.fail("批量写入不应逐个读数据库"))
+            store.record_steps(
+                "w1", "step2", "single_select", [("s1", {"ok": True}, True), ("s2", {"ok": False}, False)]
+            )
+        store.flush()
+        assert set(store.get_session("s1")["steps"]) == {"step1", "step2"}
+        assert store.get_step("s2", "step2")["success"] is False
+
+    def test_failed_flush_keeps_dirty(self, store, monkeypatch):
+        store.record_step("s1", "w1", "step1", "qa_interaction", {}, success=True)
+
+        def failing_write(*args):
+            raise sqlite3.OperationalError("database is locked")
+
+        with monkeypatch.context() as m:
+            m.setattr(store, "_write", failing_write)
+            with pytest.raises(sqlite3.OperationalError):
+                store.flush()
+        assert "s1" in store._dirty
+        store.flush()
+        store._sessions.clear()
+        assert store.get_step("s1", "step1") is not None
+
+    def test_ttl_expiry(self, store, monkeypatch):
+        store.record_step("s1", "w1", "step1", "qa_interaction", {}, success=True)
+        monkeypatch.setattr(store, "SESSION_TTL_SECONDS", -1)
+        assert store.get_session("s1") is None
+
+
+class TestSessionApi:
+    """测试步骤间按引用复用解析结果"""
+
+    def test_document_ref_reuse(self, store):
+        client = TestClient(api.app)
+        common = {"workflowId": "w1", "sessionId": "sess-1"}
+        resp = client.post(
+            "/api/steps/file-parse",
+            data={**common, "stepId": "parse"},
+            files={"file": ("记录.txt", "返修后重新检验合格".encode("utf-8"))},
+        )
+        ref = resp.json()["data"]["data"]["metadata"]["documentRef"]
+
+        resp = client.post("/api/steps/file-parse", data={**common, "stepId": "audit", "documentRef": ref})
+        assert resp.json()["data"]["data"]["textContent"] == "返修后重新检验合格"
+
+        session = client.get("/api/sessions/sess-1").json()
+        assert set(session["steps"]) == {"parse", "audit"}
+        assert ref in session["documents"]
+        assert "textContent" not in session["steps"]["parse"]["data"]
+
+    def test_unknown_document_ref(self, store):
+        client = TestClient(api.app)
+        resp = client.post("/api/steps/file-parse", data={"stepId": "a", "sessionId": "x", "documentRef": "0" * 64})
+        assert resp.json()["success"] is False
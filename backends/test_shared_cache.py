@@ -0,0 +1,70 @@
+"""
+测试跨 worker 共享缓存
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import shared_cache
+import file_parser
+import llm_client
+
+
+class TestSharedCache:
+
+    def test_get_set_ttl_and_namespaces(self, monkeypatch):
+        assert shared_cache.set("parse", "k", {"text": "检验记录"})
+        assert shared_cache.get("parse", "k") == {"text": "检验记录"}
+        assert shared_cache.get("llm", "k") is None
+
+        shared_cache.set("llm", "old", "x", ttl=0.01)
+        time.sleep(0.02)
+        assert shared_cache.get("llm", "old") is None
+        assert shared_cache.get_or_set("llm", "new", lambda: "y") == "y"
+        assert shared_cache.get_or_set("llm", "new", lambda: "z") == "y"
+
+        monkeypatch.setattr(shared_cache, "SHARED_CACHE_PATH", "")
+        assert shared_cache.set("parse", "k", 1) is False and shared_cache.get("parse", "k") is None
+
+    def test_clear_and_stats_degrade_on_corrupt_db(self, monkeypatch, tmp_path):
+        corrupt = tmp_path / "corrupt.db"
+        corrupt.write_bytes(b"not a sqlite database" * 100)
+        monkeypatch.setattr(shared_cache, "SHARED_CACHE_PATH", str(corrupt))
+        assert shared_cache.clear() is False
+        assert "error" in shared_cache.stats()
+        assert shared_cache.get("parse", "k") is None
+
+    def test_evicts_least_recently_used(self, monkeypatch):
+        monkeypatch.setattr(shared_cache, "SHARED_CACHE_MAX_MB", 1 / 1024)  # 1KB
+        for i in range(4):
+            shared_cache.set("ocr", str(i), "x" * 300)
+        shared_cache.evict()
+        assert shared_cache.get("ocr", "0") is None and shared_cache.get("ocr", "3") is not None
+
+    def test_visible_across_processes(self):
+        shared_cache.set("prompt", "v1:0", "参考文件清单")
+        code = "import shared_cache, sys; shared_cache.SHARED_CACHE_PATH = sys.argv[1]; print(shared_cache.get('prompt', 'v1:0'))"
+        out = subprocess.run(
+            [sys.executable, "-c", code, shared_cache.SHARED_CACHE_PATH],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__),
+        )
+        assert out.stdout.strip() == "参考文件清单"
+
+    def test_parse_and_llm_layers(self, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("应命中共享缓存")
+
+        data = "名称,数量\n螺栓,3\n".encode("utf-8")
+        first = file_parser.parse_document(data, "a.csv", cache=True)
+        monkeypatch.setitem(file_parser._PARSERS, "csv", fail)
+        second = file_parser.parse_document(data, "b.csv", cache=True)
+        assert second.text == first.text and second.tables == first.tables
+        assert second.page_range(1, 1) == first.page_range(1, 1)
+
+        messages = [{"role": "user", "content": "审核"}]
+        key = shared_cache.make_key(llm_client.LLM_API_BASE, llm_client.AUDIT_APP_ID, messages)
+        shared_cache.set("llm", key, '{"passed": true}')
+        monkeypatch.setattr(llm_client, "_new_client", fail)
+        assert llm_client.call_llm(messages, cache_ttl=60) == '{"passed": true}'
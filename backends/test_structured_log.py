@@ -0,0 +1,60 @@
+"""
+测试结构化日志
+"""
+
+import json
+import logging
+import shlex
+
+import structured_log
+from structured_log import get_logger, truncate
+
+
+class TestTruncate:
+    def test_long_text_truncated(self):
+        assert truncate("检" * 10, 4) == "检检检检…(+6 chars)"
+
+    def test_primitives_kept(self):
+        assert truncate(12, 1) == 12
+        assert truncate(None) is None
+
+    def test_containers_as_json(self):
+        assert truncate({"结论": "合格", "items": [1, None]}, 100) == '{"结论":"合格","items":[1,null]}'
+        assert truncate(("a", object), 100).startswith('["a","<class')
+
+
+class TestStructuredLogger:
+    def test_json_line_with_fields(self, monkeypatch):
+        log = get_logger("test_module")
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger("backends.test_module")
+        logger.addHandler(handler)
+        monkeypatch.setattr(structured_log, "LOG_FIELD_MAX_CHARS", 3)
+        try:
+            log.warning("demo.event", text="返修检验记录", size=10)
+        finally:
+            logger.removeHandler(handler)
+
+        entry = json.loads(structured_log._JsonFormatter().format(records[0]))
+        assert entry["event"] == "demo.event"
+        assert entry["level"] == "WARNING"
+        assert entry["text"] == "返修检…(+3 chars)"
+        assert entry["size"] == 10
+
+    def test_text_format_is_key_value_parseable(self):
+        record = logging.LogRecord("backends.test_module", logging.INFO, "", 0, "demo.event", None, None)
+        result = {"passed": False, "reason": "未签署 批准"}
+        record.fields = {"result": truncate(result), "note": "a b", "n": 3, "step": "s1"}
+        line = structured_log._TextFormatter().format(record)
+        fields = dict(part.split("=", 1) for part in shlex.split(line)[4:])
+        assert json.loads(fields.pop("result")) == result
+        assert fields == {"note": "a b", "n": "3", "step": "s1"}
+
+    def test_disabled_level_skips_field_processing(self):
+        class Boom:
+            def __str__(self):
+                raise AssertionError("不应被格式化")
+
+        get_logger("test_module").debug("demo.debug", value=Boom())
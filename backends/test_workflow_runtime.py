@@ -0,0 +1,105 @@
+"""
+测试工作流本地执行
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import workflow_runtime
+from workflow_runtime import Workflow, WorkflowError
+
+
+def _chat_node(node_id: str, prompt: str) -> dict:
+    return {
+        "nodeId": node_id, "name": node_id, "flowNodeType": "chatNode",
+        "inputs": [
+            {"key": "systemPrompt", "value": prompt},
+            {"key": "userChatInput", "value": ["start", "userChatInput"]},
+        ],
+        "outputs": [{"id": "answerText", "key": "answerText"}],
+    }
+
+
+# 两个对话节点都只依赖开始节点，第三个节点引用两者的输出
+FAN_OUT = {
+    "nodes": [
+        {"nodeId": "start", "name": "开始", "flowNodeType": "workflowStart", "inputs": [], "outputs": []},
+        _chat_node("a", "目的：{{$VARIABLE_NODE_ID.v1$}}"),
+        _chat_node("b", "范围：{{$VARIABLE_NODE_ID.v2$}}"),
+        _chat_node("merge", "{{$a.answerText$}}|{{$b.answerText$}}"),
+    ],
+    "edges": [{"source": "start", "target": "a"}, {"source": "start", "target": "b"}],
+    "chatConfig": {"variables": [
+        {"key": "v1", "label": "purpose", "required": True},
+        {"key": "v2", "label": "scope"},
+    ]},
+}
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    workflow_runtime.clear_cache()
+    calls = []
+    active = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def call_llm(messages, **kwargs):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+            calls.append(messages[0]["content"])
+        return f"答:{messages[0]['content']}"
+
+    monkeypatch.setattr("llm_client.call_llm", call_llm)
+    return calls, active
+
+
+class TestWorkflowRuntime:
+    """测试调度、缓存与变量"""
+
+    def test_independent_nodes_run_concurrently(self, fake_llm):
+        calls, active = fake_llm
+        result = asyncio.run(Workflow(FAN_OUT).run({"purpose": "控制", "scope": "全厂"}, "生成"))
+        assert active["max"] == 2
+        assert result["answer"] == "答:答:目的：控制|答:范围：全厂"
+
+    def test_only_downstream_of_changed_input_recomputes(self, fake_llm):
+        calls, _ = fake_llm
+        workflow = Workflow(FAN_OUT)
+        asyncio.run(workflow.run({"v1": "控制", "v2": "全厂"}))
+        result = asyncio.run(workflow.run({"v1": "控制", "v2": "车间"}))
+        cached = {n["nodeId"]: n["cached"] for n in result["nodes"]}
+        assert cached == {"start": True, "a": True, "b": False, "merge": False}
+        assert len(calls) == 5
+
+    def test_chat_node_uses_generation_app_and_settings(self, monkeypatch):
+        workflow_runtime.clear_cache()
+        seen = []
+        monkeypatch.setattr("llm_client.call_llm", lambda messages, **kw: seen.append(kw) or "ok")
+        monkeypatch.setattr("llm_client.GENERATION_APP_ID", "gen-app")
+        node = _chat_node("a", "目的")
+        node["inputs"] += [
+            {"key": "model", "value": "qwen3:30b-40k"},
+            {"key": "temperature", "value": 0.2},
+            {"key": "maxToken", "value": 4000},
+        ]
+        flow = {"nodes": [FAN_OUT["nodes"][0], node], "edges": [{"source": "start", "target": "a"}]}
+        asyncio.run(Workflow(flow).run({}, "生成"))
+        assert seen[0]["app_id"] == "gen-app"
+        assert (seen[0]["model"], seen[0]["temperature"], seen[0]["max_tokens"]) == ("qwen3:30b-40k", 0.2, 4000)
+
+    def test_required_variable_and_unknown_node(self):
+        with pytest.raises(WorkflowError, match="purpose"):
+            asyncio.run(Workflow(FAN_OUT).run({}))
+        with pytest.raises(WorkflowError, match="不支持的节点类型"):
+            Workflow({"nodes": [{"nodeId": "x", "name": "x", "flowNodeType": "unknownNode"}]})
+
+    def test_loads_exported_workflow(self):
+        workflow = workflow_runtime.get_workflow()
+        assert {n["flowNodeType"] for n in workflow.nodes.values()} == {"workflowStart", "httpRequest468", "chatNode"}
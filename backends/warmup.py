@@ -0,0 +1,78 @@
+"""
+启动预热 - 导入耗时预算、后台预热步骤与就绪状态
+
+服务启动时在后台线程依次执行预热步骤（解析器依赖、LLM 连接池、知识树快照、标准文件），
+全部完成后 /health/ready 才返回 200；单个步骤失败只记录告警，不阻止就绪。
+
+环境变量：
+  WARMUP_ON_STARTUP  - 启动时是否预热（1/0），默认 1；关闭时服务立即就绪
+  IMPORT_BUDGET_MS   - 模块导入耗时预算（毫秒），超出时记录告警，默认 1500
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from structured_log import get_logger
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+log = get_logger(__name__)
+
+_ready = threading.Event()
+_imports: dict[str, float] = {}
+_steps: dict[str, dict[str, Any]] = {}
+
+
+def record_import(module: str, seconds: float) -> None:
+    """记录模块导入耗时，超出 IMPORT_BUDGET_MS 时记录告警"""
+    elapsed_ms = round(seconds * 1000, 2)
+    _imports[module] = elapsed_ms
+    if elapsed_ms > IMPORT_BUDGET_MS:
+        log.warning("startup.import_over_budget", module=module, elapsedMs=elapsed_ms, budgetMs=IMPORT_BUDGET_MS)
+
+
+def run(steps: list[tuple[str, Callable[[], Any]]]) -> dict[str, dict[str, Any]]:
+    """
+    依次执行预热步骤并标记就绪。
+
+    Args:
+        steps: [(步骤名, 无参函数)]，函数返回值记入步骤结果
+
+    Returns:
+        {步骤名: {"ok", "durationMs", "result" | "error"}}
+    """
+    for name, func in steps:
+        start = time.perf_counter()
+        try:
+            entry = {"ok": True, "result": func()}
+        except Exception as e:
+            entry = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            log.warning("startup.warmup_failed", step=name, error=entry["error"])
+        elapsed = time.perf_counter() - start
+        entry["durationMs"] = round(elapsed * 1000, 2)
+        _steps[name] = entry
+    mark_ready()
+    log.info("startup.ready", steps={k: v["durationMs"] for k, v in _steps.items()})
+    return dict(_steps)
+
+
+def mark_ready() -> None:
+    _ready.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def reset() -> None:
+    """清除就绪状态（服务关闭或测试时使用）"""
+    _ready.clear()
+    _steps.clear()
+
+
+def status() -> dict[str, Any]:
+    """就绪状态与各步骤、导入耗时，供健康检查接口返回"""
+    return {"ready": is_ready(), "imports": dict(_imports), "steps": dict(_steps)}
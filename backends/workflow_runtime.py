@@ -0,0 +1,397 @@
+"""
+工作流本地执行 - 加载 FastGPT 导出的工作流（nodes/edges），在本进程内执行
+
+  workflow = Workflow.load(path)
+  result = await workflow.run({"query": "不合格品控制", "background": "..."})
+
+执行方式：
+  - 节点按依赖关系（连线 + 输入引用）调度，依赖全部完成的节点并发执行（asyncio）
+  - 同步处理（HTTP、LLM 调用）在线程池中执行，不阻塞事件循环
+  - 节点输出按"节点配置 + 解析后的输入"摘要缓存：只修改一个变量重新执行时，
+    输入未变的上游节点直接命中缓存，只有受影响的下游节点重新计算
+  - HTTP 节点请求本服务已注册的本地路由（register_local_route）时直接调用函数，省去一次网络往返
+
+支持的节点类型：workflowStart、httpRequest468、chatNode；userGuide 等配置节点跳过。
+
+环境变量：
+  WORKFLOW_PATH        - 默认工作流文件，默认仓库根目录下的 质量文档生成.json
+  WORKFLOW_CACHE_SIZE  - 节点输出缓存条数，默认 256
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+import llm_client
+import llm_scheduler
+import metrics
+from structured_log import get_logger
+
+WORKFLOW_PATH = os.getenv(
+    "WORKFLOW_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "质量文档生成.json"),
+)
+WORKFLOW_CACHE_SIZE = int(os.getenv("WORKFLOW_CACHE_SIZE", "256"))
+
+log = get_logger(__name__)
+
+# 变量引用使用的特殊节点 ID
+VARIABLE_NODE_ID = "VARIABLE_NODE_ID"
+# 不参与执行的配置类节点
+_SKIPPED_TYPES = {"userGuide", "systemConfig", "pluginConfig"}
+_TEMPLATE_RE = re.compile(r"\{\{\$([^.$]+)\.([^$]+)\$\}\}")
+
+
+class WorkflowError(Exception):
+    """工作流加载或执行失败"""
+
+
+# ==================== 节点处理器注册表 ====================
+
+# 节点类型 -> 处理函数 (node, inputs, ctx) -> outputs，在线程池中执行
+_HANDLERS: dict[str, Callable[[dict, dict, "RunContext"], dict]] = {}
+
+
+def register_node(node_type: str):
+    """注册节点处理器的装饰器"""
+    def decorator(func):
+        _HANDLERS[node_type] = func
+        return func
+    return decorator
+
+
+# 本地路由：路径 -> (处理函数(body) -> 响应 JSON, 版本函数)；版本参与节点缓存键
+_LOCAL_ROUTES: dict[str, tuple[Callable[[Any], Any], Optional[Callable[[], str]]]] = {}
+
+
+def register_local_route(path: str, func: Callable[[Any], Any], version: Optional[Callable[[], str]] = None) -> None:
+    """
+    注册本地路由：HTTP 节点请求该路径（任意主机）时直接调用 func(json_body)。
+
+    Args:
+        path: 请求路径，如 /prompt/generate
+        func: 接收请求体、返回响应 JSON 的函数
+        version: 返回数据版本的函数（如知识树版本），版本变化时该节点缓存失效
+    """
+    _LOCAL_ROUTES[path] = (func, version)
+
+
+# ==================== 输出缓存 ====================
+
+_cache: "OrderedDict[str, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key: str) -> Optional[dict]:
+    with _cache_lock:
+        outputs = _cache.get(key)
+        if outputs is not None:
+            _cache.move_to_end(key)
+        return outputs
+
+
+def _cache_put(key: str, outputs: dict) -> None:
+    with _cache_lock:
+        _cache[key] = outputs
+        _cache.move_to_end(key)
+        while len(_cache) > WORKFLOW_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+# ==================== 工作流 ====================
+
+class RunContext:
+    """单次执行的上下文：全局变量与各节点输出（按输出 id 存放）"""
+
+    def __init__(self, variables: dict[str, Any], user_input: str):
+        self.variables = variables
+        self.user_input = user_input
+        self.outputs: dict[str, dict[str, Any]] = {}
+
+    def ref(self, node_id: str, output_id: str) -> Any:
+        if node_id == VARIABLE_NODE_ID:
+            return self.variables.get(output_id, "")
+        return self.outputs.get(node_id, {}).get(output_id)
+
+    def render(self, template: str, escape_json: bool = False) -> str:
+        """替换 {{$节点ID.输出ID$}} 模板；escape_json 为真时按 JSON 字符串内容转义"""
+        def substitute(match: re.Match) -> str:
+            value = self.ref(match.group(1), match.group(2))
+            if value is None:
+                return ""
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            return json.dumps(value, ensure_ascii=False)[1:-1] if escape_json else value
+        return _TEMPLATE_RE.sub(substitute, template)
+
+
+def _is_ref(value: Any) -> bool:
+    return isinstance(value, list) and len(value) == 2 and all(isinstance(v, str) for v in value)
+
+
+def _refs_in(value: Any) -> list[str]:
+    """输入值中引用的节点 ID"""
+    if _is_ref(value):
+        return [value[0]]
+    if isinstance(value, list):
+        return [r for v in value for r in _refs_in(v)]
+    if isinstance(value, str):
+        return [m.group(1) for m in _TEMPLATE_RE.finditer(value)]
+    return []
+
+
+class Workflow:
+    """已加载的工作流图"""
+
+    def __init__(self, data: dict[str, Any]):
+        self.nodes: dict[str, dict] = {}
+        for node in data.get("nodes", []):
+            if node.get("flowNodeType") in _SKIPPED_TYPES:
+                continue
+            if node.get("flowNodeType") not in _HANDLERS:
+                raise WorkflowError(f"不支持的节点类型: {node.get('flowNodeType')}（{node.get('name')}）")
+            self.nodes[node["nodeId"]] = node
+
+        # 依赖 = 连线来源 + 输入中引用的节点
+        self.deps: dict[str, set[str]] = {node_id: set() for node_id in self.nodes}
+        for edge in data.get("edges", []):
+            if edge.get("target") in self.nodes and edge.get("source") in self.nodes:
+                self.deps[edge["target"]].add(edge["source"])
+        for node_id, node in self.nodes.items():
+            for item in node.get("inputs", []):
+                self.deps[node_id].update(r for r in _refs_in(item.get("value")) if r in self.nodes)
+        self._check_acyclic()
+
+        # 全局变量定义：key、label 均可作为传入变量名
+        self.variables = data.get("chatConfig", {}).get("variables", [])
+        # 含对话节点时执行前需检查生成类大模型配置
+        self.has_chat_nodes = any(node["flowNodeType"] == "chatNode" for node in self.nodes.values())
+
+    @classmethod
+    def load(cls, path: str = WORKFLOW_PATH) -> "Workflow":
+        # FastGPT 导出文件带 UTF-8 BOM
+        with open(path, "r", encoding="utf-8-sig") as f:
+            return cls(json.load(f))
+
+    def _check_acyclic(self) -> None:
+        state: dict[str, int] = {}
+
+        def visit(node_id: str) -> None:
+            if state.get(node_id) == 1:
+                raise WorkflowError(f"工作流存在环：{self.nodes[node_id].get('name')}")
+            if state.get(node_id) == 2:
+                return
+            state[node_id] = 1
+            for dep in self.deps[node_id]:
+                visit(dep)
+            state[node_id] = 2
+
+        for node_id in self.nodes:
+            visit(node_id)
+
+    def resolve_variables(self, values: dict[str, Any]) -> dict[str, Any]:
+        """按变量 key 或 label 取值，缺省用 defaultValue；必填变量缺失时报错"""
+        resolved = {}
+        for var in self.variables:
+            key, label = var["key"], var.get("label", var["key"])
+            value = values.get(key, values.get(label))
+            if value is None:
+                value = var.get("defaultValue", "")
+            if var.get("required") and value in (None, ""):
+                raise WorkflowError(f"缺少必填变量: {label}")
+            resolved[key] = value
+        return resolved
+
+    async def run(self, variables: dict[str, Any], user_input: str = "", *, use_cache: bool = True) -> dict[str, Any]:
+        """
+        执行工作流。
+
+        Returns:
+            {"answer": 最后一个对话节点的回复, "outputs": {节点ID: 输出}, "nodes": [执行明细], "durationMs"}
+        """
+        start = time.perf_counter()
+        ctx = RunContext(self.resolve_variables(variables), user_input)
+        tasks: dict[str, asyncio.Task] = {}
+        trace: list[dict[str, Any]] = []
+
+        async def run_node(node_id: str) -> None:
+            await asyncio.gather(*(tasks[dep] for dep in self.deps[node_id]))
+            node = self.nodes[node_id]
+            node_start = time.perf_counter()
+            inputs = {item["key"]: self._resolve_input(item.get("value"), ctx) for item in node.get("inputs", [])}
+            key = self._cache_key(node, inputs, ctx) if use_cache else None
+            outputs = _cache_get(key) if key else None
+            cached = outputs is not None
+            if outputs is None:
+                try:
+                    with metrics.span("workflow_node", format=node["flowNodeType"]):
+                        outputs = await asyncio.to_thread(_HANDLERS[node["flowNodeType"]], node, inputs, ctx)
+                except WorkflowError:
+                    raise
+                except Exception as e:
+                    raise WorkflowError(f"节点「{node.get('name')}」执行失败: {type(e).__name__}: {e}") from e
+                if key:
+                    _cache_put(key, outputs)
+            ctx.outputs[node_id] = outputs
+            trace.append({
+                "nodeId": node_id,
+                "name": node.get("name"),
+                "type": node["flowNodeType"],
+                "cached": cached,
+                "durationMs": round((time.perf_counter() - node_start) * 1000, 2),
+            })
+
+        for node_id in self.nodes:
+            tasks[node_id] = asyncio.ensure_future(run_node(node_id))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        answer = ""
+        for item in trace:
+            if item["type"] == "chatNode":
+                answer = ctx.outputs[item["nodeId"]].get("answerText", "")
+        log.info("workflow.run", nodes=len(trace), cached=sum(1 for t in trace if t["cached"]))
+        return {
+            "answer": answer,
+            "outputs": ctx.outputs,
+            "nodes": trace,
+            "durationMs": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def _is_node_ref(self, value: Any) -> bool:
+        return _is_ref(value) and (value[0] in self.nodes or value[0] == VARIABLE_NODE_ID)
+
+    def _resolve_input(self, value: Any, ctx: RunContext) -> Any:
+        """引用 [节点ID, 输出ID] 或引用列表替换为对应输出，其余原样返回"""
+        if self._is_node_ref(value):
+            return ctx.ref(*value)
+        if isinstance(value, list) and value and all(self._is_node_ref(v) for v in value):
+            return [ctx.ref(*v) for v in value]
+        return value
+
+    @staticmethod
+    def _cache_key(node: dict, inputs: dict, ctx: RunContext) -> str:
+        """节点类型 + 节点 ID + 解析后的输入 + 模板中引用的值 + 本地路由数据版本"""
+        parts = {"type": node["flowNodeType"], "id": node["nodeId"], "inputs": inputs}
+        if node["flowNodeType"] == "workflowStart":
+            parts["userInput"] = ctx.user_input
+        if node["flowNodeType"] == "httpRequest468":
+            parts["body"] = ctx.render(str(inputs.get("system_httpJsonBody") or ""))
+            route = _LOCAL_ROUTES.get(urlsplit(str(inputs.get("system_httpReqUrl") or "")).path)
+            if route and route[1]:
+                try:
+                    parts["version"] = route[1]()
+                except Exception:
+                    parts["version"] = None
+        if node["flowNodeType"] == "chatNode":
+            parts["systemPrompt"] = ctx.render(str(inputs.get("systemPrompt") or ""))
+        data = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+_loaded: dict[str, tuple[tuple[int, int], Workflow]] = {}
+
+
+def get_workflow(path: str = WORKFLOW_PATH) -> Workflow:
+    """加载工作流，文件未变化（mtime/大小）时复用已解析的图"""
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    entry = _loaded.get(path)
+    if entry is None or entry[0] != key:
+        entry = (key, Workflow.load(path))
+        _loaded[path] = entry
+    return entry[1]
+
+
+# ==================== 节点处理器 ====================
+
+@register_node("workflowStart")
+def _run_start(node: dict, inputs: dict, ctx: RunContext) -> dict:
+    return {"userChatInput": ctx.user_input, "userFiles": []}
+
+
+def _extract(data: Any, path: str) -> Any:
+    """简化的 JSONPath 取值：$.a.b[0] 或 a.b"""
+    path = path[2:] if path.startswith("$.") else path.lstrip("$")
+    for part in re.findall(r"[^.\[\]]+|\[\d+\]", path):
+        if part.startswith("["):
+            index = int(part[1:-1])
+            data = data[index] if isinstance(data, list) and index < len(data) else None
+        else:
+            data = data.get(part) if isinstance(data, dict) else None
+        if data is None:
+            return None
+    return data
+
+
+@register_node("httpRequest468")
+def _run_http(node: dict, inputs: dict, ctx: RunContext) -> dict:
+    method = str(inputs.get("system_httpMethod") or "POST").upper()
+    url = ctx.render(str(inputs.get("system_httpReqUrl") or ""))
+    raw_body = inputs.get("system_httpJsonBody") or ""
+    body = json.loads(ctx.render(raw_body, escape_json=True)) if str(raw_body).strip() else None
+
+    route = _LOCAL_ROUTES.get(urlsplit(url).path)
+    if route is not None:
+        response = route[0](body)
+    else:
+        headers = {h["key"]: ctx.render(str(h.get("value", ""))) for h in inputs.get("system_httpHeader") or [] if h.get("key")}
+        timeout = float(inputs.get("system_httpTimeout") or 30)
+        with httpx.Client(timeout=timeout, proxy=None, trust_env=False) as client:
+            resp = client.request(method, url, json=body, headers=headers)
+            resp.raise_for_status()
+            try:
+                response = resp.json()
+            except ValueError:
+                response = resp.text
+
+    outputs: dict[str, Any] = {"httpRawResponse": response}
+    for output in node.get("outputs", []):
+        if output.get("type") == "dynamic" and output["key"] != "system_addOutputParam":
+            outputs[output["id"]] = _extract(response, output["key"])
+    return outputs
+
+
+def _number(value: Any, kind: type) -> Any:
+    """节点中未设置（None/空串）或无法识别的数值参数按未设置处理"""
+    try:
+        return kind(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+@register_node("chatNode")
+def _run_chat(node: dict, inputs: dict, ctx: RunContext) -> dict:
+    system_prompt = ctx.render(str(inputs.get("systemPrompt") or ""))
+    user_input = inputs.get("userChatInput") or "请根据以上要求生成文件。"
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": user_input})
+    answer = llm_scheduler.call(
+        llm_client.call_generation,
+        messages,
+        model=inputs.get("model") or None,
+        temperature=_number(inputs.get("temperature"), float),
+        max_tokens=_number(inputs.get("maxToken"), int),
+        priority=llm_scheduler.SUB_WORKFLOW,
+    )
+    history = messages + [{"role": "assistant", "content": answer}]
+    return {"answerText": answer, "history": history, "reasoningText": ""}